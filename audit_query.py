@@ -13,6 +13,7 @@ sys.path.insert(0, str(Path(__file__).parent / 'src'))
 
 from blockchain_audit import BlockchainAudit, BlockType
 from config import BLOCKCHAIN_PATH
+from database import criar_database_manager
 from tabulate import tabulate
 
 
@@ -76,8 +77,13 @@ def query_by_hash_id(blockchain: BlockchainAudit, hash_id: str):
         print(f"Destinatário: {last_event['data']['destinatario']}")
 
 
-def query_by_edicao(blockchain: BlockchainAudit, edicao: str):
-    """Consulta todos os fascículos de uma edição"""
+def query_by_edicao(blockchain: BlockchainAudit, edicao: str, db=None):
+    """
+    Consulta todos os fascículos de uma edição
+    
+    Com `db`, confere cada fascículo com os eventos e envios registrados no
+    banco (DatabaseManager.relatorio_edicao, uma única consulta).
+    """
     print("=" * 70)
     print(f"FASCÍCULOS DA EDIÇÃO: {edicao}")
     print("=" * 70)
@@ -101,18 +107,26 @@ def query_by_edicao(blockchain: BlockchainAudit, edicao: str):
                 }
             fasciculos[hash_id]['eventos'].append(block.block_type)
     
+    relatorio = {registro['hash_id']: registro for registro in db.relatorio_edicao(edicao)} if db else {}
+    
     # Tabela de fascículos
     table_data = []
     for hash_id, info in fasciculos.items():
         status = '[OK] Enviado' if BlockType.EMAIL_SENT.value in info['eventos'] else '⏳ Pendente'
-        table_data.append([
+        linha = [
             info['fasciculo'],
             hash_id[:16] + '...',
             len(info['eventos']),
             status
-        ])
+        ]
+        if db:
+            registro = relatorio.get(hash_id)
+            linha.append(f"{registro['total_eventos']} / {registro['total_envios']}" if registro else 'ausente')
+        table_data.append(linha)
     
     headers = ['Fascículo', 'Hash ID', 'Eventos', 'Status']
+    if db:
+        headers.append('Banco (eventos / envios)')
     print(tabulate(table_data, headers=headers, tablefmt='grid'))
     
     print(f"\nTotal de fascículos: {len(fasciculos)}")
@@ -179,7 +193,13 @@ def main():
     if args.hash_id:
         query_by_hash_id(blockchain, args.hash_id)
     elif args.edicao:
-        query_by_edicao(blockchain, args.edicao)
+        db = criar_database_manager()
+        if db.connect():
+            query_by_edicao(blockchain, args.edicao, db)
+            db.disconnect()
+        else:
+            print("[AVISO] Banco indisponível: mostrando apenas a blockchain")
+            query_by_edicao(blockchain, args.edicao)
     elif args.verificar_integridade:
         is_valid = verify_integrity(blockchain)
         return 0 if is_valid else 1
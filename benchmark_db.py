@@ -0,0 +1,164 @@
+"""
+Benchmark do Banco de Dados
+Compara cursores comuns e comandos preparados nos caminhos por destinatário
+(inserir_envio_individual, atualizar_status_envio, inserir_log_evento)
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# Adiciona o diretório src ao path
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+
+def _cronometrar(operacoes: int, funcao) -> dict:
+    """Executa `funcao(numero)` `operacoes` vezes e resume a vazão"""
+    falhas = 0
+    inicio = time.perf_counter()
+    for numero in range(operacoes):
+        if funcao(numero) in (None, False):
+            falhas += 1
+    segundos = time.perf_counter() - inicio
+    
+    return {
+        'operacoes': operacoes,
+        'falhas': falhas,
+        'segundos': round(segundos, 3),
+        'por_segundo': round(operacoes / segundos, 1) if segundos else None,
+        'media_ms': round(segundos / operacoes * 1000, 4) if operacoes else None
+    }
+
+
+def executar_modo(db, hash_id: str, operacoes: int, preparados: bool) -> dict:
+    """Mede as três operações com ou sem comandos preparados"""
+    db.usar_preparados = preparados
+    
+    # Aquece o pool (e, no modo preparado, prepara os comandos) fora da medição
+    envio_id = db.inserir_envio_individual(hash_id, str(uuid.uuid4()), 'aquecimento@exemplo.com',
+                                           'Aquecimento', 'hash-verificacao')
+    db.atualizar_status_envio(envio_id, 'ENVIADO')
+    db.inserir_log_evento(hash_id, 'EMAIL_SENT', 'aquecimento@exemplo.com')
+    
+    ids = []
+    
+    def inserir_envio(numero):
+        envio_id = db.inserir_envio_individual(
+            hash_id, str(uuid.uuid4()), f'usuario{numero}@exemplo.com',
+            f'Usuário {numero}', 'hash-verificacao'
+        )
+        ids.append(envio_id)
+        return envio_id
+    
+    resultado = {'inserir_envio_individual': _cronometrar(operacoes, inserir_envio)}
+    resultado['atualizar_status_envio'] = _cronometrar(
+        operacoes, lambda numero: db.atualizar_status_envio(ids[numero], 'ENVIADO')
+    )
+    resultado['inserir_log_evento'] = _cronometrar(
+        operacoes, lambda numero: db.inserir_log_evento(
+            hash_id, 'EMAIL_SENT', f'usuario{numero}@exemplo.com', f'Usuário {numero}',
+            {'numero_envio': numero}
+        )
+    )
+    return resultado
+
+
+def limpar(db, hash_id: str):
+    """Remove os registros criados pelo benchmark"""
+    with db._cursor() as cursor:
+        cursor.execute("DELETE FROM logs_eventos WHERE hash_id = %s", (hash_id,))
+        cursor.execute("DELETE FROM envios_individuais WHERE hash_fasciculo = %s", (hash_id,))
+        cursor.execute("DELETE FROM fasciculos WHERE hash_id = %s", (hash_id,))
+
+
+def rodar_benchmark(args) -> dict:
+    """Executa os dois modos no mesmo banco e compara a vazão de cada operação"""
+    if args.banco == 'sqlite':
+        os.environ['DB_ENGINE'] = 'sqlite'
+        os.environ['DB_SQLITE_PATH'] = str(Path(tempfile.mkdtemp(prefix='benchmark_db_')) / 'auditoria.db')
+    
+    from database import criar_database_manager
+    
+    db = criar_database_manager()
+    hash_id = f"benchmark-db-{uuid.uuid4()}"
+    
+    # Mensagens [OK] dos métodos vão para stderr; stdout fica só com o JSON
+    with redirect_stdout(sys.stderr):
+        if not db.inserir_fasciculo({
+            'hash_id': hash_id, 'edicao': 'Benchmark', 'fasciculo': 'Banco de dados',
+            'fasciculo_hash': hash_id
+        }):
+            raise RuntimeError("Não foi possível preparar o banco (verifique o .env e as migrações)")
+        
+        try:
+            modos = {
+                'comum': executar_modo(db, hash_id, args.operacoes, preparados=False),
+                'preparado': executar_modo(db, hash_id, args.operacoes, preparados=True)
+            }
+        finally:
+            limpar(db, hash_id)
+            db.disconnect()
+    
+    # Vazão do modo preparado dividida pela do comum (no SQLite os modos são iguais)
+    razao = {
+        operacao: round(modos['preparado'][operacao]['por_segundo'] / medida['por_segundo'], 2)
+        for operacao, medida in modos['comum'].items()
+        if medida['por_segundo'] and modos['preparado'][operacao]['por_segundo']
+    } if args.banco == 'mysql' else None
+    
+    return {
+        'configuracao': {
+            'operacoes': args.operacoes,
+            'banco': args.banco,
+            'python': sys.version.split()[0],
+            'plataforma': sys.platform
+        },
+        'modos': modos,
+        'razao_preparado_comum': razao,
+        'aviso': (
+            "SQLite não tem comandos preparados no servidor: os dois modos executam o mesmo "
+            "código e não são comparados. Use --banco mysql."
+        ) if args.banco == 'sqlite' else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark de comandos preparados nos caminhos por destinatário do banco'
+    )
+    parser.add_argument('--operacoes', type=int, default=10000,
+                       help='Operações medidas por tipo e modo (padrão: 10000)')
+    parser.add_argument('--banco', choices=['mysql', 'sqlite'], default='mysql',
+                       help='Banco usado no benchmark (padrão: mysql do .env; sqlite só testa o script)')
+    parser.add_argument('--saida', help='Arquivo JSON de saída (padrão: stdout)')
+    
+    args = parser.parse_args()
+    
+    if args.banco == 'mysql':
+        from dotenv import load_dotenv
+        load_dotenv()
+    
+    try:
+        resultado = rodar_benchmark(args)
+    except RuntimeError as e:
+        print(f"[ERRO] {e}", file=sys.stderr)
+        return 1
+    
+    saida = json.dumps(resultado, indent=2, ensure_ascii=False)
+    
+    if args.saida:
+        Path(args.saida).write_text(saida, encoding='utf-8')
+        print(f"[OK] Resultado salvo em {args.saida}", file=sys.stderr)
+    else:
+        print(saida)
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
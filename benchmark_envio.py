@@ -0,0 +1,422 @@
+"""
+Benchmark de Envio em Massa
+Mede a vazão de ponta a ponta do envio_massa.py contra um servidor SMTP local
+"""
+import argparse
+import json
+import os
+import random
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from functools import wraps
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Adiciona o diretório src ao path
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+
+# ===== SERVIDOR SMTP DE TESTE =====
+
+class _SessaoSMTP(socketserver.StreamRequestHandler):
+    """Sessão SMTP mínima: aceita e descarta as mensagens"""
+    
+    def _responder(self, codigo, texto):
+        self.wfile.write(f"{codigo} {texto}\r\n".encode('ascii'))
+    
+    def handle(self):
+        servidor = self.server
+        self._responder(220, 'benchmark ESMTP')
+        
+        while True:
+            linha = self.rfile.readline()
+            if not linha:
+                break
+            verbo = linha[:4].decode('ascii', 'replace').upper()
+            
+            if verbo in ('EHLO', 'HELO'):
+                self.wfile.write(b"250-benchmark\r\n250-8BITMIME\r\n250 PIPELINING\r\n")
+            elif verbo in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self._responder(250, 'OK')
+            elif verbo == 'DATA':
+                self._responder(354, 'Fim com <CRLF>.<CRLF>')
+                tamanho = 0
+                for linha_dados in self.rfile:
+                    if linha_dados == b".\r\n":
+                        break
+                    tamanho += len(linha_dados)
+                
+                # Latência artificial do servidor (com variação de +-50%)
+                if servidor.latencia:
+                    time.sleep(servidor.latencia * random.uniform(0.5, 1.5))
+                
+                if random.random() < servidor.taxa_falhas:
+                    servidor.contar(falha=True)
+                    self._responder(servidor.codigo_falha, 'Falha injetada pelo benchmark')
+                else:
+                    servidor.contar(tamanho=tamanho)
+                    self._responder(250, 'Mensagem aceita')
+            elif verbo == 'QUIT':
+                self._responder(221, 'Tchau')
+                break
+            else:
+                self._responder(502, 'Comando não implementado')
+
+
+class ServidorSMTPTeste(socketserver.ThreadingTCPServer):
+    """Servidor SMTP local com latência e falhas configuráveis"""
+    
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, latencia_ms: float = 0, taxa_falhas: float = 0, codigo_falha: int = 451):
+        """
+        Inicializa o servidor em uma porta livre de 127.0.0.1
+        
+        Args:
+            latencia_ms: Latência média de resposta ao DATA em milissegundos
+            taxa_falhas: Probabilidade (0-1) de recusar uma mensagem
+            codigo_falha: Código SMTP usado nas recusas injetadas
+        """
+        super().__init__(('127.0.0.1', 0), _SessaoSMTP)
+        self.latencia = latencia_ms / 1000
+        self.taxa_falhas = taxa_falhas
+        self.codigo_falha = codigo_falha
+        self.mensagens = 0
+        self.falhas = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def porta(self) -> int:
+        return self.server_address[1]
+    
+    def contar(self, tamanho: int = 0, falha: bool = False):
+        with self._lock:
+            if falha:
+                self.falhas += 1
+            else:
+                self.mensagens += 1
+                self.bytes += tamanho
+    
+    def contadores(self):
+        with self._lock:
+            return {'mensagens': self.mensagens, 'falhas': self.falhas, 'bytes': self.bytes}
+
+
+# ===== DADOS SINTÉTICOS =====
+
+def gerar_pdf(caminho: Path, tamanho_kb: int):
+    """Gera um PDF válido de aproximadamente `tamanho_kb` KB (conteúdo aleatório)"""
+    conteudo = os.urandom(max(0, tamanho_kb * 1024 - 512))
+    objetos = [
+        b"<</Type/Catalog/Pages 2 0 R>>",
+        b"<</Type/Pages/Kids[3 0 R]/Count 1>>",
+        b"<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]/Contents 4 0 R>>",
+        b"<</Length %d>>stream\n" % len(conteudo) + conteudo + b"\nendstream"
+    ]
+    
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for numero, objeto in enumerate(objetos, 1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n" % numero + objeto + b"\nendobj\n"
+    
+    inicio_xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for offset in offsets:
+        pdf += b"%010d 00000 n \n" % offset
+    pdf += b"trailer<</Size %d/Root 1 0 R>>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref)
+    
+    caminho.write_bytes(bytes(pdf))
+
+
+def gerar_destinatarios(caminho: Path, quantidade: int, dominios: int):
+    """Gera uma lista .txt de destinatários distribuídos entre `dominios` domínios"""
+    with open(caminho, 'w', encoding='utf-8') as f:
+        for i in range(quantidade):
+            f.write(f"usuario{i}@dominio{i % dominios}.exemplo.com.br\n")
+
+
+def pico_rss_mb():
+    """Pico de memória residente do processo em MB (None se indisponível)"""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return round(pico / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _cronometrar_metodo(classe, nome_metodo: str, etapa: str, metricas):
+    """Substitui o método da classe por uma versão que registra sua duração"""
+    original = getattr(classe, nome_metodo)
+    
+    @wraps(original)
+    def cronometrado(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            metricas.registrar(etapa, time.perf_counter() - inicio)
+    
+    setattr(classe, nome_metodo, cronometrado)
+
+
+# ===== EXECUÇÃO DE UM CENÁRIO (processo filho) =====
+
+def executar_cenario(cenario: dict) -> dict:
+    """
+    Executa o envio_massa completo para um cenário
+    
+    Roda em um processo próprio, com o ambiente (SMTP, banco, blockchain)
+    apontando para o diretório temporário do cenário, para que cada medição
+    comece do zero (inclusive o pico de memória).
+    """
+    diretorio = Path(cenario['diretorio'])
+    os.chdir(diretorio)
+    
+    import logging
+    import envio_massa
+    from blockchain_audit import BlockchainAudit
+    from crypto_manager import CryptoManager
+    from database import DatabaseManager, criar_database_manager
+    from email_sender import EmailSender
+    from hash_generator import HashGenerator
+    from metrics import Metricas
+    from config import ENCRYPTION_KEY_PATH
+    
+    # Logs apenas em arquivo: o console do benchmark fica limpo
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler):
+            handler.setLevel(logging.WARNING)
+    
+    with open(os.devnull, 'w') as nulo, redirect_stdout(nulo):
+        # Fascículo e lista sintéticos
+        pdf_path = diretorio / f"fasciculo_{cenario['tamanho_pdf_kb']}kb.pdf"
+        gerar_pdf(pdf_path, cenario['tamanho_pdf_kb'])
+        lista = diretorio / 'destinatarios.txt'
+        gerar_destinatarios(lista, cenario['destinatarios'], cenario['dominios'])
+        
+        hash_info = HashGenerator().generate_fasciculo_hash(pdf_path, 'Benchmark', 'Fascículo sintético')
+        Path('data').mkdir(exist_ok=True)
+        with open(Path('data') / f"hash_{hash_info['hash_id']}.json", 'w', encoding='utf-8') as f:
+            json.dump(CryptoManager(ENCRYPTION_KEY_PATH).encrypt_hash(hash_info), f)
+        
+        # Instrumenta as etapas do pipeline
+        metricas = Metricas()
+        _cronometrar_metodo(HashGenerator, 'gerar_hash_envio', 'hash', metricas)
+        for metodo in ('inserir_envio_individual', 'atualizar_status_envio', 'inserir_log_evento'):
+            _cronometrar_metodo(DatabaseManager, metodo, 'banco', metricas)
+        _cronometrar_metodo(BlockchainAudit, 'add_block', 'blockchain', metricas)
+        _cronometrar_metodo(EmailSender, 'send_fasciculo', 'smtp', metricas)
+        _cronometrar_metodo(EmailSender, 'send_fasciculo_lote', 'smtp', metricas)
+        
+        inicio = time.perf_counter()
+        envio_massa.enviar_em_massa(
+            hash_id=hash_info['hash_id'],
+            arquivo_destinatarios=str(lista),
+            limites=cenario['limites'],
+            workers=cenario['workers'],
+            modo_entrega=cenario['modo_entrega'],
+            agrupar=cenario['agrupar'],
+            metricas=metricas,
+            marca_dagua=cenario['marca_dagua'],
+            backend=cenario['backend']
+        )
+        tempo_total = time.perf_counter() - inicio
+        
+        db = criar_database_manager()
+        contagem = {}
+        if db.connect():
+            cursor = db.connection.cursor()
+            cursor.execute("SELECT MAX(id) FROM envios_massa")
+            envio_massa_id = cursor.fetchone()[0]
+            cursor.close()
+            contagem = db.contar_envios_por_status(envio_massa_id)
+            db.disconnect()
+    
+    return {
+        'tamanho_pdf_kb': cenario['tamanho_pdf_kb'],
+        'modo_entrega': cenario['modo_entrega'],
+        'agrupar': cenario['agrupar'],
+        'marca_dagua': cenario['marca_dagua'],
+        'backend': cenario['backend'],
+        'destinatarios': cenario['destinatarios'],
+        'enviados': contagem.get('ENVIADO', 0),
+        'erros': contagem.get('ERRO', 0),
+        'tempo_total_s': round(tempo_total, 3),
+        'emails_por_segundo': round(cenario['destinatarios'] / tempo_total, 2),
+        'etapas': metricas.resumo(),
+        'pico_rss_mb': pico_rss_mb()
+    }
+
+
+# ===== ORQUESTRAÇÃO =====
+
+def rodar_benchmark(args) -> dict:
+    """Sobe o servidor SMTP de teste e executa um processo por tamanho de PDF"""
+    servidor = ServidorSMTPTeste(args.latencia_ms, args.falhas, args.codigo_falha)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    
+    configuracao = {
+        'destinatarios': args.destinatarios,
+        'dominios': args.dominios,
+        'tamanhos_pdf_kb': args.tamanhos_pdf,
+        'latencia_ms': args.latencia_ms,
+        'taxa_falhas': args.falhas,
+        'codigo_falha': args.codigo_falha,
+        'espera_reenvio_s': args.espera_reenvio,
+        'workers': args.workers,
+        'taxa_inicial': args.taxa_inicial,
+        'taxa_max': args.taxa_max,
+        'dominio_concorrencia': args.dominio_concorrencia,
+        'banco': args.banco,
+        'modo_entrega': args.modo_entrega,
+        'agrupar': args.agrupar,
+        'marca_dagua': args.marca_dagua,
+        'backend': args.backend,
+        'limites': {'minuto': args.limite_minuto},
+        'python': sys.version.split()[0],
+        'plataforma': sys.platform
+    }
+    resultados = []
+    
+    try:
+        for tamanho_kb in args.tamanhos_pdf:
+            with tempfile.TemporaryDirectory(prefix='benchmark_envio_') as diretorio:
+                ambiente = {
+                    **os.environ,
+                    'SMTP_SERVER': '127.0.0.1',
+                    'SMTP_PORT': str(servidor.porta),
+                    'SMTP_USER': '',
+                    'SMTP_PASSWORD': '',
+                    'SMTP_STARTTLS': 'false',
+                    'EMAIL_FROM': 'benchmark@exemplo.com.br',
+                    'SMTP_TAXA_INICIAL': str(args.taxa_inicial),
+                    'SMTP_TAXA_MAX': str(args.taxa_max),
+                    'SMTP_ESPERA_REENVIO': str(args.espera_reenvio),
+                    'DOMINIO_CONCORRENCIA': str(args.dominio_concorrencia),
+                    'DOMINIO_LIMITES': '{}',
+                    'DB_ENGINE': args.banco,
+                    'DB_SQLITE_PATH': str(Path(diretorio) / 'benchmark.db'),
+                    'BLOCKCHAIN_PATH': str(Path(diretorio) / 'blockchain.json'),
+                    'ENCRYPTION_KEY_PATH': str(Path(diretorio) / 'encryption.key'),
+                    'PUBLICACAO_DIR': str(Path(diretorio) / 'publicacao'),
+                    'PUBLICACAO_URL_BASE': 'http://127.0.0.1/publicacao',
+                    'LINK_KEY_PATH': str(Path(diretorio) / 'link_token.key'),
+                    'MARCA_DAGUA_DIR': str(Path(diretorio) / 'marcados'),
+                    'SPOOL_DIR': str(Path(diretorio) / 'spool')
+                }
+                cenario = {
+                    'diretorio': diretorio,
+                    'tamanho_pdf_kb': tamanho_kb,
+                    'destinatarios': args.destinatarios,
+                    'dominios': args.dominios,
+                    'workers': args.workers,
+                    'modo_entrega': args.modo_entrega,
+                    'agrupar': args.agrupar,
+                    'marca_dagua': args.marca_dagua,
+                    'backend': args.backend,
+                    'limites': {'segundo': 0, 'minuto': args.limite_minuto, 'hora': 0, 'dia': 0}
+                }
+                
+                print(f"[{len(resultados) + 1}/{len(args.tamanhos_pdf)}] PDF de {tamanho_kb} KB, "
+                      f"{args.destinatarios} destinatário(s)...", file=sys.stderr)
+                
+                antes = servidor.contadores()
+                processo = subprocess.run(
+                    [sys.executable, str(Path(__file__).resolve()), '--cenario', json.dumps(cenario)],
+                    env=ambiente, capture_output=True, text=True
+                )
+                if processo.returncode != 0:
+                    raise RuntimeError(f"Cenário de {tamanho_kb} KB falhou:\n{processo.stderr}")
+                
+                resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+                depois = servidor.contadores()
+                resultado['servidor_smtp'] = {
+                    chave: depois[chave] - antes[chave] for chave in depois
+                }
+                resultados.append(resultado)
+                
+                print(f"  [OK] {resultado['emails_por_segundo']} emails/s "
+                      f"(smtp p95: {resultado['etapas'].get('smtp', {}).get('p95_ms')} ms)",
+                      file=sys.stderr)
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+    
+    return {'configuracao': configuracao, 'cenarios': resultados}
+
+
+def main():
+    from config import THROTTLE_CONFIG, DOMINIO_LIMITES_PADRAO
+    
+    parser = argparse.ArgumentParser(
+        description='Benchmark de ponta a ponta do envio em massa com servidor SMTP local'
+    )
+    parser.add_argument('--destinatarios', type=int, default=500,
+                       help='Número de destinatários sintéticos (padrão: 500)')
+    parser.add_argument('--dominios', type=int, default=10,
+                       help='Número de domínios de destino (padrão: 10)')
+    parser.add_argument('--tamanhos-pdf', type=lambda v: [int(x) for x in v.split(',')], default=[100, 1024],
+                       help='Tamanhos dos PDFs em KB, separados por vírgula (padrão: 100,1024)')
+    parser.add_argument('--latencia-ms', type=float, default=20.0,
+                       help='Latência média do servidor SMTP em ms (padrão: 20)')
+    parser.add_argument('--falhas', type=float, default=0.0,
+                       help='Probabilidade de falha injetada por mensagem, 0-1 (padrão: 0)')
+    parser.add_argument('--codigo-falha', type=int, default=451,
+                       help='Código SMTP das falhas injetadas (padrão: 451)')
+    parser.add_argument('--espera-reenvio', type=float, default=0.5,
+                       help='Espera (s) antes de reenviar falhas temporárias (padrão: 0.5)')
+    parser.add_argument('--workers', type=int, default=THROTTLE_CONFIG['concorrencia_max'],
+                       help=f"Máximo de envios simultâneos (padrão: {THROTTLE_CONFIG['concorrencia_max']})")
+    parser.add_argument('--taxa-inicial', type=float, default=1000.0,
+                       help='Taxa inicial do controle adaptativo em envios/s (padrão: 1000)')
+    parser.add_argument('--taxa-max', type=float, default=1000.0,
+                       help='Taxa máxima do controle adaptativo em envios/s (padrão: 1000)')
+    parser.add_argument('--dominio-concorrencia', type=int, default=DOMINIO_LIMITES_PADRAO['concorrencia'],
+                       help=f"Envios simultâneos por domínio (padrão: {DOMINIO_LIMITES_PADRAO['concorrencia']})")
+    parser.add_argument('--limite-minuto', type=int, default=0,
+                       help='Quota de envios por minuto (padrão: 0, sem limite)')
+    parser.add_argument('--banco', choices=['sqlite', 'mysql'], default='sqlite',
+                       help='Banco usado no benchmark (padrão: sqlite temporário)')
+    parser.add_argument('--modo-entrega', choices=['anexo', 'link'], default='anexo',
+                       help='Anexa o PDF ou envia um link de download (padrão: anexo)')
+    parser.add_argument('--agrupar', type=int, default=1,
+                       help='Destinatários por mensagem, RCPT TO múltiplos (padrão: 1)')
+    parser.add_argument('--backend', choices=['smtp', 'spool', 'sendmail'], default='smtp',
+                       help='Entrega pelo servidor SMTP de teste ou ao MTA local (padrão: smtp)')
+    parser.add_argument('--marca-dagua', action='store_true',
+                       help="Anexa a cada destinatário uma cópia marcada com seu hash_envio")
+    parser.add_argument('--saida', help='Arquivo JSON de saída (padrão: stdout)')
+    parser.add_argument('--cenario', help=argparse.SUPPRESS)
+    
+    args = parser.parse_args()
+    
+    if args.cenario:
+        print(json.dumps(executar_cenario(json.loads(args.cenario))))
+        return 0
+    
+    resultado = rodar_benchmark(args)
+    saida = json.dumps(resultado, indent=2, ensure_ascii=False)
+    
+    if args.saida:
+        Path(args.saida).write_text(saida, encoding='utf-8')
+        print(f"[OK] Resultado salvo em {args.saida}", file=sys.stderr)
+    else:
+        print(saida)
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,8 @@ Script de Consulta ao Banco de Dados
 Consulta logs e hashes armazenados no MySQL
 """
 import sys
+import csv
+import json
 from pathlib import Path
 import argparse
 from datetime import datetime
@@ -16,10 +18,18 @@ load_dotenv()
 sys.path.insert(0, str(Path(__file__).parent / 'src'))
 
 from database import DatabaseManager
+from mysql.connector import Error
 
 
-def consultar_fasciculo(db: DatabaseManager, hash_id: str):
-    """Consulta informações de um fascículo específico"""
+def mostrar_proxima_pagina(pagina, limite: int):
+    """Indica como pedir a página seguinte quando esta veio cheia"""
+    if len(pagina) == limite:
+        print(f"\nPróxima página: --pagina-apos {pagina[-1]['id']}")
+
+
+def consultar_fasciculo(db: DatabaseManager, hash_id: str, limite: int = 100,
+                        apos: int = None, envios: bool = False):
+    """Consulta informações de um fascículo específico (logs ou envios paginados)"""
     print("=" * 70)
     print(f"INFORMAÇÕES DO FASCÍCULO - Hash ID: {hash_id}")
     print("=" * 70)
@@ -39,12 +49,35 @@ def consultar_fasciculo(db: DatabaseManager, hash_id: str):
     print(f"Tamanho: {fasciculo['pdf_size'] / 1024:.2f} KB")
     print(f"Criado em: {fasciculo['created_at']}")
     
-    # Buscar logs
-    logs = db.buscar_logs_fasciculo(hash_id)
+    if envios:
+        # Buscar uma página de envios individuais
+        pagina = db.buscar_envios_fasciculo_pagina(hash_id, limite, apos)
+        
+        if pagina:
+            print(f"\n{'-' * 70}")
+            print(f"ENVIOS INDIVIDUAIS ({len(pagina)} nesta página)")
+            print(f"{'-' * 70}")
+            
+            table_data = []
+            for envio in pagina:
+                table_data.append([
+                    envio['id'],
+                    envio['destinatario_email'],
+                    envio['status'],
+                    envio['data_envio'].strftime('%d/%m/%Y %H:%M:%S') if envio['data_envio'] else '-'
+                ])
+            
+            headers = ['ID', 'Destinatário', 'Status', 'Enviado em']
+            print(tabulate(table_data, headers=headers, tablefmt='grid'))
+            mostrar_proxima_pagina(pagina, limite)
+        return
+    
+    # Buscar uma página de logs
+    logs = db.buscar_logs_fasciculo_pagina(hash_id, limite, apos)
     
     if logs:
         print(f"\n{'-' * 70}")
-        print(f"HISTÓRICO DE EVENTOS ({len(logs)} eventos)")
+        print(f"HISTÓRICO DE EVENTOS ({len(logs)} eventos nesta página)")
         print(f"{'-' * 70}")
         
         table_data = []
@@ -58,6 +91,7 @@ def consultar_fasciculo(db: DatabaseManager, hash_id: str):
         
         headers = ['ID', 'Data/Hora', 'Evento', 'Destinatário']
         print(tabulate(table_data, headers=headers, tablefmt='grid'))
+        mostrar_proxima_pagina(logs, limite)
 
 
 def consultar_edicao(db: DatabaseManager, edicao: str):
@@ -66,7 +100,8 @@ def consultar_edicao(db: DatabaseManager, edicao: str):
     print(f"FASCÍCULOS DA EDIÇÃO: {edicao}")
     print("=" * 70)
     
-    fasciculos = db.buscar_fasciculos_edicao(edicao)
+    # Contagens de eventos e envios de todos os fascículos em uma consulta
+    fasciculos = db.relatorio_edicao(edicao)
     
     if not fasciculos:
         print(f"\n[ERRO] Nenhum fascículo encontrado para a edição: {edicao}")
@@ -76,20 +111,20 @@ def consultar_edicao(db: DatabaseManager, edicao: str):
     
     table_data = []
     for f in fasciculos:
-        # Buscar se foi enviado
-        logs = db.buscar_logs_fasciculo(f['hash_id'])
-        enviado = any(log['evento_tipo'] == 'EMAIL_SENT' for log in logs)
-        status = '[OK] Enviado' if enviado else '⏳ Pendente'
+        status = '[OK] Enviado' if f['total_envios'] else '⏳ Pendente'
+        ultima = f['ultima_atividade']
         
         table_data.append([
             f['fasciculo'],
             f['hash_id'][:16] + '...',
             f['created_at'].strftime('%d/%m/%Y %H:%M'),
-            len(logs),
+            f['total_eventos'],
+            f['total_envios'],
+            ultima.strftime('%d/%m/%Y %H:%M') if ultima else '-',
             status
         ])
     
-    headers = ['Fascículo', 'Hash ID', 'Criado em', 'Eventos', 'Status']
+    headers = ['Fascículo', 'Hash ID', 'Criado em', 'Eventos', 'Envios', 'Última atividade', 'Status']
     print(tabulate(table_data, headers=headers, tablefmt='grid'))
 
 
@@ -112,48 +147,63 @@ def mostrar_estatisticas(db: DatabaseManager):
             print(f"  {tipo}: {total}")
 
 
-def listar_ultimos(db: DatabaseManager, limite: int = 10):
-    """Lista os últimos fascículos criados"""
+def listar_ultimos(db: DatabaseManager, limite: int = 10, apos: int = None):
+    """Lista os últimos fascículos criados, uma página por vez"""
     print("=" * 70)
     print(f"ÚLTIMOS {limite} FASCÍCULOS CRIADOS")
     print("=" * 70)
     
-    if not db.connection or not db.connection.is_connected():
-        if not db.connect():
-            return
+    fasciculos = db.listar_fasciculos(limite, apos)
     
-    cursor = db.connection.cursor(dictionary=True)
+    if not fasciculos:
+        print("\nNenhum fascículo encontrado")
+        return
+    
+    print(f"\nTotal: {len(fasciculos)}\n")
+    
+    table_data = []
+    for f in fasciculos:
+        table_data.append([
+            f['edicao'],
+            f['fasciculo'],
+            f['hash_id'][:16] + '...',
+            f['created_at'].strftime('%d/%m/%Y %H:%M:%S')
+        ])
+    
+    headers = ['Edição', 'Fascículo', 'Hash ID', 'Criado em']
+    print(tabulate(table_data, headers=headers, tablefmt='grid'))
+    mostrar_proxima_pagina(fasciculos, limite)
+
+
+def exportar_envios(db: DatabaseManager, formato: str, saida: str,
+                    hash_id: str = None, edicao: str = None):
+    """
+    Exporta os envios individuais em CSV ou NDJSON, linha a linha
+    
+    As linhas vêm do banco em blocos (cursor não bufferizado) e são escritas
+    assim que chegam: a memória não cresce com o número de envios. As
+    mensagens vão para stderr, para não misturar com a exportação em stdout.
+    """
+    arquivo = sys.stdout if saida == '-' else open(saida, 'w', newline='', encoding='utf-8')
+    total = 0
     
     try:
-        query = """
-            SELECT hash_id, edicao, fasciculo, created_at 
-            FROM fasciculos 
-            ORDER BY created_at DESC 
-            LIMIT %s
-        """
-        cursor.execute(query, (limite,))
-        fasciculos = cursor.fetchall()
-        
-        if not fasciculos:
-            print("\nNenhum fascículo encontrado")
-            return
-        
-        print(f"\nTotal: {len(fasciculos)}\n")
-        
-        table_data = []
-        for f in fasciculos:
-            table_data.append([
-                f['edicao'],
-                f['fasciculo'],
-                f['hash_id'][:16] + '...',
-                f['created_at'].strftime('%d/%m/%Y %H:%M:%S')
-            ])
-        
-        headers = ['Edição', 'Fascículo', 'Hash ID', 'Criado em']
-        print(tabulate(table_data, headers=headers, tablefmt='grid'))
-        
+        escritor = None
+        for envio in db.exportar_envios(hash_fasciculo=hash_id, edicao=edicao):
+            if formato == 'ndjson':
+                arquivo.write(json.dumps(envio, default=str, ensure_ascii=False) + '\n')
+            else:
+                if escritor is None:
+                    escritor = csv.DictWriter(arquivo, fieldnames=list(envio))
+                    escritor.writeheader()
+                escritor.writerow(envio)
+            total += 1
     finally:
-        cursor.close()
+        if arquivo is not sys.stdout:
+            arquivo.close()
+    
+    destino = 'stdout' if saida == '-' else saida
+    print(f"[OK] {total} envio(s) exportado(s) em {formato.upper()} para {destino}", file=sys.stderr)
 
 
 def main():
@@ -161,16 +211,46 @@ def main():
         description='Consulta logs e hashes no banco de dados MySQL'
     )
     
-    group = parser.add_mutually_exclusive_group(required=True)
+    group = parser.add_mutually_exclusive_group()
     group.add_argument('--hash-id', help='Consulta por Hash ID do fascículo')
     group.add_argument('--edicao', help='Consulta todos os fascículos de uma edição')
     group.add_argument('--estatisticas', action='store_true',
                       help='Mostra estatísticas gerais')
     group.add_argument('--ultimos', type=int, metavar='N',
                       help='Lista os últimos N fascículos criados')
+    parser.add_argument('--pagina-apos', type=int, metavar='ID',
+                       help='Continua a listagem após este id (indicado ao fim de cada página)')
+    parser.add_argument('--limite', type=int, default=100, metavar='N',
+                       help='Logs ou envios por página com --hash-id (padrão: 100)')
+    parser.add_argument('--envios', action='store_true',
+                       help='Com --hash-id, lista os envios individuais em vez dos logs')
+    parser.add_argument('--exportar', choices=['csv', 'ndjson'],
+                       help='Exporta os envios individuais (filtra por --hash-id ou --edicao)')
+    parser.add_argument('--saida', default='-',
+                       help='Arquivo da exportação (padrão: stdout)')
     
     args = parser.parse_args()
     
+    if args.exportar:
+        if args.estatisticas or args.ultimos:
+            parser.error('--exportar só combina com --hash-id ou --edicao')
+        
+        try:
+            exportar_envios(DatabaseManager(), args.exportar, args.saida, args.hash_id, args.edicao)
+        except Error as e:
+            print(f"[ERRO] Erro ao exportar envios: {e}", file=sys.stderr)
+            return 1
+        return 0
+    
+    if not (args.hash_id or args.edicao or args.estatisticas or args.ultimos):
+        parser.error('informe --hash-id, --edicao, --estatisticas, --ultimos ou --exportar')
+    if args.pagina_apos is not None and not (args.hash_id or args.ultimos):
+        parser.error('--pagina-apos só vale com --hash-id ou --ultimos')
+    if args.envios and not args.hash_id:
+        parser.error('--envios só vale com --hash-id')
+    if args.limite < 1:
+        parser.error('--limite deve ser pelo menos 1')
+    
     # Conectar ao banco
     db = DatabaseManager()
     
@@ -185,13 +265,13 @@ def main():
     try:
         # Executar consulta apropriada
         if args.hash_id:
-            consultar_fasciculo(db, args.hash_id)
+            consultar_fasciculo(db, args.hash_id, args.limite, args.pagina_apos, args.envios)
         elif args.edicao:
             consultar_edicao(db, args.edicao)
         elif args.estatisticas:
             mostrar_estatisticas(db)
         elif args.ultimos:
-            listar_ultimos(db, args.ultimos)
+            listar_ultimos(db, args.ultimos, args.pagina_apos)
     
     finally:
         db.disconnect()
@@ -4,12 +4,12 @@ Envia o mesmo fascículo para múltiplos destinatários com logging, validaçõe
 """
 import sys
 import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
 import json
 from datetime import datetime
 from dotenv import load_dotenv
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-import smtplib
 
 # Carrega variáveis de ambiente
 load_dotenv()
@@ -20,15 +20,35 @@ sys.path.insert(0, str(Path(__file__).parent / 'src'))
 from crypto_manager import CryptoManager
 from email_sender import EmailSender
 from blockchain_audit import BlockchainAudit, BlockType
-from database import DatabaseManager
+from database import criar_database_manager
 from hash_generator import HashGenerator
 from logger import get_logger
 from validator import Validator, validar_ou_erro
-from config import ENCRYPTION_KEY_PATH, BLOCKCHAIN_PATH, SMTP_CONFIG
+from rate_limiter import QuotaCompartilhada, RateLimiter
+from adaptive_throttle import AdaptiveThrottle
+from domain_scheduler import DomainScheduler
+from link_publisher import LinkPublisher
+from relay_router import RelayRouter
+from retry_queue import RetryQueue, falha_transitoria
+from metrics import Metricas
+from pdf_watermark import PdfWatermarker
+from status_buffer import StatusUpdateBuffer
+from event_log_writer import EventLogWriter
+from config import (
+    ENCRYPTION_KEY_PATH, BLOCKCHAIN_PATH, SMTP_CONFIG, SMTP_RELAYS, RATE_LIMITS, QUOTA_COMPARTILHADA,
+    THROTTLE_CONFIG,
+    DOMINIO_LIMITES_PADRAO, DOMINIO_LIMITES, WORKER_CONFIG, RETRY_CONFIG, STATUS_BUFFER_CONFIG,
+    EVENT_LOG_CONFIG,
+    MODO_ENTREGA, PUBLICACAO_DIR, PUBLICACAO_URL_BASE, LINK_KEY_PATH,
+    MARCA_DAGUA, MARCA_DAGUA_DIR, MARCA_DAGUA_PROCESSOS
+)
 
 # Configurar logger
 logger = get_logger(__name__)
 
+# Intervalo (s) entre tentativas de reivindicar lote quando outros workers ainda têm trabalho
+ESPERA_REIVINDICACAO = 5.0
+
 
 def carregar_destinatarios(arquivo_destinatarios):
     """Carrega lista de destinatários de um arquivo"""
@@ -98,58 +118,357 @@ def carregar_destinatarios(arquivo_destinatarios):
     return destinatarios
 
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=2, max=10),
-    retry=retry_if_exception_type((smtplib.SMTPException, ConnectionError)),
-    reraise=True
-)
-def enviar_email_com_retry(email_sender, destinatario, fasciculo_info, pdf_path, mensagem):
-    """Envia email com retry automático"""
-    return email_sender.send_fasciculo(
-        destinatario=destinatario,
-        fasciculo_info=fasciculo_info,
-        pdf_path=pdf_path,
-        mensagem_adicional=mensagem
-    )
+def enviar_destinatario(email_sender, dest, fasciculo_info, pdf_path, link_download=None, marcacao=None):
+    """
+    Envia o fascículo para um destinatário (executado em uma thread do pool)
+    
+    Não há nova tentativa aqui: falhas temporárias voltam pela fila de
+    reenvios do laço principal, sem segurar a thread.
+    
+    Args:
+        link_download: Link pessoal do PDF publicado (entrega por link, sem anexo)
+        marcacao: Future com a cópia do PDF com marca d'água do destinatário,
+                  anexada no lugar de pdf_path
+    
+    Returns:
+        Resultado do envio; exceções viram um resultado com success=False
+    """
+    nome = dest.get('nome', '')
+    mensagem = f"Prezado(a) {nome},\n\n" if nome else None
+    
+    try:
+        if marcacao is not None:
+            pdf_path = marcacao.result()
+        return email_sender.send_fasciculo(
+            destinatario=dest['email'],
+            fasciculo_info=fasciculo_info,
+            pdf_path=pdf_path,
+            mensagem_adicional=mensagem,
+            link_download=link_download
+        )
+    except Exception as e:
+        logger.exception(f"Exceção ao enviar para {dest['email']}")
+        return {
+            'success': False,
+            'destinatario': dest['email'],
+            'smtp_code': getattr(e, 'smtp_code', None),
+            'error': str(e)
+        }
+
+
+def enviar_grupo(email_sender, dests, fasciculo_info, pdf_path):
+    """
+    Envia o fascículo a um grupo de destinatários em uma única mensagem
+    (vários RCPT TO na mesma transação SMTP; executado em uma thread do pool)
+    
+    Returns:
+        Resultado de send_fasciculo_lote, com um resultado por destinatário em
+        `resultados`; exceções viram falha para todo o grupo
+    """
+    try:
+        return email_sender.send_fasciculo_lote(
+            destinatarios=[dest['email'] for dest in dests],
+            fasciculo_info=fasciculo_info,
+            pdf_path=pdf_path
+        )
+    except Exception as e:
+        logger.exception(f"Exceção ao enviar para grupo de {len(dests)} destinatário(s)")
+        falha = {
+            'success': False,
+            'smtp_code': getattr(e, 'smtp_code', None),
+            'error': str(e)
+        }
+        return {**falha, 'resultados': [{**falha, 'destinatario': dest['email']} for dest in dests]}
+
+
+def carregar_pendentes(db, envio_massa_id):
+    """
+    Reconstrói o trabalho restante de uma campanha a partir de envios_individuais
+    
+    Returns:
+        Lista de destinatários PENDENTE/ERRO com o registro e o hash já gerados
+    """
+    return [para_destinatario(row) for row in db.buscar_envios_pendentes(envio_massa_id)]
+
+
+def para_destinatario(row):
+    """Converte um registro de envios_individuais em item de envio"""
+    return {
+        'email': row['destinatario_email'],
+        'nome': row['destinatario_nome'] or '',
+        'envio_individual_id': row['id'],
+        'hash_envio_data': {
+            'hash_envio': row['hash_envio'],
+            'hash_verificacao': row['hash_verificacao']
+        },
+        # Envios com ERRO, retomados explicitamente, recomeçam as tentativas
+        'tentativas': 0 if row.get('status') == 'ERRO' else row.get('tentativas') or 0
+    }
+
+
+def envios_na_blockchain(blocos, hash_id):
+    """
+    Envios do fascículo já registrados na blockchain
+    
+    Args:
+        blocos: Blocos a examinar (ex: BlockchainAudit.novos_blocos(), que
+                inclui os diários ainda não consolidados dos outros workers)
+        hash_id: ID do hash do fascículo
+    
+    Returns:
+        Dicionário {hash_envio: timestamp UTC do bloco EMAIL_SENT}
+    """
+    return {
+        bloco.data['hash_envio']: bloco.timestamp
+        for bloco in blocos
+        if bloco.data.get('hash_id') == hash_id
+        and bloco.block_type == BlockType.EMAIL_SENT.value and bloco.data.get('hash_envio')
+    }
+
+
+def reconciliar_enviados(db, destinatarios, ja_enviados):
+    """
+    Marca como ENVIADO os pendentes cujo envio já consta na blockchain
+    
+    Os status vão ao banco em lote (StatusUpdateBuffer): se o processo caiu
+    antes da última gravação, o envio tem bloco EMAIL_SENT mas ainda consta
+    como PENDENTE.
+    
+    Args:
+        db: DatabaseManager
+        destinatarios: Destinatários carregados do banco (para_destinatario)
+        ja_enviados: Resultado de envios_na_blockchain()
+    
+    Returns:
+        Destinatários que ainda precisam ser enviados
+    """
+    destinatarios = list(destinatarios)
+    agora = datetime.utcnow()
+    restantes = []
+    atualizacoes = []
+    for dest in destinatarios:
+        enviado_em = ja_enviados.get(dest['hash_envio_data']['hash_envio'])
+        if enviado_em:
+            atraso = max(0, int((agora - datetime.fromisoformat(enviado_em)).total_seconds()))
+            atualizacoes.append((dest['envio_individual_id'], 'ENVIADO', atraso))
+        else:
+            restantes.append(dest)
+    
+    if not atualizacoes:
+        return destinatarios
+    if not db.atualizar_status_envios(atualizacoes):
+        # Sem a gravação, o banco segue com PENDENTE: melhor reenviar que omitir
+        return destinatarios
+    
+    print(f"  [OK] {len(atualizacoes)} envio(s) já registrado(s) na blockchain marcado(s) como ENVIADO")
+    logger.info(f"Reconciliados {len(atualizacoes)} envio(s) com a blockchain")
+    return restantes
 
 
-def enviar_em_massa(hash_id, arquivo_destinatarios, intervalo=1, lote_tamanho=100):
-    """Envia o mesmo fascículo para múltiplos destinatários"""
+def enviar_em_massa(hash_id=None, arquivo_destinatarios=None, intervalo=0, limites=None,
+                    workers=None, retomar=None, preparar=False, worker=None,
+                    tamanho_lote=None, lease=None, modo_entrega=None, agrupar=1, metricas=None,
+                    marca_dagua=None, backend=None):
+    """
+    Envia o mesmo fascículo para múltiplos destinatários
+    
+    O ritmo é controlado por um RateLimiter (janelas deslizantes) com as
+    quotas do provedor: os envios saem tão rápido quanto a quota permite e só
+    esperam quando uma janela (segundo/minuto/hora/dia) se esgota. Com
+    SMTP_QUOTA_COMPARTILHADA, a quota é somada no banco entre os workers e as
+    retomadas da campanha. Dentro da quota,
+    um AdaptiveThrottle (AIMD) ajusta o número de envios simultâneos e a taxa
+    conforme os códigos de resposta do servidor SMTP.
+    
+    Os destinatários são agrupados por domínio e intercalados em round-robin
+    por um DomainScheduler, com concorrência e quotas próprias por domínio:
+    um domínio que recusa temporariamente é suspenso sem parar os demais.
+    
+    Os envios SMTP rodam em um pool de threads; banco e blockchain são
+    atualizados apenas pela thread principal, à medida que os envios terminam.
+    
+    Falhas temporárias (4xx, conexão) não bloqueiam o laço: o envio vai para
+    uma RetryQueue com espera exponencial (RETRY_CONFIG) e volta à fila do
+    seu domínio quando a espera termina, intercalado com os demais. O número
+    de tentativas fica em envios_individuais; esgotadas as tentativas, ou em
+    falhas definitivas (5xx), o envio é marcado como ERRO.
+    
+    Todos os destinatários são registrados como PENDENTE em envios_individuais
+    antes do primeiro envio. Se o processo for interrompido, a campanha pode
+    ser retomada com `retomar=<envio_massa_id>`: apenas os registros PENDENTE
+    e ERRO são reenviados, no mesmo registro de envios_massa.
+    
+    Para dividir uma campanha entre vários processos (inclusive em hosts
+    diferentes), ela é registrada com `preparar=True` e cada processo roda
+    com `retomar=<envio_massa_id>` e um `worker` distinto: em vez de carregar
+    todos os pendentes, o worker reivindica lotes no banco com lease; lotes
+    de um worker que caiu voltam ao pool quando o lease expira.
+    
+    Com `modo_entrega='link'` o PDF não vai anexado: ele é publicado uma única
+    vez em PUBLICACAO_DIR e cada email leva um link de download com token
+    próprio (derivado do hash_envio) e o checksum SHA-256 do arquivo.
+    
+    Com `agrupar` > 1 (campanhas sem personalização) uma mesma mensagem é
+    entregue a até `agrupar` destinatários, com um RCPT TO para cada: corpo e
+    anexo trafegam uma vez por grupo. A aceitação de cada RCPT continua
+    registrada por destinatário em envios_individuais e na blockchain.
+    
+    Com `marca_dagua` cada destinatário recebe uma cópia do PDF com seu
+    hash_envio em todas as páginas. O PDF é lido uma vez por um
+    PdfWatermarker e as cópias são geradas em um pool de processos à frente
+    dos envios, em cache em MARCA_DAGUA_DIR/<hash_envio>.pdf.
+    
+    Com `backend='spool'` ou `'sendmail'` as mensagens são entregues ao MTA
+    local (arquivo maildir ou processo sendmail) em vez de sessões SMTP; o
+    envio é marcado como ENVIADO quando o MTA aceita a mensagem, e o MTA
+    cuida da fila e das novas tentativas com os servidores de destino.
+    
+    Args:
+        hash_id: ID do hash do fascículo (ignorado ao retomar)
+        arquivo_destinatarios: Arquivo com a lista de destinatários (ignorado ao retomar)
+        intervalo: Espaçamento mínimo em segundos entre envios (0 = nenhum)
+        limites: Quotas por janela (padrão: RATE_LIMITS do config)
+        workers: Máximo de envios simultâneos (padrão: THROTTLE_CONFIG do config)
+        retomar: ID de envios_massa de uma campanha interrompida
+        preparar: Apenas registra a campanha e os envios PENDENTE, sem enviar
+        worker: Identificador deste processo ao dividir a campanha (com retomar)
+        tamanho_lote: Envios reivindicados por vez pelo worker (padrão: WORKER_CONFIG)
+        lease: Validade da reivindicação em segundos (padrão: WORKER_CONFIG)
+        modo_entrega: 'anexo' ou 'link' (padrão: MODO_ENTREGA do config)
+        agrupar: Destinatários por mensagem (1 = uma mensagem personalizada por destinatário)
+        metricas: Hook de métricas repassado ao EmailSender, que registra a duração
+                  de cada fase SMTP (opcional, ex: Metricas do benchmark)
+        marca_dagua: Anexa a cada destinatário uma cópia marcada com seu hash_envio
+                     (padrão: MARCA_DAGUA do config)
+        backend: 'smtp', 'spool' ou 'sendmail' (padrão: ENTREGA_BACKEND do config)
+    """
+    limites = RATE_LIMITS if limites is None else limites
+    modo_entrega = modo_entrega or MODO_ENTREGA
+    marca_dagua = MARCA_DAGUA if marca_dagua is None else marca_dagua
+    backend = backend or SMTP_CONFIG['backend']
+    workers = workers or THROTTLE_CONFIG['concorrencia_max']
+    tamanho_lote = tamanho_lote or WORKER_CONFIG['tamanho_lote']
+    lease = lease or WORKER_CONFIG['lease_segundos']
     
     logger.info("=" * 70)
     logger.info("ENVIO EM MASSA DE FASCÍCULO")
-    logger.info(f"Hash ID: {hash_id}, Arquivo: {arquivo_destinatarios}")
+    if retomar:
+        logger.info(f"Retomando envio em massa ID: {retomar}")
+    else:
+        logger.info(f"Hash ID: {hash_id}, Arquivo: {arquivo_destinatarios}")
     logger.info("=" * 70)
     
     print("=" * 70)
     print("ENVIO EM MASSA DE FASCÍCULO")
     print("=" * 70)
-    print(f"\nHash ID: {hash_id}")
-    print(f"Arquivo de destinatários: {arquivo_destinatarios}")
-    print(f"Intervalo entre envios: {intervalo}s")
-    print(f"Tamanho do lote: {lote_tamanho} emails\n")
+    if retomar:
+        print(f"\nRetomando envio em massa ID: {retomar}")
+        if worker:
+            print(f"Worker: {worker} (lotes de {tamanho_lote}, lease de {lease}s)")
+    else:
+        print(f"\nHash ID: {hash_id}")
+        print(f"Arquivo de destinatários: {arquivo_destinatarios}")
+    quotas = ', '.join(f"{v}/{k}" for k, v in limites.items() if v) or 'sem limite'
+    print(f"Quotas de envio: {quotas}")
+    print(f"Intervalo mínimo entre envios: {intervalo}s")
+    print(f"Envios simultâneos (máximo): {workers}")
+    print(f"Modo de entrega: {modo_entrega}")
+    if backend != 'smtp':
+        print(f"Entrega ao MTA local: {backend}")
+    if agrupar > 1:
+        print(f"Destinatários por mensagem: até {agrupar} (sem personalização)")
+    if marca_dagua:
+        print("Marca d'água: hash_envio em cada página do PDF")
+    print()
+    
+    db = criar_database_manager()
+    envio_massa_id = None
+    blockchain = None
     
     try:
-        # Validar hash ID
-        validar_ou_erro(Validator.validar_hash_id, hash_id)
-        
-        # Validar intervalo e lote
+        # Validar intervalo
         validar_ou_erro(Validator.validar_intervalo, intervalo)
-        validar_ou_erro(Validator.validar_lote, lote_tamanho)
+        if agrupar > 1 and modo_entrega == 'link':
+            raise ValueError("Entrega por link é pessoal: não pode ser agrupada")
+        if backend not in ('smtp', 'spool', 'sendmail'):
+            raise ValueError(f"Backend de entrega inválido: {backend}")
+        if marca_dagua and (agrupar > 1 or modo_entrega == 'link'):
+            raise ValueError("Marca d'água exige uma mensagem por destinatário com o PDF anexado")
         
-        # Carrega destinatários
-        print("[1/6] Carregando lista de destinatários...")
-        logger.info("Carregando destinatários...")
+        # Com SMTP_RELAYS, os envios são distribuídos entre os relays
+        roteador = RelayRouter(
+            SMTP_RELAYS, SMTP_CONFIG, db=db if QUOTA_COMPARTILHADA else None
+        ) if SMTP_RELAYS and backend == 'smtp' else None
+        if roteador and roteador.capacidade_grupo is not None and agrupar > roteador.capacidade_grupo:
+            raise ValueError(
+                f"Grupos de {agrupar} destinatários excedem a menor quota dos relays SMTP "
+                f"({roteador.capacidade_grupo}): use --agrupar {roteador.capacidade_grupo} ou menos"
+            )
         
-        destinatarios = carregar_destinatarios(arquivo_destinatarios)
-        print(f"  [OK] {len(destinatarios)} destinatário(s) válido(s)")
-        logger.info(f"[OK] {len(destinatarios)} destinatários carregados")
+        if retomar:
+            # Reconstrói o trabalho restante a partir do banco
+            print("[1/6] Carregando envios pendentes da campanha...")
+            logger.info(f"Carregando envios pendentes da campanha {retomar}...")
+            
+            if not db.connect():
+                print("  [ERRO] Retomada exige conexão com o banco de dados")
+                logger.error("Retomada sem conexão com o MySQL")
+                return
+            
+            campanha = db.buscar_envio_massa(retomar)
+            if not campanha:
+                print(f"  [ERRO] Envio em massa não encontrado: {retomar}")
+                logger.error(f"Envio em massa não encontrado: {retomar}")
+                db.disconnect()
+                return
+            
+            envio_massa_id = campanha['id']
+            hash_id = campanha['hash_id']
+            total = campanha['total_destinatarios']
+            if worker:
+                # O worker reivindica lotes durante o envio
+                destinatarios = []
+                pendentes = db.contar_envios_por_status(envio_massa_id).get('PENDENTE', 0)
+            else:
+                destinatarios = carregar_pendentes(db, envio_massa_id)
+                pendentes = len(destinatarios)
+            ja_processados = total - pendentes
+            
+            print(f"  [OK] Hash ID: {hash_id}")
+            print(f"  [OK] {ja_processados}/{total} já enviado(s), {pendentes} pendente(s)")
+            logger.info(f"[OK] {pendentes} pendentes de {total} na campanha {envio_massa_id}")
+            
+            if pendentes == 0:
+                print("  [OK] Nada a retomar: todos os destinatários já foram enviados")
+                if campanha['status'] != 'CONCLUIDO':
+                    contagem = db.contar_envios_por_status(envio_massa_id)
+                    db.finalizar_envio_massa(
+                        envio_massa_id,
+                        contagem.get('ENVIADO', 0) + contagem.get('CONFIRMADO', 0),
+                        contagem.get('ERRO', 0),
+                        0
+                    )
+                db.disconnect()
+                return
+        else:
+            # Carrega destinatários
+            print("[1/6] Carregando lista de destinatários...")
+            logger.info("Carregando destinatários...")
+            
+            destinatarios = carregar_destinatarios(arquivo_destinatarios)
+            total = len(destinatarios)
+            ja_processados = 0
+            pendentes = total
+            print(f"  [OK] {len(destinatarios)} destinatário(s) válido(s)")
+            logger.info(f"[OK] {len(destinatarios)} destinatários carregados")
+            
+            if len(destinatarios) == 0:
+                print("  [ERRO] Nenhum destinatário válido encontrado")
+                logger.error("Nenhum destinatário válido")
+                return
         
-        if len(destinatarios) == 0:
-            print("  [ERRO] Nenhum destinatário válido encontrado")
-            logger.error("Nenhum destinatário válido")
-            return
+        # Validar hash ID
+        validar_ou_erro(Validator.validar_hash_id, hash_id)
         
         # Carrega arquivo de hash
         hash_file = Path('data') / f"hash_{hash_id}.json"
@@ -163,13 +482,31 @@ def enviar_em_massa(hash_id, arquivo_destinatarios, intervalo=1, lote_tamanho=10
         logger.info("Inicializando componentes...")
         
         crypto = CryptoManager(ENCRYPTION_KEY_PATH)
-        blockchain = BlockchainAudit(BLOCKCHAIN_PATH)
-        email_sender = EmailSender(SMTP_CONFIG)
-        db = DatabaseManager()
+        # Vários processos podem gravar na mesma blockchain ao dividir a campanha
+        blockchain = BlockchainAudit(BLOCKCHAIN_PATH, compartilhada=bool(worker or preparar))
+        email_sender = EmailSender({**SMTP_CONFIG, 'backend': backend}, roteador=roteador, metricas=metricas)
+        # Quota da conta somada no banco com a dos outros workers e execuções
+        quota = QuotaCompartilhada(
+            db, f"{backend}:{SMTP_CONFIG['user']}@{SMTP_CONFIG['server']}"
+        ) if QUOTA_COMPARTILHADA else None
+        limiter = RateLimiter(limites, intervalo_minimo=intervalo, compartilhada=quota)
+        throttle = AdaptiveThrottle(
+            concorrencia_max=workers,
+            taxa_inicial=THROTTLE_CONFIG['taxa_inicial'],
+            taxa_max=THROTTLE_CONFIG['taxa_max']
+        )
         
         print("  [OK] Componentes inicializados")
         logger.info("[OK] Componentes inicializados")
         
+        # Na retomada, envios que constam na blockchain mas cujo status não
+        # chegou ao banco (processo interrompido antes da gravação em lote)
+        ja_enviados = envios_na_blockchain(blockchain.novos_blocos(), hash_id) if retomar else {}
+        if destinatarios and ja_enviados:
+            destinatarios = reconciliar_enviados(db, destinatarios, ja_enviados)
+            ja_processados += pendentes - len(destinatarios)
+            pendentes = len(destinatarios)
+        
         # Carrega e descriptografa hash
         print("\n[3/6] Carregando informações do fascículo...")
         logger.info("Carregando fascículo...")
@@ -185,7 +522,13 @@ def enviar_em_massa(hash_id, arquivo_destinatarios, intervalo=1, lote_tamanho=10
         
         # Verifica PDF
         pdf_path = Path(decrypted_info['pdf_path'])
+        publicacao = None
+        marcador = None
         if not pdf_path.exists():
+            if modo_entrega == 'link':
+                logger.error(f"PDF não encontrado para entrega por link: {pdf_path}")
+                print(f"\n[ERRO] Erro: Entrega por link exige o PDF: {pdf_path}")
+                return
             logger.warning(f"PDF não encontrado: {pdf_path}")
             print(f"\n[AVISO] Aviso: PDF não encontrado em {pdf_path}")
             print(f"  O email será enviado sem anexo")
@@ -198,29 +541,82 @@ def enviar_em_massa(hash_id, arquivo_destinatarios, intervalo=1, lote_tamanho=10
                 return
             pdf_size_mb = pdf_path.stat().st_size / (1024 * 1024)
             print(f"  [OK] PDF encontrado ({pdf_size_mb:.2f} MB)")
+            
+            if modo_entrega == 'link':
+                # Publica uma única vez; cada email leva só o link pessoal
+                publisher = LinkPublisher(PUBLICACAO_DIR, PUBLICACAO_URL_BASE, LINK_KEY_PATH)
+                publicacao = publisher.publicar(pdf_path)
+                print(f"  [OK] PDF publicado: {publicacao['url']}")
+                print(f"  [OK] SHA-256: {publicacao['checksum']}")
+                logger.info(f"PDF publicado em {publicacao['caminho']} (SHA-256 {publicacao['checksum']})")
+            
+            if marca_dagua and not preparar:
+                # Lê o PDF uma vez; as cópias por destinatário só acrescentam a marca
+                marcador = PdfWatermarker(pdf_path, MARCA_DAGUA_DIR)
+                print(f"  [OK] Marca d'água preparada ({marcador.paginas} página(s), cópias em {MARCA_DAGUA_DIR})")
+                logger.info(f"Marca d'água preparada para {pdf_path} ({marcador.paginas} páginas)")
+        
+        hash_gen = HashGenerator()
         
         # Registra início no MySQL
         print("\n[4/6] Registrando início no banco de dados...")
         logger.info("Registrando início no MySQL...")
         
-        envio_massa_id = None
-        if db.connect():
-            try:
-                cursor = db.connection.cursor()
-                query = """
-                    INSERT INTO envios_massa 
-                    (hash_id, total_destinatarios, status)
-                    VALUES (%s, %s, 'EM_ANDAMENTO')
-                """
-                cursor.execute(query, (hash_id, len(destinatarios)))
-                envio_massa_id = cursor.lastrowid
-                cursor.close()
+        if retomar:
+            db.atualizar_status_envio_massa(envio_massa_id, 'EM_ANDAMENTO')
+            print(f"  [OK] Continuando envio em massa (ID: {envio_massa_id})")
+            logger.info(f"[OK] Envio em massa {envio_massa_id} retomado")
+        elif db.connect():
+            envio_massa_id = db.criar_envio_massa(hash_id, len(destinatarios))
+            if envio_massa_id:
                 print(f"  [OK] Registrado no MySQL (ID: {envio_massa_id})")
                 logger.info(f"[OK] Envio em massa registrado no MySQL (ID: {envio_massa_id})")
-            except Exception as e:
-                logger.warning(f"Erro ao registrar no MySQL: {e}")
+                
+                # Pré-registra todos os destinatários como PENDENTE para permitir retomada
+                hashes_envio = [
+                    hash_gen.gerar_hash_envio(hash_fasciculo=hash_id, destinatario_email=dest['email'])
+                    for dest in destinatarios
+                ]
+                ids = db.inserir_envios_individuais(
+                    hash_fasciculo=hash_id,
+                    envio_massa_id=envio_massa_id,
+                    envios=[
+                        {
+                            'hash_envio': hash_envio_data['hash_envio'],
+                            'hash_verificacao': hash_envio_data['hash_verificacao'],
+                            'destinatario_email': dest['email'],
+                            'destinatario_nome': dest.get('nome', '')
+                        }
+                        for dest, hash_envio_data in zip(destinatarios, hashes_envio)
+                    ]
+                )
+                if ids is None:
+                    # Nada foi gravado (transação única); seguir sem o pré-registro
+                    # inseriria cada destinatário de novo, fora da campanha
+                    logger.error("Pré-registro de envios falhou - campanha abortada")
+                    print("  [ERRO] Não foi possível pré-registrar os envios "
+                          "(execute migrations/add_envio_massa_id.py)")
+                    db.atualizar_status_envio_massa(envio_massa_id, 'ERRO')
+                    db.disconnect()
+                    return
+                else:
+                    for dest, hash_envio_data in zip(destinatarios, hashes_envio):
+                        dest['envio_individual_id'] = ids[hash_envio_data['hash_envio']]
+                        dest['hash_envio_data'] = hash_envio_data
+                    print(f"  [OK] {len(destinatarios)} envio(s) pré-registrado(s) como PENDENTE")
+                    if not preparar:
+                        print(f"  Para retomar se interrompido: python envio_massa.py --retomar {envio_massa_id}")
+            else:
                 print(f"  [AVISO] Aviso: Erro ao registrar no MySQL (continuando)")
         
+        if preparar and not all('envio_individual_id' in dest for dest in destinatarios):
+            print("  [ERRO] Preparação exige o banco de dados com os envios pré-registrados")
+            logger.error("Preparação sem pré-registro completo dos envios")
+            if envio_massa_id:
+                db.atualizar_status_envio_massa(envio_massa_id, 'ERRO')
+            db.disconnect()
+            return
+        
         # Registra início na blockchain
         print("[5/6] Registrando início na blockchain...")
         blockchain.add_block(
@@ -228,143 +624,341 @@ def enviar_em_massa(hash_id, arquivo_destinatarios, intervalo=1, lote_tamanho=10
                 'hash_id': hash_id,
                 'edicao': encrypted_info['edicao'],
                 'fasciculo': encrypted_info['fasciculo'],
-                'total_destinatarios': len(destinatarios),
+                'total_destinatarios': total,
+                'pendentes': len(destinatarios),
                 'envio_massa_id': envio_massa_id,
-                'action': 'Início de envio em massa'
+                'worker': worker,
+                'modo_entrega': modo_entrega,
+                'marca_dagua': bool(marca_dagua),
+                'backend': backend,
+                'publicacao': {
+                    'url': publicacao['url'],
+                    'checksum': publicacao['checksum'],
+                    'tamanho': publicacao['tamanho']
+                } if publicacao else None,
+                'action': (
+                    f'Worker {worker} iniciado' if worker else
+                    'Retomada de envio em massa' if retomar else
+                    'Preparação de envio em massa' if preparar else
+                    'Início de envio em massa'
+                )
             },
             block_type=BlockType.HASH_DECRYPTED
         )
         print("  [OK] Registrado na blockchain")
         logger.info("[OK] Início registrado na blockchain")
         
+        if preparar:
+            db.disconnect()
+            print(f"\n[OK] Campanha {envio_massa_id} preparada com {total} envio(s) PENDENTE")
+            print("\nInicie um ou mais workers (em qualquer host com acesso ao banco):")
+            print(f"  python envio_massa.py --retomar {envio_massa_id} --worker <nome>")
+            logger.info(f"Campanha {envio_massa_id} preparada ({total} envios)")
+            return envio_massa_id
+        
         # Envio em massa
         print("\n[6/6] Enviando para destinatários...")
         print("-" * 70)
-        logger.info(f"Iniciando envio para {len(destinatarios)} destinatários...")
+        logger.info(f"Iniciando envio para {pendentes} destinatários...")
         
         enviados = 0
         erros = 0
+        reenvios = 0
+        erros_esgotados = 0
         inicio = time.time()
+        fila_reenvio = RetryQueue(**RETRY_CONFIG)
+        # Duração das fases SMTP por mensagem (tempos_ms dos resultados)
+        tempos_smtp = Metricas()
         
-        for i, dest in enumerate(destinatarios, 1):
-            email = dest['email']
-            nome = dest.get('nome', '')
-            
-            mensagem = f"Prezado(a) {nome},\n\n" if nome else None
-            
-            print(f"[{i}/{len(destinatarios)}] Enviando para: {email}", end='')
-            if nome:
-                print(f" ({nome})", end='')
-            print("...", end='', flush=True)
-            
-            # ===== GERAR HASH INDIVIDUAL DE ENVIO =====
-            hash_gen = HashGenerator()
-            hash_envio_data = hash_gen.gerar_hash_envio(
-                hash_fasciculo=hash_id,
-                destinatario_email=email
-            )
+        agendador = DomainScheduler(DOMINIO_LIMITES_PADRAO, DOMINIO_LIMITES)
+        for i, dest in enumerate(destinatarios, ja_processados + 1):
+            agendador.adicionar((i, dest), dest['email'])
+        em_andamento = {}
+        aviso_quota = False
+        
+        # Estado do worker: lotes reivindicados, renovação do lease e fim do trabalho
+        recebidos = ja_processados
+        esgotado = not worker
+        proxima_reivindicacao = 0.0
+        proxima_renovacao = time.monotonic() + lease / 3
+        
+        # Cópias com marca d'água: geradas em processos separados, à frente dos envios,
+        # com no máximo concorrencia_max cópias prontas além das em envio
+        marcacoes = {}
+        
+        # Status ENVIADO/ERRO e logs_eventos gravados em lote, fora do laço de envio
+        with ThreadPoolExecutor(max_workers=throttle.concorrencia_max) as executor, \
+                (marcador.criar_pool(MARCA_DAGUA_PROCESSOS) if marcador else nullcontext()) as pool_marcacao, \
+                StatusUpdateBuffer(db, **STATUS_BUFFER_CONFIG) as status_envios, \
+                EventLogWriter(db, metricas=metricas, **EVENT_LOG_CONFIG) as log_eventos:
             
-            # Registrar envio individual no banco ANTES de enviar
-            envio_individual_id = None
-            if db.connection and db.connection.is_connected():
-                envio_individual_id = db.inserir_envio_individual(
-                    hash_fasciculo=hash_id,
-                    hash_envio=hash_envio_data['hash_envio'],
-                    destinatario_email=email,
-                    destinatario_nome=nome,
-                    hash_verificacao=hash_envio_data['hash_verificacao']
-                )
+            def agendar_marcacao(dest):
+                """Agenda (uma vez) a cópia marcada do destinatário no pool de processos"""
+                hash_envio = dest['hash_envio_data']['hash_envio']
+                if hash_envio not in marcacoes:
+                    marcacoes[hash_envio] = marcador.agendar(pool_marcacao, hash_envio)
+                return marcacoes[hash_envio]
             
-            try:
-                result = enviar_email_com_retry(
-                    email_sender=email_sender,
-                    destinatario=email,
-                    fasciculo_info=decrypted_info,
-                    pdf_path=pdf_path,
-                    mensagem=mensagem
-                )
+            while agendador.pendentes or em_andamento or fila_reenvio or not esgotado:
+                espera = 0
                 
-                if result['success']:
-                    print(f" [OK] Hash: {hash_envio_data['hash_envio'][:16]}...")
-                    enviados += 1
-                    logger.info(f"[OK] Email enviado para {email} ({i}/{len(destinatarios)}) - Hash: {hash_envio_data['hash_envio']}")
+                # Reenvios cuja espera terminou voltam à fila do domínio
+                for item in fila_reenvio.prontos():
+                    agendador.adicionar(item, item[1]['email'])
+                
+                if not esgotado:
+                    agora = time.monotonic()
                     
-                    # Atualizar status do envio individual para ENVIADO
-                    if envio_individual_id and db.connection and db.connection.is_connected():
-                        db.atualizar_status_envio(envio_individual_id, 'ENVIADO')
+                    # Mantém um pequeno estoque local; o resto fica disponível aos outros workers
+                    if agendador.pendentes < throttle.concorrencia_max and agora >= proxima_reivindicacao:
+                        lote = db.reivindicar_lote(envio_massa_id, worker, tamanho_lote, lease)
+                        if lote:
+                            # Um worker que caiu depois do início deste pode ter enviado parte
+                            # do lote sem gravar o status: soma os blocos novos da cadeia e dos diários
+                            ja_enviados.update(envios_na_blockchain(blockchain.novos_blocos(), hash_id))
+                        for dest in reconciliar_enviados(db, map(para_destinatario, lote), ja_enviados):
+                            recebidos += 1
+                            agendador.adicionar((recebidos, dest), dest['email'])
+                        
+                        if lote:
+                            logger.info(f"Worker {worker} reivindicou {len(lote)} envio(s)")
+                        elif not agendador.pendentes and not em_andamento:
+                            # Sem lote livre: termina se nada mais está PENDENTE, senão
+                            # aguarda leases de outros workers (que podem ter caído) expirarem
+                            if not db.contar_envios_por_status(envio_massa_id).get('PENDENTE', 0):
+                                esgotado = True
+                                continue
+                            proxima_reivindicacao = agora + ESPERA_REIVINDICACAO
+                        else:
+                            proxima_reivindicacao = agora + ESPERA_REIVINDICACAO
                     
-                    # Registra na blockchain
-                    blockchain.add_block(
-                        data={
-                            'hash_id': hash_id,
-                            'hash_envio': hash_envio_data['hash_envio'],
-                            'edicao': encrypted_info['edicao'],
-                            'fasciculo': encrypted_info['fasciculo'],
-                            'destinatario': email,
-                            'nome_destinatario': nome,
-                            'numero_envio': i,
-                            'total_envios': len(destinatarios),
-                            'action': f'Email enviado ({i}/{len(destinatarios)})'
-                        },
-                        block_type=BlockType.EMAIL_SENT
-                    )
+                    if agora >= proxima_renovacao:
+                        db.renovar_lease(envio_massa_id, worker, lease)
+                        proxima_renovacao = agora + lease / 3
+                
+                # Despacha enquanto houver vaga na concorrência atual e quota disponível
+                while agendador.pendentes and len(em_andamento) < throttle.concorrencia:
+                    espera = max(limiter.tempo_ate_recarga(), throttle.tempo_ate_liberacao())
+                    if espera > 0:
+                        break
                     
-                    # Registra no MySQL (logs_eventos)
-                    if db.connection and db.connection.is_connected():
-                        db.inserir_log_evento(
-                            hash_id=hash_id,
-                            evento_tipo='EMAIL_SENT',
-                            destinatario=email,
-                            nome_destinatario=nome,
-                            dados_adicionais={
-                                'numero_envio': i,
-                                'total_envios': len(destinatarios),
-                                'envio_massa_id': envio_massa_id,
-                                'hash_envio': hash_envio_data['hash_envio'],
-                                'hash_verificacao': hash_envio_data['hash_verificacao']
-                            }
-                        )
-                else:
-                    print(f" [ERRO] Erro: {result.get('error', 'Desconhecido')}")
-                    erros += 1
-                    logger.error(f"[ERRO] Erro ao enviar para {email}: {result.get('error')}")
+                    # Próximo destinatário de um domínio liberado (round-robin)
+                    item = agendador.proximo()
+                    if item is None:
+                        espera = agendador.tempo_ate_disponivel()
+                        break
                     
-                    # Atualizar status do envio individual para ERRO
-                    if envio_individual_id and db.connection and db.connection.is_connected():
-                        db.atualizar_status_envio(envio_individual_id, 'ERRO', data_envio=False)
-            
-            except Exception as e:
-                print(f" [ERRO] Exceção: {e}")
-                erros += 1
-                logger.exception(f"Exceção ao enviar para {email}")
+                    if not limiter.tentar_adquirir():
+                        # A quota compartilhada foi usada por outro worker
+                        agendador.devolver(item, item[1]['email'])
+                        espera = limiter.tempo_ate_recarga()
+                        break
+                    
+                    geracao = throttle.liberar()
+                    aviso_quota = False
+                    
+                    # Campanha sem personalização: completa a mensagem com mais destinatários
+                    grupo = [item]
+                    while len(grupo) < agrupar and agendador.pendentes and limiter.tempo_ate_recarga() == 0:
+                        item = agendador.proximo()
+                        if item is None:
+                            break
+                        if not limiter.tentar_adquirir():
+                            agendador.devolver(item, item[1]['email'])
+                            break
+                        grupo.append(item)
+                    
+                    envios = []
+                    for i, dest in grupo:
+                        if 'envio_individual_id' in dest:
+                            # Já registrado (pré-registro ou retomada)
+                            hash_envio_data = dest['hash_envio_data']
+                            envio_individual_id = dest['envio_individual_id']
+                        else:
+                            # ===== GERAR HASH INDIVIDUAL DE ENVIO =====
+                            hash_envio_data = hash_gen.gerar_hash_envio(
+                                hash_fasciculo=hash_id,
+                                destinatario_email=dest['email']
+                            )
+                            
+                            # Registrar envio individual no banco ANTES de enviar
+                            envio_individual_id = None
+                            if db.connection and db.connection.is_connected():
+                                envio_individual_id = db.inserir_envio_individual(
+                                    hash_fasciculo=hash_id,
+                                    hash_envio=hash_envio_data['hash_envio'],
+                                    destinatario_email=dest['email'],
+                                    destinatario_nome=dest.get('nome', ''),
+                                    hash_verificacao=hash_envio_data['hash_verificacao']
+                                )
+                            
+                            # Um reenvio reutiliza o mesmo hash e registro
+                            dest['hash_envio_data'] = hash_envio_data
+                            dest['envio_individual_id'] = envio_individual_id
+                        
+                        link_download = None
+                        if publicacao:
+                            link_download = publisher.link_envio(publicacao, hash_envio_data['hash_envio'])
+                        
+                        envios.append((i, dest, hash_envio_data, envio_individual_id, link_download))
+                    
+                    if agrupar > 1:
+                        futuro = executor.submit(
+                            enviar_grupo, email_sender, [dest for _, dest in grupo], decrypted_info, pdf_path
+                        )
+                    else:
+                        futuro = executor.submit(
+                            enviar_destinatario, email_sender, dest, decrypted_info, pdf_path, link_download,
+                            agendar_marcacao(dest) if marcador else None
+                        )
+                    em_andamento[futuro] = (geracao, envios)
                 
-                # Atualizar status do envio individual para ERRO
-                if envio_individual_id and db.connection and db.connection.is_connected():
-                    db.atualizar_status_envio(envio_individual_id, 'ERRO', data_envio=False)
-            
-            # Intervalo entre envios
-            if i < len(destinatarios):
-                if i % lote_tamanho == 0:
-                    pausa = intervalo * 5
-                    print(f"\n⏸ Pausa de {pausa}s após {lote_tamanho} envios...")
-                    logger.info(f"Pausa de {pausa}s após lote de {lote_tamanho}")
-                    time.sleep(pausa)
-                else:
-                    time.sleep(intervalo)
-
-            
-            # Intervalo entre envios
-            if i < len(destinatarios):
-                if i % lote_tamanho == 0:
-                    pausa = intervalo * 5
-                    print(f"\n⏸ Pausa de {pausa}s após {lote_tamanho} envios...")
-                    logger.info(f"Pausa de {pausa}s após lote de {lote_tamanho}")
-                    time.sleep(pausa)
-                else:
-                    time.sleep(intervalo)
+                # Marca os próximos destinatários enquanto os atuais são enviados
+                if marcador:
+                    for _, dest in agendador.proximos(throttle.concorrencia_max):
+                        if len(marcacoes) - len(em_andamento) >= throttle.concorrencia_max:
+                            break
+                        if dest.get('hash_envio_data'):
+                            agendar_marcacao(dest)
+                
+                # Aguarda a quota do provedor liberar o próximo envio
+                if espera and espera >= 1 and limiter.tempo_ate_recarga() >= 1 and not aviso_quota:
+                    aviso_quota = True
+                    print(f"⏸ Quota de envio atingida, aguardando {espera:.0f}s para recarga...")
+                    logger.info(f"Quota atingida - aguardando {espera:.1f}s ({limiter.status()})")
+                
+                if not em_andamento:
+                    if not agendador.pendentes:
+                        espera = None if esgotado else max(0.0, proxima_reivindicacao - time.monotonic())
+                    # Não dorme além do próximo reenvio agendado
+                    espera = min((e for e in (espera, fila_reenvio.tempo_ate_proximo()) if e is not None), default=0)
+                    time.sleep(espera)
+                    continue
+                
+                espera = min((e for e in (espera or None, fila_reenvio.tempo_ate_proximo()) if e is not None), default=None)
+                concluidos, _ = wait(em_andamento, timeout=espera, return_when=FIRST_COMPLETED)
+                
+                for futuro in concluidos:
+                    geracao, envios = em_andamento.pop(futuro)
+                    resultado = futuro.result()
+                    
+                    if throttle.registrar_resultado(resultado, geracao):
+                        status_throttle = throttle.status()
+                        print(f"⚠ Servidor respondeu {resultado.get('smtp_code')}: reduzindo para "
+                              f"{status_throttle['concorrencia']} envio(s) simultâneo(s) e "
+                              f"{status_throttle['taxa_por_segundo']} envios/s")
+                        logger.warning(f"Backoff AIMD após código {resultado.get('smtp_code')}: {status_throttle}")
+                    
+                    for fase, ms in (resultado.get('tempos_ms') or {}).items():
+                        tempos_smtp.registrar(fase, ms / 1000)
+                    
+                    # Uma mensagem agrupada traz um resultado por destinatário (RCPT TO)
+                    resultados = resultado.get('resultados', [resultado])
+                    for (i, dest, hash_envio_data, envio_individual_id, link_download), result in zip(envios, resultados):
+                        email = dest['email']
+                        nome = dest.get('nome', '')
+                        
+                        # A cópia marcada só existe enquanto o envio está pendente; um
+                        # reenvio gera outra quando voltar a ser despachado
+                        if marcacoes.pop(hash_envio_data['hash_envio'], None):
+                            marcador.descartar(hash_envio_data['hash_envio'])
+                        
+                        suspensao = agendador.concluir(email, result)
+                        if suspensao:
+                            print(f"⏸ Domínio de {email} recusou com {result.get('smtp_code')}: "
+                                  f"suspenso por {suspensao:.0f}s (demais domínios continuam)")
+                            logger.warning(f"Domínio de {email} suspenso por {suspensao:.0f}s após código {result.get('smtp_code')}")
+                        
+                        print(f"[{i}/{total}] {email}", end='')
+                        if nome:
+                            print(f" ({nome})", end='')
+                        
+                        if result['success']:
+                            print(f" [OK] Hash: {hash_envio_data['hash_envio'][:16]}...")
+                            enviados += 1
+                            logger.info(f"[OK] Email enviado para {email} ({i}/{total}) - Hash: {hash_envio_data['hash_envio']}")
+                            
+                            # Atualizar status do envio individual para ENVIADO
+                            if envio_individual_id and db.connection and db.connection.is_connected():
+                                status_envios.registrar(envio_individual_id, 'ENVIADO')
+                            
+                            # Registra na blockchain
+                            blockchain.add_block(
+                                data={
+                                    'hash_id': hash_id,
+                                    'hash_envio': hash_envio_data['hash_envio'],
+                                    'edicao': encrypted_info['edicao'],
+                                    'fasciculo': encrypted_info['fasciculo'],
+                                    'destinatario': email,
+                                    'nome_destinatario': nome,
+                                    'numero_envio': i,
+                                    'total_envios': total,
+                                    'link_token': link_download['token'] if link_download else None,
+                                    'marca_dagua': marcador is not None,
+                                    'destinatarios_mensagem': len(envios),
+                                    'action': f'Email enviado ({i}/{total})'
+                                },
+                                block_type=BlockType.EMAIL_SENT
+                            )
+                            
+                            # Registra no MySQL (logs_eventos)
+                            if db.connection and db.connection.is_connected():
+                                log_eventos.registrar(
+                                    hash_id=hash_id,
+                                    evento_tipo='EMAIL_SENT',
+                                    destinatario=email,
+                                    nome_destinatario=nome,
+                                    dados_adicionais={
+                                        'numero_envio': i,
+                                        'total_envios': total,
+                                        'envio_massa_id': envio_massa_id,
+                                        'hash_envio': hash_envio_data['hash_envio'],
+                                        'hash_verificacao': hash_envio_data['hash_verificacao'],
+                                        'link_token': link_download['token'] if link_download else None,
+                                        'marca_dagua': marcador is not None,
+                                        'destinatarios_mensagem': len(envios),
+                                        'relay': result.get('relay')
+                                    }
+                                )
+                        else:
+                            tentativas = dest.get('tentativas', 0) + 1
+                            dest['tentativas'] = tentativas
+                            espera_reenvio = None
+                            transitoria = falha_transitoria(result)
+                            if transitoria:
+                                espera_reenvio = fila_reenvio.agendar((i, dest), tentativas)
+                            
+                            if envio_individual_id and db.connection and db.connection.is_connected():
+                                db.registrar_tentativa(envio_individual_id, tentativas, espera_reenvio)
+                            
+                            if espera_reenvio is not None:
+                                # Falha temporária: continua PENDENTE e volta depois da espera
+                                print(f" [AVISO] {result.get('error', 'Desconhecido')} - nova tentativa em "
+                                      f"{espera_reenvio:.0f}s ({tentativas}/{fila_reenvio.max_tentativas})")
+                                reenvios += 1
+                                logger.warning(f"Falha temporária ao enviar para {email} (tentativa {tentativas}): "
+                                               f"{result.get('error')} - reenvio em {espera_reenvio:.0f}s")
+                            else:
+                                # Falha definitiva (5xx) não é repetida; temporária só após esgotar as tentativas
+                                motivo = f'{tentativas} tentativa(s)' if transitoria else 'definitiva'
+                                print(f" [ERRO] Erro ({motivo}): {result.get('error', 'Desconhecido')}")
+                                erros += 1
+                                if transitoria:
+                                    erros_esgotados += 1
+                                logger.error(f"[ERRO] Erro ao enviar para {email} ({motivo}, código "
+                                             f"{result.get('smtp_code')}): {result.get('error')}")
+                                
+                                # Atualizar status do envio individual para ERRO
+                                if envio_individual_id and db.connection and db.connection.is_connected():
+                                    status_envios.registrar(envio_individual_id, 'ERRO', data_envio=False)
+        
+        # Cópias marcadas à frente que não chegaram a ser enviadas (o pool já terminou)
+        for hash_envio in marcacoes:
+            marcador.descartar(hash_envio)
         
         # Estatísticas finais
         tempo_total = time.time() - inicio
+        processados = max(enviados + erros, 1)
         
         print("-" * 70)
         print("\n" + "=" * 70)
@@ -372,32 +966,75 @@ def enviar_em_massa(hash_id, arquivo_destinatarios, intervalo=1, lote_tamanho=10
         print("=" * 70)
         
         print(f"\n Estatísticas:")
-        print(f"  Total de destinatários: {len(destinatarios)}")
+        if worker:
+            print(f"  Worker {worker}: {enviados + erros} envio(s) de {total} da campanha")
+        elif retomar:
+            print(f"  Retomada: {pendentes} pendente(s) de {total} destinatário(s)")
+        print(f"  Total de destinatários: {enviados + erros}")
         print(f"  [OK] Enviados com sucesso: {enviados}")
         print(f"  [ERRO] Erros: {erros}")
-        print(f"  Taxa de sucesso: {(enviados/len(destinatarios)*100):.1f}%")
+        print(f"  Reenvios após falha temporária: {reenvios} "
+              f"({erros_esgotados} erro(s) por tentativas esgotadas, {erros - erros_esgotados} definitivo(s))")
+        print(f"  Taxa de sucesso: {(enviados/processados*100):.1f}%")
         print(f"  Tempo total: {tempo_total/60:.1f} minutos")
-        print(f"  Média: {tempo_total/len(destinatarios):.1f}s por email")
+        print(f"  Média: {tempo_total/processados:.1f}s por email")
+        if status_envios.gravacoes:
+            print(f"  Status gravados no banco: {status_envios.gravados} em {status_envios.gravacoes} lote(s)")
+        status_logs = log_eventos.status()
+        if status_logs['lotes'] or status_logs['descartados']:
+            print(f"  Logs de eventos: {status_logs['gravados']} gravado(s) em {status_logs['lotes']} lote(s), "
+                  f"fila máxima {status_logs['fila_max']}, gravação p95 {status_logs['gravacao'].get('p95_ms', 0):.1f} ms")
+            if status_logs['descartados']:
+                print(f"  [AVISO] {status_logs['descartados']} log(s) de evento não gravado(s)")
+            logger.info(f"Logs de eventos: {status_logs}")
+        
+        for janela, info in limiter.status().items():
+            print(f"  Quota por {janela}: {info['disponivel']}/{info['capacidade']} disponíveis "
+                  f"(recarga total em {info['recarga_total_segundos']:.0f}s)")
+        
+        status_throttle = throttle.status()
+        print(f"  Controle adaptativo: {status_throttle['concorrencia']} simultâneo(s), "
+              f"{status_throttle['taxa_por_segundo']} envios/s, {status_throttle['reducoes']} redução(ões)")
+        
+        if roteador:
+            print(f"  Relays SMTP: {len(roteador.relays)}")
+            for nome, info in roteador.status().items():
+                print(f"    {nome} (peso {info['peso']}): {info['enviados']} mensagem(ns), {info['falhas']} falha(s)")
+        
+        resumo_tempos = tempos_smtp.resumo()
+        if resumo_tempos:
+            print("  Fases SMTP por mensagem (média / p95):")
+            for fase in ('dns', 'conexao', 'starttls', 'auth', 'dados', 'codificacao'):
+                if fase in resumo_tempos:
+                    info = resumo_tempos[fase]
+                    print(f"    {fase}: {info['media_ms']:.1f} / {info['p95_ms']:.1f} ms")
+            logger.info(f"Fases SMTP: {resumo_tempos}")
+        
+        status_dominios = agendador.status()
+        print(f"  Domínios de destino: {len(status_dominios)}")
+        for dominio, info in sorted(status_dominios.items(), key=lambda d: -d[1]['enviados'])[:10]:
+            print(f"    {dominio}: {info['enviados']} enviado(s)")
         
         logger.info("=" * 70)
         logger.info(f"ENVIO EM MASSA CONCLUÍDO - Enviados: {enviados}, Erros: {erros}")
         logger.info("=" * 70)
         
         # Atualiza MySQL
+        enviados_campanha, erros_campanha = enviados, erros
+        campanha_concluida = True
         if db.connection and db.connection.is_connected() and envio_massa_id:
-            try:
-                cursor = db.connection.cursor()
-                query = """
-                    UPDATE envios_massa 
-                    SET enviados = %s, erros = %s, tempo_total_minutos = %s, 
-                        status = 'CONCLUIDO', completed_at = NOW()
-                    WHERE id = %s
-                """
-                cursor.execute(query, (enviados, erros, tempo_total / 60, envio_massa_id))
-                cursor.close()
+            if retomar:
+                # Totais da campanha inteira, incluindo execuções anteriores e outros workers
+                contagem = db.contar_envios_por_status(envio_massa_id)
+                enviados_campanha = contagem.get('ENVIADO', 0) + contagem.get('CONFIRMADO', 0)
+                erros_campanha = contagem.get('ERRO', 0)
+                campanha_concluida = not worker or not contagem.get('PENDENTE', 0)
+                print(f"  Campanha {envio_massa_id}: {enviados_campanha} enviado(s), {erros_campanha} erro(s) no total")
+            
+            if not campanha_concluida:
+                print(f"  Outros workers ainda estão enviando a campanha {envio_massa_id}")
+            elif db.finalizar_envio_massa(envio_massa_id, enviados_campanha, erros_campanha, tempo_total / 60):
                 logger.info("[OK] Estatísticas atualizadas no MySQL")
-            except Exception as e:
-                logger.warning(f"Erro ao atualizar MySQL: {e}")
         
         if db.connection:
             db.disconnect()
@@ -408,12 +1045,13 @@ def enviar_em_massa(hash_id, arquivo_destinatarios, intervalo=1, lote_tamanho=10
                 'hash_id': hash_id,
                 'edicao': encrypted_info['edicao'],
                 'fasciculo': encrypted_info['fasciculo'],
-                'total_destinatarios': len(destinatarios),
-                'enviados': enviados,
-                'erros': erros,
+                'total_destinatarios': total,
+                'enviados': enviados_campanha,
+                'erros': erros_campanha,
                 'tempo_total_minutos': tempo_total / 60,
                 'envio_massa_id': envio_massa_id,
-                'action': 'Conclusão de envio em massa'
+                'worker': worker,
+                'action': 'Conclusão de envio em massa' if campanha_concluida else f'Worker {worker} concluído'
             },
             block_type=BlockType.VERIFICATION
         )
@@ -427,6 +1065,18 @@ def enviar_em_massa(hash_id, arquivo_destinatarios, intervalo=1, lote_tamanho=10
         logger.exception("Erro durante envio em massa")
         print(f"\n[ERRO] Erro: {e}")
         print(f"Verifique o arquivo de log: logs/auditoria_*.log")
+        
+        if envio_massa_id and db.connection and db.connection.is_connected():
+            # A falha de um worker não encerra a campanha: os outros seguem
+            if not worker:
+                db.atualizar_status_envio_massa(envio_massa_id, 'ERRO')
+            db.disconnect()
+            print(f"Para retomar: python envio_massa.py --retomar {envio_massa_id}")
+    
+    finally:
+        # Encadeia os blocos que este processo gravou no seu diário
+        if blockchain is not None:
+            blockchain.consolidar()
 
 
 def main():
@@ -435,18 +1085,64 @@ def main():
     parser = argparse.ArgumentParser(
         description='Envia o mesmo fascículo para múltiplos destinatários'
     )
-    parser.add_argument('--hash-id', required=True, help='ID do hash do fascículo')
-    parser.add_argument('--destinatarios', required=True, 
+    parser.add_argument('--hash-id', help='ID do hash do fascículo')
+    parser.add_argument('--destinatarios', 
                        help='Arquivo com lista de emails (.txt, .json ou .csv)')
-    parser.add_argument('--intervalo', type=float, default=1.0,
-                       help='Segundos de espera entre envios (padrão: 1.0)')
-    parser.add_argument('--lote', type=int, default=100,
-                       help='Tamanho do lote para pausa maior (padrão: 100)')
+    parser.add_argument('--retomar', type=int, metavar='ENVIO_MASSA_ID',
+                       help='Retoma uma campanha interrompida (envia apenas os pendentes)')
+    parser.add_argument('--preparar', action='store_true',
+                       help='Apenas registra a campanha como PENDENTE, para ser enviada por workers')
+    parser.add_argument('--worker', metavar='NOME',
+                       help='Divide a campanha de --retomar com outros processos (nome único por processo)')
+    parser.add_argument('--tamanho-lote', type=int, default=WORKER_CONFIG['tamanho_lote'],
+                       help=f"Envios reivindicados por vez pelo worker (padrão: {WORKER_CONFIG['tamanho_lote']})")
+    parser.add_argument('--lease', type=int, default=WORKER_CONFIG['lease_segundos'],
+                       help=f"Validade da reivindicação em segundos (padrão: {WORKER_CONFIG['lease_segundos']})")
+    parser.add_argument('--intervalo', type=float, default=0.0,
+                       help='Espaçamento mínimo em segundos entre envios (padrão: 0, só quotas)')
+    parser.add_argument('--limite-segundo', type=int, default=RATE_LIMITS['segundo'],
+                       help='Quota de envios por segundo (0 = sem limite)')
+    parser.add_argument('--limite-minuto', type=int, default=RATE_LIMITS['minuto'],
+                       help=f"Quota de envios por minuto (padrão: {RATE_LIMITS['minuto']})")
+    parser.add_argument('--limite-hora', type=int, default=RATE_LIMITS['hora'],
+                       help='Quota de envios por hora (0 = sem limite)')
+    parser.add_argument('--limite-dia', type=int, default=RATE_LIMITS['dia'],
+                       help='Quota de envios por dia (0 = sem limite)')
+    parser.add_argument('--workers', type=int, default=THROTTLE_CONFIG['concorrencia_max'],
+                       help=f"Máximo de envios simultâneos (padrão: {THROTTLE_CONFIG['concorrencia_max']})")
+    parser.add_argument('--modo-entrega', choices=['anexo', 'link'], default=MODO_ENTREGA,
+                       help=f"Anexa o PDF ou envia um link de download (padrão: {MODO_ENTREGA})")
+    parser.add_argument('--agrupar', type=int, default=1, metavar='N',
+                       help='Entrega cada mensagem a até N destinatários (RCPT TO múltiplos), '
+                            'sem personalização (padrão: 1)')
+    parser.add_argument('--backend', choices=['smtp', 'spool', 'sendmail'], default=SMTP_CONFIG['backend'],
+                       help=f"Entrega por sessão SMTP ou ao MTA local, via spool maildir ou sendmail "
+                            f"(padrão: {SMTP_CONFIG['backend']})")
+    parser.add_argument('--marca-dagua', action='store_true', default=MARCA_DAGUA,
+                       help="Anexa a cada destinatário uma cópia do PDF com seu hash_envio em cada página")
     
     args = parser.parse_args()
     
+    if args.retomar and (args.hash_id or args.destinatarios):
+        parser.error('--retomar não pode ser combinado com --hash-id/--destinatarios')
+    if not args.retomar and not (args.hash_id and args.destinatarios):
+        parser.error('informe --hash-id e --destinatarios, ou --retomar <envio_massa_id>')
+    if args.worker and not args.retomar:
+        parser.error('--worker exige --retomar <envio_massa_id> (prepare a campanha com --preparar)')
+    if args.preparar and args.retomar:
+        parser.error('--preparar não pode ser combinado com --retomar')
+    if args.modo_entrega == 'link' and not PUBLICACAO_URL_BASE:
+        parser.error('--modo-entrega link exige PUBLICACAO_URL_BASE no .env')
+    if args.agrupar < 1:
+        parser.error('--agrupar deve ser 1 ou mais')
+    if args.agrupar > 1 and args.modo_entrega == 'link':
+        parser.error('--agrupar não pode ser combinado com --modo-entrega link (o link é pessoal)')
+    if args.marca_dagua and (args.agrupar > 1 or args.modo_entrega == 'link'):
+        parser.error('--marca-dagua exige o PDF anexado e uma mensagem por destinatário')
+    
     # Verifica configuração de email
-    if not SMTP_CONFIG['user'] or not SMTP_CONFIG['password']:
+    if (not args.preparar and args.backend == 'smtp' and not SMTP_RELAYS
+            and (not SMTP_CONFIG['user'] or not SMTP_CONFIG['password'])):
         logger.error("Configurações de email não definidas")
         print("\n[ERRO] Erro: Configurações de email não definidas")
         print("  Configure as credenciais SMTP no arquivo .env")
@@ -458,7 +1154,22 @@ def main():
         hash_id=args.hash_id,
         arquivo_destinatarios=args.destinatarios,
         intervalo=args.intervalo,
-        lote_tamanho=args.lote
+        limites={
+            'segundo': args.limite_segundo,
+            'minuto': args.limite_minuto,
+            'hora': args.limite_hora,
+            'dia': args.limite_dia
+        },
+        workers=args.workers,
+        retomar=args.retomar,
+        preparar=args.preparar,
+        worker=args.worker,
+        tamanho_lote=args.tamanho_lote,
+        lease=args.lease,
+        modo_entrega=args.modo_entrega,
+        agrupar=args.agrupar,
+        marca_dagua=args.marca_dagua,
+        backend=args.backend
     )
     
     return 0
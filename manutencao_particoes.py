@@ -0,0 +1,112 @@
+"""
+Manutenção das Partições Mensais
+Cria partições futuras e arquiva meses antigos de logs_eventos
+(requer migrations/add_particionamento_mensal.py; só MySQL)
+"""
+import os
+import sys
+from pathlib import Path
+import argparse
+from datetime import date
+from tabulate import tabulate
+from dotenv import load_dotenv
+
+# Carrega variáveis de ambiente
+load_dotenv()
+
+# Adiciona o diretório src ao path
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from database import DatabaseManager
+from partition_manager import PartitionManager, TABELAS_PARTICIONADAS, somar_meses
+
+
+def listar_particoes(particoes: PartitionManager, tabelas):
+    """Mostra as partições de cada tabela"""
+    for tabela in tabelas:
+        lista = particoes.listar(tabela)
+        print(f"\n{tabela}:")
+        if not lista:
+            print("  [AVISO] Tabela não particionada (execute migrations/add_particionamento_mensal.py)")
+            continue
+        
+        table_data = [[p['nome'], p['mes'] or 'restante', p['linhas']] for p in lista]
+        print(tabulate(table_data, headers=['Partição', 'Mês', 'Linhas (estimativa)'], tablefmt='grid'))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Manutenção das partições mensais de logs_eventos (MySQL)'
+    )
+    
+    parser.add_argument('--listar', action='store_true', help='Lista as partições')
+    parser.add_argument('--criar-futuras', type=int, metavar='MESES',
+                       help='Garante partições até MESES meses à frente')
+    parser.add_argument('--arquivar-antes-de', type=int, metavar='MESES',
+                       help='Arquiva e remove as partições com mais de MESES meses')
+    parser.add_argument('--diretorio', default='data/arquivo',
+                       help='Destino dos arquivos .ndjson.gz (padrão: data/arquivo)')
+    parser.add_argument('--desanexar', action='store_true',
+                       help='Move as partições antigas para tabelas próprias em vez de exportar')
+    parser.add_argument('--tabela', choices=TABELAS_PARTICIONADAS,
+                       help='Limita a uma tabela (padrão: todas)')
+    parser.add_argument('--simular', action='store_true',
+                       help='Mostra os comandos sem executar')
+    
+    args = parser.parse_args()
+    
+    if not (args.listar or args.criar_futuras is not None or args.arquivar_antes_de is not None):
+        parser.error('informe --listar, --criar-futuras ou --arquivar-antes-de')
+    if args.arquivar_antes_de is not None and args.arquivar_antes_de < 1:
+        parser.error('--arquivar-antes-de deve ser pelo menos 1 (o mês atual nunca é arquivado)')
+    
+    if os.getenv('DB_ENGINE', 'mysql').lower() == 'sqlite':
+        print("[ERRO] Particionamento só existe no MySQL (DB_ENGINE=sqlite)")
+        return 1
+    
+    db = DatabaseManager()
+    
+    if not db.connect():
+        print("\n[ERRO] Erro ao conectar ao banco de dados")
+        print("\nVerifique:")
+        print("  1. MySQL está rodando")
+        print("  2. Arquivo .env está configurado")
+        return 1
+    
+    tabelas = [args.tabela] if args.tabela else list(TABELAS_PARTICIONADAS)
+    particoes = PartitionManager(db, simular=args.simular)
+    
+    try:
+        if args.criar_futuras is not None:
+            for tabela in tabelas:
+                criadas = particoes.criar_futuras(tabela, args.criar_futuras)
+                if criadas:
+                    print(f"[OK] {tabela}: partição(ões) criada(s): {', '.join(criadas)}")
+                else:
+                    print(f"[OK] {tabela}: partições futuras já existem")
+        
+        if args.arquivar_antes_de is not None:
+            antes_de = somar_meses(date.today(), -args.arquivar_antes_de)
+            print(f"\nArquivando meses anteriores a {antes_de:%Y-%m}...")
+            for tabela in tabelas:
+                arquivadas = particoes.arquivar(tabela, antes_de, Path(args.diretorio), args.desanexar)
+                for item in arquivadas:
+                    print(f"[OK] {tabela} {item['particao']}: {item['linhas']} linha(s) -> {item['destino']}")
+                if not arquivadas:
+                    print(f"[OK] {tabela}: nada a arquivar")
+        
+        if args.listar:
+            listar_particoes(particoes, tabelas)
+    
+    except Exception as e:
+        print(f"\n[ERRO] Falha na manutenção das partições: {e}")
+        return 1
+    
+    finally:
+        db.disconnect()
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Migração: Adicionar coluna envio_massa_id em envios_individuais
+Vincula cada envio individual à campanha (envios_massa) que o originou,
+permitindo retomar uma campanha interrompida com envio_massa.py --retomar
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from database import DatabaseManager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def migrate():
+    """Executa a migração"""
+    db = DatabaseManager()
+    
+    print("\n[1/3] Conectando ao banco de dados...")
+    if not db.connect():
+        print("[ERRO] Nao foi possivel conectar ao banco")
+        return False
+    
+    cursor = db.connection.cursor()
+    
+    try:
+        print("\n[2/3] Adicionando coluna envio_massa_id...")
+        
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+              AND TABLE_NAME = 'envios_individuais'
+              AND COLUMN_NAME = 'envio_massa_id'
+        """)
+        
+        if cursor.fetchone()[0]:
+            print("[OK] Coluna envio_massa_id ja existe (nada a fazer)")
+        else:
+            cursor.execute("""
+                ALTER TABLE envios_individuais
+                    ADD COLUMN envio_massa_id INT NULL AFTER id,
+                    
+                    -- Índice usado para reconstruir o trabalho restante de uma campanha
+                    ADD INDEX idx_envio_massa_status (envio_massa_id, status),
+                    
+                    ADD CONSTRAINT fk_envios_individuais_envio_massa
+                        FOREIGN KEY (envio_massa_id) REFERENCES envios_massa(id) ON DELETE SET NULL
+            """)
+            print("[OK] Coluna envio_massa_id adicionada")
+        
+        print("\n[3/3] Confirmando alteracoes...")
+        db.connection.commit()
+        
+        cursor.execute("SHOW COLUMNS FROM envios_individuais LIKE 'envio_massa_id'")
+        if cursor.fetchone():
+            print("[OK] Coluna verificada e confirmada")
+            return True
+        else:
+            print("[ERRO] Coluna nao foi criada corretamente")
+            return False
+    
+    except Exception as e:
+        print(f"[ERRO] Falha na migracao: {e}")
+        db.connection.rollback()
+        return False
+    finally:
+        cursor.close()
+        db.disconnect()
+
+def main():
+    """Função principal"""
+    print("=" * 70)
+    print("MIGRACAO: Adicionar envio_massa_id em envios_individuais")
+    print("=" * 70)
+    print("\nEsta migracao vincula cada envio individual a sua campanha")
+    print("de envio em massa, permitindo retomar campanhas interrompidas")
+    
+    if migrate():
+        print("\n" + "=" * 70)
+        print("[OK] MIGRACAO CONCLUIDA COM SUCESSO!")
+        print("=" * 70)
+        print("\nProximos passos:")
+        print("  1. Novos envios em massa registram o ID da campanha")
+        print("  2. Para retomar uma campanha interrompida:")
+        print("     python envio_massa.py --retomar <envio_massa_id>")
+        return 0
+    else:
+        print("\n" + "=" * 70)
+        print("[ERRO] MIGRACAO FALHOU!")
+        print("=" * 70)
+        print("\nVerifique:")
+        print("  1. MySQL esta rodando")
+        print("  2. A migracao add_envios_individuais.py ja foi executada")
+        print("  3. Usuario tem permissao para alterar tabelas")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
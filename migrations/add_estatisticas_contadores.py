@@ -0,0 +1,83 @@
+"""
+Migração: Criar tabela estatisticas_contadores
+Guarda os totais de logs_eventos por tipo, consolidados de forma incremental,
+para que get_estatisticas não precise varrer a tabela de logs inteira
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from database import DatabaseManager, ULTIMO_LOG_CONSOLIDADO
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def migrate():
+    """Executa a migração"""
+    db = DatabaseManager()
+    
+    print("\n[1/3] Conectando ao banco de dados...")
+    if not db.connect():
+        print("[ERRO] Nao foi possivel conectar ao banco")
+        return False
+    
+    cursor = db.connection.cursor()
+    
+    try:
+        print("\n[2/3] Criando tabela estatisticas_contadores...")
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS estatisticas_contadores (
+                contador VARCHAR(100) PRIMARY KEY,
+                valor BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+        db.connection.commit()
+        print("[OK] Tabela estatisticas_contadores criada/verificada")
+        
+        print("\n[3/3] Consolidando os logs existentes (pode demorar em tabelas grandes)...")
+        consolidados = db.atualizar_contadores()
+        
+        cursor.execute(
+            "SELECT valor FROM estatisticas_contadores WHERE contador = %s",
+            (ULTIMO_LOG_CONSOLIDADO,)
+        )
+        row = cursor.fetchone()
+        print(f"[OK] {consolidados} log(s) consolidado(s) (ultimo id: {row[0] if row else 0})")
+        return True
+    
+    except Exception as e:
+        print(f"[ERRO] Falha na migracao: {e}")
+        db.connection.rollback()
+        return False
+    finally:
+        cursor.close()
+        db.disconnect()
+
+def main():
+    """Função principal"""
+    print("=" * 70)
+    print("MIGRACAO: Criar contadores consolidados de logs_eventos")
+    print("=" * 70)
+    print("\nEsta migracao cria a tabela de contadores usada pelas estatisticas")
+    print("(consultar_db.py --estatisticas) e consolida os logs ja existentes")
+    
+    if migrate():
+        print("\n" + "=" * 70)
+        print("[OK] MIGRACAO CONCLUIDA COM SUCESSO!")
+        print("=" * 70)
+        print("\nAs estatisticas agora somam os contadores aos logs mais recentes,")
+        print("sem contar a tabela logs_eventos inteira a cada consulta")
+        return 0
+    else:
+        print("\n" + "=" * 70)
+        print("[ERRO] MIGRACAO FALHOU!")
+        print("=" * 70)
+        print("\nVerifique:")
+        print("  1. MySQL esta rodando")
+        print("  2. Usuario tem permissao para criar tabelas")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Migração: Particionar logs_eventos por mês
+Converte logs_eventos para PARTITION BY RANGE sobre created_at (uma partição
+por mês), para que consultas recentes leiam só as partições recentes e meses
+antigos possam ser arquivados com manutencao_particoes.py. envios_individuais
+não é particionada (veja TABELAS_PARTICIONADAS em src/partition_manager.py)
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from database import DatabaseManager
+from partition_manager import PartitionManager, TABELAS_PARTICIONADAS
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def migrate(meses_futuros: int = 3):
+    """Executa a migração"""
+    db = DatabaseManager()
+    
+    print("\n[1/3] Conectando ao banco de dados...")
+    if not db.connect():
+        print("[ERRO] Nao foi possivel conectar ao banco")
+        return False
+    
+    particoes = PartitionManager(db)
+    
+    try:
+        print("\n[2/3] Particionando tabelas (reescreve as tabelas; pode demorar)...")
+        for tabela in TABELAS_PARTICIONADAS:
+            print(f"\n  {tabela}:")
+            particoes.particionar(tabela, meses_futuros)
+        
+        print("\n[3/3] Verificando particoes...")
+        for tabela in TABELAS_PARTICIONADAS:
+            lista = particoes.listar(tabela)
+            if not lista:
+                print(f"[ERRO] {tabela} nao ficou particionada")
+                return False
+            print(f"[OK] {tabela}: {lista[0]['nome']} ... {lista[-1]['nome']} ({len(lista)} particoes)")
+        return True
+    
+    except Exception as e:
+        print(f"[ERRO] Falha na migracao: {e}")
+        db.connection.rollback()
+        return False
+    finally:
+        db.disconnect()
+
+def main():
+    """Função principal"""
+    print("=" * 70)
+    print("MIGRACAO: Particionamento mensal de logs_eventos")
+    print("=" * 70)
+    print("\nEsta migracao particiona logs_eventos por mes de created_at.")
+    print("O MySQL nao aceita chaves estrangeiras em tabelas particionadas:")
+    print("a chave estrangeira de logs_eventos para fasciculos sera removida")
+    print("e a chave primaria passa a ser (id, created_at)")
+    print("\nFaca backup antes de continuar.")
+    
+    if migrate():
+        print("\n" + "=" * 70)
+        print("[OK] MIGRACAO CONCLUIDA COM SUCESSO!")
+        print("=" * 70)
+        print("\nProximos passos:")
+        print("  1. Agende a criacao de particoes futuras (mensal):")
+        print("     python manutencao_particoes.py --criar-futuras 3")
+        print("  2. Arquive meses antigos quando quiser liberar espaco:")
+        print("     python manutencao_particoes.py --arquivar-antes-de 12")
+        return 0
+    else:
+        print("\n" + "=" * 70)
+        print("[ERRO] MIGRACAO FALHOU!")
+        print("=" * 70)
+        print("\nVerifique:")
+        print("  1. MySQL esta rodando")
+        print("  2. Usuario tem permissao para ALTER TABLE")
+        print("  3. logs_eventos nao tem indice UNIQUE alem da chave primaria")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
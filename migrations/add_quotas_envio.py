@@ -0,0 +1,85 @@
+"""
+Migração: Criar tabela quotas_envio
+Guarda os envios de cada janela de quota do provedor SMTP, para que workers
+e execuções retomadas somem a mesma quota em vez de cada um usar a sua
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from database import DatabaseManager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def migrate():
+    """Executa a migração"""
+    db = DatabaseManager()
+    
+    print("\n[1/3] Conectando ao banco de dados...")
+    if not db.connect():
+        print("[ERRO] Nao foi possivel conectar ao banco")
+        return False
+    
+    cursor = db.connection.cursor()
+    
+    try:
+        print("\n[2/3] Criando tabela quotas_envio...")
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS quotas_envio (
+                -- Conta do provedor (servidor e usuário SMTP, ou relay)
+                chave VARCHAR(191) NOT NULL,
+                -- Janela da quota ('' = linha de controle travada nas reservas)
+                janela VARCHAR(20) NOT NULL,
+                -- Fatia da janela (instante unix / (período / 60))
+                fatia BIGINT NOT NULL,
+                envios INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (chave, janela, fatia)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+        db.connection.commit()
+        
+        print("\n[3/3] Verificando tabela...")
+        cursor.execute("SHOW TABLES LIKE 'quotas_envio'")
+        if cursor.fetchone():
+            print("[OK] Tabela quotas_envio criada/verificada")
+            return True
+        else:
+            print("[ERRO] Tabela nao foi criada corretamente")
+            return False
+    
+    except Exception as e:
+        print(f"[ERRO] Falha na migracao: {e}")
+        db.connection.rollback()
+        return False
+    finally:
+        cursor.close()
+        db.disconnect()
+
+def main():
+    """Função principal"""
+    print("=" * 70)
+    print("MIGRACAO: Criar quotas de envio compartilhadas")
+    print("=" * 70)
+    print("\nEsta migracao cria a tabela em que os workers de uma campanha")
+    print("somam os envios de cada janela de quota do provedor SMTP")
+    
+    if migrate():
+        print("\n" + "=" * 70)
+        print("[OK] MIGRACAO CONCLUIDA COM SUCESSO!")
+        print("=" * 70)
+        print("\nAs quotas (SMTP_LIMITE_POR_*) agora valem para todos os workers")
+        print("juntos e continuam contando depois de uma retomada")
+        return 0
+    else:
+        print("\n" + "=" * 70)
+        print("[ERRO] MIGRACAO FALHOU!")
+        print("=" * 70)
+        print("\nVerifique:")
+        print("  1. MySQL esta rodando")
+        print("  2. Usuario tem permissao para criar tabelas")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
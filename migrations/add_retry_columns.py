@@ -0,0 +1,92 @@
+"""
+Migração: Adicionar colunas de reenvio (tentativas, proxima_tentativa) em envios_individuais
+Persiste o contador de tentativas e o horário do próximo reenvio de falhas
+temporárias (fila de reenvios do envio_massa.py)
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from database import DatabaseManager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def migrate():
+    """Executa a migração"""
+    db = DatabaseManager()
+    
+    print("\n[1/3] Conectando ao banco de dados...")
+    if not db.connect():
+        print("[ERRO] Nao foi possivel conectar ao banco")
+        return False
+    
+    cursor = db.connection.cursor()
+    
+    try:
+        print("\n[2/3] Adicionando colunas tentativas e proxima_tentativa...")
+        
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+              AND TABLE_NAME = 'envios_individuais'
+              AND COLUMN_NAME = 'proxima_tentativa'
+        """)
+        
+        if cursor.fetchone()[0]:
+            print("[OK] Colunas de reenvio ja existem (nada a fazer)")
+        else:
+            cursor.execute("""
+                ALTER TABLE envios_individuais
+                    -- Tentativas de envio já feitas e horário do próximo reenvio
+                    ADD COLUMN tentativas INT NOT NULL DEFAULT 0 AFTER status,
+                    ADD COLUMN proxima_tentativa DATETIME NULL AFTER tentativas
+            """)
+            print("[OK] Colunas tentativas e proxima_tentativa adicionadas")
+        
+        print("\n[3/3] Confirmando alteracoes...")
+        db.connection.commit()
+        
+        cursor.execute("SHOW COLUMNS FROM envios_individuais LIKE 'proxima_tentativa'")
+        if cursor.fetchone():
+            print("[OK] Colunas verificadas e confirmadas")
+            return True
+        else:
+            print("[ERRO] Colunas nao foram criadas corretamente")
+            return False
+    
+    except Exception as e:
+        print(f"[ERRO] Falha na migracao: {e}")
+        db.connection.rollback()
+        return False
+    finally:
+        cursor.close()
+        db.disconnect()
+
+def main():
+    """Função principal"""
+    print("=" * 70)
+    print("MIGRACAO: Adicionar controle de reenvios em envios_individuais")
+    print("=" * 70)
+    print("\nEsta migracao registra as tentativas de cada envio, para que")
+    print("falhas temporarias sejam reenviadas sem parar a campanha")
+    
+    if migrate():
+        print("\n" + "=" * 70)
+        print("[OK] MIGRACAO CONCLUIDA COM SUCESSO!")
+        print("=" * 70)
+        print("\nFalhas temporarias (4xx, conexao) agora sao reenviadas pela")
+        print("fila de reenvios do envio_massa.py (SMTP_MAX_TENTATIVAS no .env)")
+        return 0
+    else:
+        print("\n" + "=" * 70)
+        print("[ERRO] MIGRACAO FALHOU!")
+        print("=" * 70)
+        print("\nVerifique:")
+        print("  1. MySQL esta rodando")
+        print("  2. A migracao add_envio_massa_id.py ja foi executada")
+        print("  3. Usuario tem permissao para alterar tabelas")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
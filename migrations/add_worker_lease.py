@@ -0,0 +1,98 @@
+"""
+Migração: Adicionar colunas de lease (worker_id, lease_expira_em) em envios_individuais
+Permite que vários processos de envio reivindiquem lotes da mesma campanha
+(envio_massa.py --retomar <id> --worker <nome>)
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from database import DatabaseManager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def migrate():
+    """Executa a migração"""
+    db = DatabaseManager()
+    
+    print("\n[1/3] Conectando ao banco de dados...")
+    if not db.connect():
+        print("[ERRO] Nao foi possivel conectar ao banco")
+        return False
+    
+    cursor = db.connection.cursor()
+    
+    try:
+        print("\n[2/3] Adicionando colunas worker_id e lease_expira_em...")
+        
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+              AND TABLE_NAME = 'envios_individuais'
+              AND COLUMN_NAME = 'lease_expira_em'
+        """)
+        
+        if cursor.fetchone()[0]:
+            print("[OK] Colunas de lease ja existem (nada a fazer)")
+        else:
+            cursor.execute("""
+                ALTER TABLE envios_individuais
+                    -- Worker que reivindicou o envio e até quando a reivindicação vale
+                    ADD COLUMN worker_id VARCHAR(100) NULL AFTER status,
+                    ADD COLUMN lease_expira_em DATETIME NULL AFTER worker_id,
+                    
+                    -- Índice usado pelos workers para reivindicar lotes
+                    ADD INDEX idx_envio_massa_lease (envio_massa_id, status, lease_expira_em)
+            """)
+            print("[OK] Colunas worker_id e lease_expira_em adicionadas")
+        
+        print("\n[3/3] Confirmando alteracoes...")
+        db.connection.commit()
+        
+        cursor.execute("SHOW COLUMNS FROM envios_individuais LIKE 'lease_expira_em'")
+        if cursor.fetchone():
+            print("[OK] Colunas verificadas e confirmadas")
+            return True
+        else:
+            print("[ERRO] Colunas nao foram criadas corretamente")
+            return False
+    
+    except Exception as e:
+        print(f"[ERRO] Falha na migracao: {e}")
+        db.connection.rollback()
+        return False
+    finally:
+        cursor.close()
+        db.disconnect()
+
+def main():
+    """Função principal"""
+    print("=" * 70)
+    print("MIGRACAO: Adicionar lease de workers em envios_individuais")
+    print("=" * 70)
+    print("\nEsta migracao permite que varios processos de envio dividam")
+    print("a mesma campanha, reivindicando lotes de envios pendentes")
+    
+    if migrate():
+        print("\n" + "=" * 70)
+        print("[OK] MIGRACAO CONCLUIDA COM SUCESSO!")
+        print("=" * 70)
+        print("\nProximos passos:")
+        print("  1. Prepare a campanha sem enviar:")
+        print("     python envio_massa.py --hash-id <id> --destinatarios lista.txt --preparar")
+        print("  2. Inicie um ou mais workers (em qualquer host):")
+        print("     python envio_massa.py --retomar <envio_massa_id> --worker <nome>")
+        return 0
+    else:
+        print("\n" + "=" * 70)
+        print("[ERRO] MIGRACAO FALHOU!")
+        print("=" * 70)
+        print("\nVerifique:")
+        print("  1. MySQL esta rodando")
+        print("  2. A migracao add_envio_massa_id.py ja foi executada")
+        print("  3. Usuario tem permissao para alterar tabelas")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -64,10 +64,10 @@ Exemplos de uso:
     # Argumentos para envio em massa
     parser.add_argument('--hash-id', help='Hash ID do fascículo (se já foi gerado)')
     parser.add_argument('--destinatarios', help='Arquivo com lista de destinatários')
-    parser.add_argument('--intervalo', type=float, default=2.0, 
-                       help='Intervalo entre envios em segundos (padrão: 2.0)')
-    parser.add_argument('--lote', type=int, default=100,
-                       help='Tamanho do lote para pausa maior (padrão: 100)')
+    parser.add_argument('--intervalo', type=float, default=0.0, 
+                       help='Espaçamento mínimo entre envios em segundos (padrão: 0, só quotas)')
+    parser.add_argument('--limite-minuto', type=int,
+                       help='Quota de envios por minuto (padrão: SMTP_LIMITE_POR_MINUTO do .env)')
     
     # Argumentos para consulta
     parser.add_argument('--consultar', action='store_true',
@@ -130,7 +130,9 @@ Exemplos de uso:
     
     # ETAPA 2: Enviar em Massa (se não for skip)
     if not args.skip_envio and args.destinatarios:
-        comando = [PYTHON_CMD, 'envio_massa.py', '--hash-id', hash_id, '--destinatarios', args.destinatarios, '--intervalo', str(args.intervalo), '--lote', str(args.lote)]
+        comando = [PYTHON_CMD, 'envio_massa.py', '--hash-id', hash_id, '--destinatarios', args.destinatarios, '--intervalo', str(args.intervalo)]
+        if args.limite_minuto is not None:
+            comando += ['--limite-minuto', str(args.limite_minuto)]
         
         result = executar_comando(comando, "ETAPA 2/3: ENVIANDO EM MASSA")
         
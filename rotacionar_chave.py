@@ -0,0 +1,41 @@
+"""
+Rotação da Chave de Criptografia
+Gera uma nova chave e recriptografa os arquivos de hash (use se a chave vazou)
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from config import DATA_DIR, ENCRYPTION_KEY_PATH
+from crypto_manager import CryptoManager
+
+
+def main():
+    """Função principal"""
+    print("=" * 70)
+    print("ROTAÇÃO DA CHAVE DE CRIPTOGRAFIA")
+    print("=" * 70)
+    
+    if not ENCRYPTION_KEY_PATH.exists():
+        print(f"\n[ERRO] Chave não encontrada: {ENCRYPTION_KEY_PATH}")
+        return 1
+    
+    arquivos = sorted(DATA_DIR.glob("hash_*.json"))
+    print(f"\nChave atual: {ENCRYPTION_KEY_PATH}")
+    print(f"Arquivos de hash: {len(arquivos)}")
+    
+    try:
+        recriptografados = CryptoManager(ENCRYPTION_KEY_PATH).rotacionar_chave(arquivos)
+    except Exception as e:
+        print(f"\n[ERRO] Rotação interrompida: {e}")
+        print(f"Se existir {ENCRYPTION_KEY_PATH.name}.nova, os arquivos já regravados usam essa chave")
+        return 1
+    
+    print(f"\n[OK] Nova chave gravada em {ENCRYPTION_KEY_PATH}")
+    print(f"[OK] {recriptografados} arquivo(s) de hash recriptografado(s)")
+    print("\n[AVISO] Faça um novo backup (python backup.py): backups antigos guardam a chave anterior")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
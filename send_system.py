@@ -7,8 +7,7 @@ import argparse
 from pathlib import Path
 import json
 from dotenv import load_dotenv
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-import smtplib
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_result
 
 # Carrega variáveis de ambiente
 load_dotenv()
@@ -22,6 +21,7 @@ from blockchain_audit import BlockchainAudit, BlockType
 from database import DatabaseManager
 from logger import get_logger
 from validator import Validator, validar_ou_erro
+from retry_queue import falha_transitoria
 from config import ENCRYPTION_KEY_PATH, BLOCKCHAIN_PATH, SMTP_CONFIG
 
 # Configurar logger
@@ -31,12 +31,16 @@ logger = get_logger(__name__)
 @retry(
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=4, max=10),
-    retry=retry_if_exception_type((smtplib.SMTPException, ConnectionError)),
-    reraise=True
+    retry=retry_if_result(falha_transitoria),
+    retry_error_callback=lambda estado: estado.outcome.result()
 )
 def enviar_email_com_retry(email_sender, destinatario, fasciculo_info, pdf_path, assunto, mensagem):
     """
-    Envia email com retry automático em caso de falha
+    Envia email com retry automático em caso de falha temporária
+    
+    O EmailSender não lança exceções: devolve o resultado com a classificação
+    da falha. Só falhas temporárias (4xx, rede) são repetidas; uma falha
+    definitiva (5xx) ou a última tentativa é devolvida como resultado.
     
     Args:
         email_sender: Instância do EmailSender
@@ -245,13 +249,15 @@ def main():
                 print(f"  [OK] Email enviado com sucesso!")
                 logger.info(f"[OK] Email enviado para {args.destinatario}")
             else:
-                logger.error(f"Erro ao enviar email: {send_result.get('error')}")
-                print(f"  [ERRO] Erro ao enviar email: {send_result.get('error')}")
+                motivo = 'após 3 tentativas' if send_result.get('transitorio') else 'falha definitiva'
+                logger.error(f"Erro ao enviar email ({motivo}, código {send_result.get('smtp_code')}): "
+                             f"{send_result.get('error')}")
+                print(f"  [ERRO] Erro ao enviar email ({motivo}): {send_result.get('error')}")
                 return 1
         
         except Exception as e:
-            logger.exception("Erro ao enviar email após 3 tentativas")
-            print(f"\n[ERRO] Erro ao enviar email após 3 tentativas: {e}")
+            logger.exception("Erro inesperado ao enviar email")
+            print(f"\n[ERRO] Erro inesperado ao enviar email: {e}")
             print(f"  Verifique:")
             print(f"  1. Configurações de email no .env")
             print(f"  2. Conexão com internet")
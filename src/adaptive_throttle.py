@@ -0,0 +1,158 @@
+"""
+Controle Adaptativo de Envio (AIMD)
+Ajusta concorrência e taxa de envio de acordo com as respostas do servidor SMTP
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+from rate_limiter import TokenBucket
+
+
+# Códigos SMTP de falha temporária que indicam sobrecarga/limitação no relay
+CODIGOS_TEMPORARIOS = {421, 450, 451, 452}
+
+
+class AdaptiveThrottle:
+    """
+    Controlador AIMD (Additive Increase / Multiplicative Decrease)
+    
+    Enquanto os envios têm sucesso, a concorrência e a taxa crescem de forma
+    aditiva (uma unidade por "rodada" de envios). Ao receber um código de
+    falha temporária (421/450/451/452), ambas são reduzidas de forma
+    multiplicativa. Assim o envio converge para a maior vazão que o provedor
+    tolera sem bloquear a conta.
+    """
+    
+    def __init__(
+        self,
+        concorrencia_max: int = 4,
+        taxa_inicial: float = 2.0,
+        taxa_max: float = 20.0,
+        taxa_min: float = 0.05,
+        fator_reducao: float = 0.5,
+        incremento_taxa: float = 0.5
+    ):
+        """
+        Inicializa o controlador
+        
+        Args:
+            concorrencia_max: Número máximo de envios simultâneos
+            taxa_inicial: Envios por segundo no início
+            taxa_max: Teto de envios por segundo
+            taxa_min: Piso de envios por segundo após reduções
+            fator_reducao: Fator multiplicativo aplicado em falhas temporárias
+            incremento_taxa: Envios/s somados a cada rodada bem-sucedida
+        """
+        if concorrencia_max < 1:
+            raise ValueError("Concorrência máxima deve ser pelo menos 1")
+        if not 0 < fator_reducao < 1:
+            raise ValueError("Fator de redução deve estar entre 0 e 1")
+        
+        self.concorrencia_max = concorrencia_max
+        self.taxa_max = taxa_max
+        self.taxa_min = taxa_min
+        self.fator_reducao = fator_reducao
+        self.incremento_taxa = incremento_taxa
+        
+        self.concorrencia = 1
+        self.taxa = min(taxa_inicial, taxa_max)
+        self.geracao = 0
+        self.reducoes = 0
+        
+        self._sucessos_rodada = 0
+        self._balde = TokenBucket('adaptativo', 1, 1 / self.taxa)
+        self._lock = threading.Lock()
+    
+    def tempo_ate_liberacao(self) -> float:
+        """Segundos até a taxa adaptativa liberar o próximo envio"""
+        with self._lock:
+            self._balde.recarregar(time.monotonic())
+            return self._balde.tempo_para(1)
+    
+    def liberar(self) -> Optional[int]:
+        """
+        Consome a vez do próximo envio, se a taxa atual permitir
+        
+        Returns:
+            Geração atual do controlador (a ser devolvida em
+            registrar_resultado) ou None se ainda não é hora de enviar
+        """
+        with self._lock:
+            self._balde.recarregar(time.monotonic())
+            if self._balde.tempo_para(1) > 0:
+                return None
+            self._balde.tokens -= 1
+            return self.geracao
+    
+    def registrar_resultado(self, resultado: Dict, geracao: int) -> bool:
+        """
+        Ajusta concorrência e taxa a partir do resultado de um envio
+        
+        Args:
+            resultado: Dicionário retornado por EmailSender.send_fasciculo
+            geracao: Valor devolvido por liberar() quando o envio começou
+        
+        Returns:
+            True se o resultado provocou redução (backoff)
+        """
+        with self._lock:
+            if resultado.get('success'):
+                self._sucessos_rodada += 1
+                # Uma "rodada" completa = tantos sucessos quanto a concorrência atual
+                if self._sucessos_rodada >= self.concorrencia:
+                    self._sucessos_rodada = 0
+                    self.concorrencia = min(self.concorrencia_max, self.concorrencia + 1)
+                    self._definir_taxa(min(self.taxa_max, self.taxa + self.incremento_taxa))
+                return False
+            
+            if resultado.get('smtp_code') not in CODIGOS_TEMPORARIOS:
+                return False
+            
+            # Recusa de um destinatário específico é limitação do domínio
+            # de destino, não do relay (tratada pelo DomainScheduler)
+            if resultado.get('destinatario_recusado'):
+                return False
+            
+            # Envios iniciados antes da última redução não reduzem de novo:
+            # uma rajada de 421 conta como um único sinal de congestionamento
+            if geracao != self.geracao:
+                return False
+            
+            self.geracao += 1
+            self.reducoes += 1
+            self._sucessos_rodada = 0
+            self.concorrencia = max(1, int(self.concorrencia * self.fator_reducao))
+            self._definir_taxa(max(self.taxa_min, self.taxa * self.fator_reducao))
+            return True
+    
+    def _definir_taxa(self, taxa: float):
+        self.taxa = taxa
+        self._balde.definir_taxa(taxa, time.monotonic())
+    
+    def status(self) -> Dict:
+        """Retorna o estado atual do controlador"""
+        with self._lock:
+            return {
+                'concorrencia': self.concorrencia,
+                'taxa_por_segundo': round(self.taxa, 2),
+                'reducoes': self.reducoes
+            }
+
+
+if __name__ == "__main__":
+    # Simulação do controle adaptativo
+    print("=== Controle Adaptativo de Envio (AIMD) ===")
+    
+    throttle = AdaptiveThrottle(concorrencia_max=8, taxa_inicial=1.0, taxa_max=10.0)
+    
+    for rodada in range(1, 13):
+        geracao = throttle.geracao
+        if rodada in (6, 10):
+            throttle.registrar_resultado({'success': False, 'smtp_code': 421}, geracao)
+            evento = "421 recebido"
+        else:
+            for _ in range(throttle.concorrencia):
+                throttle.registrar_resultado({'success': True}, geracao)
+            evento = "sucesso"
+        print(f"  Rodada {rodada:2d} ({evento:12s}): {throttle.status()}")
@@ -4,12 +4,69 @@ Mantém uma cadeia imutável de registros de todas as operações
 """
 import json
 import hashlib
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Tuple, Any
 from enum import Enum
 
 
+# Sufixo dos diários de blocos (um por processo no modo compartilhado)
+SUFIXO_DIARIO = '.diario'
+
+# Sufixo de um diário reivindicado por uma consolidação
+SUFIXO_CONSOLIDANDO = '.consolidando'
+
+# Segundos sem renovação do mtime após os quais o .lock ou o diário de um
+# processo de outro host é considerado abandonado (renovados a cada 1/3 disso)
+EXPIRA_RENOVACAO = 60.0
+
+
+def _processo_vivo(pid: int) -> bool:
+    """Verifica se um processo deste host ainda existe (na dúvida, considera vivo)"""
+    if os.name == 'nt':
+        import ctypes
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return ctypes.get_last_error() != 87  # ERROR_INVALID_PARAMETER: pid inexistente
+        codigo = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(codigo))
+        kernel32.CloseHandle(handle)
+        return codigo.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _manter_renovado(caminho: Path, intervalo: float) -> threading.Event:
+    """
+    Renova o mtime do arquivo a cada `intervalo` segundos em uma thread
+    
+    A renovação termina quando o evento retornado é sinalizado ou quando o
+    arquivo deixa de existir.
+    """
+    parar = threading.Event()
+    
+    def renovar():
+        while not parar.wait(intervalo):
+            try:
+                os.utime(caminho)
+            except FileNotFoundError:
+                return
+    
+    threading.Thread(target=renovar, daemon=True).start()
+    return parar
+
+
 class BlockType(Enum):
     """Tipos de blocos na blockchain"""
     GENESIS = "GENESIS"
@@ -25,10 +82,10 @@ class Block:
     
     def __init__(
         self,
-        index: int,
+        index: Optional[int],
         timestamp: str,
         data: Dict[str, Any],
-        previous_hash: str,
+        previous_hash: Optional[str],
         block_type: BlockType
     ):
         self.index = index
@@ -65,16 +122,30 @@ class Block:
 class BlockchainAudit:
     """Sistema de auditoria baseado em blockchain"""
     
-    def __init__(self, blockchain_path: Path):
+    def __init__(self, blockchain_path: Path, compartilhada: bool = False):
         """
         Inicializa a blockchain de auditoria
         
         Args:
             blockchain_path: Caminho para o arquivo da blockchain
+            compartilhada: Se True, vários processos podem adicionar blocos à
+                           mesma cadeia: cada um grava em seu próprio diário,
+                           consolidado no arquivo por consolidar()
         """
-        self.blockchain_path = blockchain_path
+        self.blockchain_path = Path(blockchain_path)
+        self.compartilhada = compartilhada
         self.chain: List[Block] = []
+        self._assinatura_arquivo = None
+        self._cadeia_entregue = 0
+        self._diario: Optional[Path] = None
+        self._fd_diario: Optional[int] = None
+        self._renovacao_diario: Optional[threading.Event] = None
+        self._diarios_lidos: Dict[str, int] = {}
         self._load_or_create_blockchain()
+        
+        # Diários deixados por processos que caíram antes de consolidar
+        if compartilhada and any(self._diario_orfao(diario) for diario in self._diarios()):
+            self.consolidar()
     
     def _load_or_create_blockchain(self):
         """Carrega blockchain existente ou cria uma nova"""
@@ -101,26 +172,33 @@ class BlockchainAudit:
         self._save_blockchain()
         print(f"[OK] Blockchain criada com bloco gênesis")
     
+    def _ler_cadeia(self) -> List[Block]:
+        """Lê e valida os blocos gravados no arquivo"""
+        with open(self.blockchain_path, 'r', encoding='utf-8') as f:
+            chain_data = json.load(f)
+        
+        chain = []
+        for block_data in chain_data:
+            block = Block(
+                index=block_data['index'],
+                timestamp=block_data['timestamp'],
+                data=block_data['data'],
+                previous_hash=block_data['previous_hash'],
+                block_type=BlockType(block_data['block_type'])
+            )
+            # Verifica se o hash está correto
+            if block.hash == block_data['hash']:
+                chain.append(block)
+            else:
+                raise ValueError(f"Hash inválido no bloco {block_data['index']}")
+        
+        self._assinatura_arquivo = self._assinatura()
+        return chain
+    
     def _load_blockchain(self):
         """Carrega blockchain do arquivo"""
         try:
-            with open(self.blockchain_path, 'r', encoding='utf-8') as f:
-                chain_data = json.load(f)
-            
-            for block_data in chain_data:
-                block = Block(
-                    index=block_data['index'],
-                    timestamp=block_data['timestamp'],
-                    data=block_data['data'],
-                    previous_hash=block_data['previous_hash'],
-                    block_type=BlockType(block_data['block_type'])
-                )
-                # Verifica se o hash está correto
-                if block.hash == block_data['hash']:
-                    self.chain.append(block)
-                else:
-                    raise ValueError(f"Hash inválido no bloco {block_data['index']}")
-            
+            self.chain = self._ler_cadeia()
             print(f"[OK] Blockchain carregada: {len(self.chain)} blocos")
         except Exception as e:
             print(f"Erro ao carregar blockchain: {e}")
@@ -133,13 +211,193 @@ class BlockchainAudit:
         
         chain_data = [block.to_dict() for block in self.chain]
         
-        with open(self.blockchain_path, 'w', encoding='utf-8') as f:
+        # Grava em arquivo temporário e substitui: leitores nunca veem um JSON parcial
+        temp_path = self.blockchain_path.with_name(self.blockchain_path.name + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
             json.dump(chain_data, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, self.blockchain_path)
+        
+        self._assinatura_arquivo = self._assinatura()
+    
+    def _assinatura(self):
+        """Identifica a versão gravada do arquivo (mtime + tamanho)"""
+        try:
+            stat = self.blockchain_path.stat()
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+    
+    def recarregar(self) -> bool:
+        """
+        Relê o arquivo se outro processo gravou blocos desde a última leitura
+        
+        Só compara mtime e tamanho quando nada mudou; a gravação por
+        substituição (os.replace) garante que a leitura vê um arquivo inteiro.
+        
+        Returns:
+            True se a cadeia em memória foi atualizada
+        """
+        if self._assinatura() == self._assinatura_arquivo:
+            return False
+        self.chain = self._ler_cadeia()
+        return True
+    
+    def novos_blocos(self) -> List[Block]:
+        """
+        Blocos gravados desde a chamada anterior, por este ou outros processos
+        
+        Relê a cadeia se ela mudou e, no modo compartilhado, as linhas novas
+        dos diários dos processos (blocos ainda não consolidados, com index
+        None). Um mesmo bloco pode aparecer no diário e, depois, na cadeia.
+        
+        Returns:
+            Lista de blocos novos
+        """
+        self.recarregar()
+        novos = self.chain[self._cadeia_entregue:]
+        self._cadeia_entregue = len(self.chain)
+        if self.compartilhada:
+            novos += self._ler_diarios()
+        return novos
+    
+    def _diarios(self) -> List[Path]:
+        """Diários de blocos existentes ao lado do arquivo da cadeia (inclusive os reivindicados)"""
+        padrao = f"{self.blockchain_path.name}.*{SUFIXO_DIARIO}"
+        return sorted(
+            list(self.blockchain_path.parent.glob(padrao)) +
+            list(self.blockchain_path.parent.glob(padrao + SUFIXO_CONSOLIDANDO))
+        )
+    
+    def _diario_orfao(self, diario: Path) -> bool:
+        """
+        Diário de um processo que caiu antes de consolidá-lo
+        
+        O dono renova o mtime do diário enquanto vive. Um dono neste host só
+        perde o diário se o processo não existir mais; o de outro host, se o
+        diário ficou EXPIRA_RENOVACAO segundos sem renovação. Um diário
+        reivindicado (.consolidando) sobrou de uma consolidação interrompida.
+        """
+        if diario == self._diario:
+            return False
+        if diario.name.endswith(SUFIXO_CONSOLIDANDO):
+            return True
+        dono = diario.name[len(self.blockchain_path.name) + 1:-len(SUFIXO_DIARIO)]
+        processo, _, host = dono.partition('@')
+        if host == socket.gethostname():
+            try:
+                return not _processo_vivo(int(processo.split('-')[0]))
+            except ValueError:
+                return False
+        try:
+            return time.time() - diario.stat().st_mtime > EXPIRA_RENOVACAO
+        except FileNotFoundError:
+            return False
+    
+    def _ler_diarios(self) -> List[Block]:
+        """Lê as linhas completas acrescentadas aos diários desde a última leitura"""
+        blocos = []
+        for diario in self._diarios():
+            lido = self._diarios_lidos.get(diario.name, 0)
+            try:
+                with open(diario, 'rb') as f:
+                    f.seek(lido)
+                    dados = f.read()
+            except FileNotFoundError:
+                continue
+            # Uma linha sem \n ainda está sendo gravada pelo dono do diário
+            completo = dados.rfind(b'\n') + 1
+            self._diarios_lidos[diario.name] = lido + completo
+            for linha in dados[:completo].splitlines():
+                try:
+                    registro = json.loads(linha)
+                except ValueError:
+                    continue
+                blocos.append(Block(
+                    index=None,
+                    timestamp=registro['timestamp'],
+                    data=registro['data'],
+                    previous_hash=None,
+                    block_type=BlockType(registro['block_type'])
+                ))
+        return blocos
+    
+    def _bloqueio_abandonado(self, lock_path: Path, expira: float) -> Optional[Tuple[int, int]]:
+        """
+        Verifica se o .lock foi deixado por um processo que caiu
+        
+        O dono renova o mtime enquanto mantém o bloqueio. Um dono neste host
+        só perde o bloqueio se o processo não existir mais; o de outro host,
+        se o .lock ficou `expira` segundos sem renovação.
+        
+        Returns:
+            Identificação do .lock abandonado (st_ino, st_mtime_ns), ou None
+        """
+        try:
+            stat = lock_path.stat()
+            dono = lock_path.read_text(encoding='utf-8').split()
+        except (FileNotFoundError, UnicodeDecodeError):
+            return None
+        
+        if len(dono) == 2 and dono[1].isdigit() and dono[0] == socket.gethostname():
+            abandonado = not _processo_vivo(int(dono[1]))
+        else:
+            abandonado = time.time() - stat.st_mtime > expira
+        return (stat.st_ino, stat.st_mtime_ns) if abandonado else None
+    
+    @contextmanager
+    def _bloqueio(self, timeout: float = 30.0, expira: float = EXPIRA_RENOVACAO):
+        """
+        Bloqueio exclusivo entre processos via arquivo .lock
+        
+        Usa criação exclusiva (O_EXCL), que funciona em qualquer sistema
+        operacional e em compartilhamentos de rede. O .lock guarda o host e o
+        PID do dono e tem o mtime renovado a cada `expira` / 3 segundos
+        enquanto o bloqueio é mantido; só é removido por outro processo se o
+        dono caiu (ver _bloqueio_abandonado).
+        """
+        lock_path = self.blockchain_path.with_name(self.blockchain_path.name + '.lock')
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        inicio = time.monotonic()
+        
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, f"{socket.gethostname()} {os.getpid()}".encode())
+                os.close(fd)
+                break
+            except FileExistsError:
+                abandonado = self._bloqueio_abandonado(lock_path, expira)
+                if abandonado:
+                    # Remove só se ainda for o mesmo .lock examinado
+                    try:
+                        stat = lock_path.stat()
+                        if (stat.st_ino, stat.st_mtime_ns) == abandonado:
+                            lock_path.unlink()
+                    except FileNotFoundError:
+                        pass
+                    continue
+                if time.monotonic() - inicio > timeout:
+                    raise TimeoutError(f"Blockchain bloqueada por outro processo: {lock_path}")
+                time.sleep(0.01)
+        
+        renovacao = _manter_renovado(lock_path, expira / 3)
+        try:
+            yield
+        finally:
+            renovacao.set()
+            try:
+                lock_path.unlink()
+            except FileNotFoundError:
+                pass
     
     def add_block(self, data: Dict[str, Any], block_type: BlockType) -> Block:
         """
         Adiciona um novo bloco à blockchain
         
+        No modo compartilhado, o bloco é acrescentado ao diário deste processo
+        (uma linha JSON, sem bloqueio nem regravação da cadeia) e só recebe
+        index e hashes definitivos em consolidar().
+        
         Args:
             data: Dados a serem armazenados no bloco
             block_type: Tipo do bloco
@@ -147,6 +405,108 @@ class BlockchainAudit:
         Returns:
             Bloco criado
         """
+        if not self.compartilhada:
+            return self._adicionar_bloco(data, block_type)
+        
+        bloco = Block(
+            index=None,
+            timestamp=datetime.utcnow().isoformat(),
+            data=data,
+            previous_hash=None,
+            block_type=block_type
+        )
+        if self._fd_diario is not None and not self._diario.exists():
+            # Reivindicado por outro processo que nos julgou caídos: segue em um diário novo
+            self._fechar_diario()
+        if self._fd_diario is None:
+            # Um diário novo a cada consolidação: leitores nunca confundem dois arquivos
+            self._diario = self.blockchain_path.with_name(
+                f"{self.blockchain_path.name}.{os.getpid()}-{time.time_ns()}@{socket.gethostname()}{SUFIXO_DIARIO}"
+            )
+            self._fd_diario = os.open(self._diario, os.O_CREAT | os.O_APPEND | os.O_WRONLY)
+            self._renovacao_diario = _manter_renovado(self._diario, EXPIRA_RENOVACAO / 3)
+        linha = json.dumps({
+            'timestamp': bloco.timestamp,
+            'data': data,
+            'block_type': bloco.block_type
+        }, ensure_ascii=False)
+        os.write(self._fd_diario, (linha + '\n').encode('utf-8'))
+        return bloco
+    
+    def _fechar_diario(self):
+        """Fecha o diário deste processo e para a renovação do mtime"""
+        if self._fd_diario is not None:
+            os.close(self._fd_diario)
+            self._fd_diario = None
+        if self._renovacao_diario is not None:
+            self._renovacao_diario.set()
+            self._renovacao_diario = None
+    
+    def consolidar(self) -> int:
+        """
+        Encadeia no arquivo os blocos do diário deste processo
+        
+        Também consolida os diários de processos que caíram, neste ou em
+        outro host (ver _diario_orfao). Cada diário é renomeado para
+        .consolidando antes da leitura, para que o dono, se ainda estiver
+        vivo, passe a gravar em outro. Os blocos entram na ordem dos
+        timestamps, depois dos já consolidados.
+        
+        Returns:
+            Número de blocos acrescentados à cadeia
+        """
+        if not self.compartilhada:
+            return 0
+        
+        self._fechar_diario()
+        
+        with self._bloqueio():
+            if self._assinatura() != self._assinatura_arquivo:
+                self.chain = self._ler_cadeia()
+            
+            diarios = []
+            for diario in self._diarios():
+                if diario != self._diario and not self._diario_orfao(diario):
+                    continue
+                if not diario.name.endswith(SUFIXO_CONSOLIDANDO):
+                    reivindicado = diario.with_name(diario.name + SUFIXO_CONSOLIDANDO)
+                    try:
+                        diario.rename(reivindicado)
+                    except OSError:
+                        # Já consolidado, ou ainda aberto pelo dono (Windows)
+                        continue
+                    diario = reivindicado
+                diarios.append(diario)
+            
+            registros = []
+            for diario in diarios:
+                with open(diario, 'rb') as f:
+                    for linha in f:
+                        try:
+                            registros.append(json.loads(linha))
+                        except ValueError:
+                            # Última linha incompleta de um processo que caiu
+                            continue
+            registros.sort(key=lambda registro: registro['timestamp'])
+            
+            for registro in registros:
+                self.chain.append(Block(
+                    index=len(self.chain),
+                    timestamp=registro['timestamp'],
+                    data=registro['data'],
+                    previous_hash=self.chain[-1].hash,
+                    block_type=BlockType(registro['block_type'])
+                ))
+            if registros:
+                self._save_blockchain()
+            
+            for diario in diarios:
+                diario.unlink()
+        
+        self._diario = None
+        return len(registros)
+    
+    def _adicionar_bloco(self, data: Dict[str, Any], block_type: BlockType) -> Block:
         previous_block = self.chain[-1]
         
         new_block = Block(
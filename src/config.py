@@ -2,6 +2,7 @@
 Configurações do Sistema de Auditoria de Publicação
 """
 import os
+import json
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -14,6 +15,18 @@ DATA_DIR = BASE_DIR / "data"
 KEYS_DIR = DATA_DIR / "keys"
 FASCICULOS_DIR = BASE_DIR / "fasciculos"
 
+
+def caminho_env(variavel: str, padrao: Path) -> Path:
+    """
+    Caminho lido de uma variável de ambiente
+    
+    Caminhos relativos (como os do .env.example) são resolvidos a partir de
+    BASE_DIR, não do diretório atual: rodar de outra pasta continua usando
+    a mesma chave e a mesma blockchain.
+    """
+    caminho = Path(os.getenv(variavel, padrao))
+    return caminho if caminho.is_absolute() else BASE_DIR / caminho
+
 # Criar diretórios se não existirem
 DATA_DIR.mkdir(exist_ok=True)
 KEYS_DIR.mkdir(exist_ok=True)
@@ -25,14 +38,89 @@ SMTP_CONFIG = {
     'port': int(os.getenv('SMTP_PORT', 587)),
     'user': os.getenv('SMTP_USER', ''),
     'password': os.getenv('SMTP_PASSWORD', ''),
-    'from': os.getenv('EMAIL_FROM', '')
+    'from': os.getenv('EMAIL_FROM', ''),
+    'starttls': os.getenv('SMTP_STARTTLS', 'true').lower() in ('1', 'true', 'sim', 'yes'),
+    'streaming': os.getenv('SMTP_STREAMING', 'true').lower() in ('1', 'true', 'sim', 'yes'),
+    # Entrega: 'smtp' (sessão com o servidor), 'spool' (maildir do MTA local) ou 'sendmail'
+    'backend': os.getenv('ENTREGA_BACKEND', 'smtp').lower(),
+    'spool_dir': caminho_env('SPOOL_DIR', DATA_DIR / "spool"),
+    'sendmail': os.getenv('SENDMAIL_PATH', '/usr/sbin/sendmail')
+}
+
+# Vários relays SMTP com peso e quotas próprias (JSON; vazio = só SMTP_CONFIG).
+# Cada relay herda de SMTP_CONFIG o que não informar (from, starttls, streaming)
+SMTP_RELAYS = json.loads(os.getenv('SMTP_RELAYS', '[]'))
+
+# Quotas de envio do provedor SMTP (0 = sem limite)
+RATE_LIMITS = {
+    'segundo': int(os.getenv('SMTP_LIMITE_POR_SEGUNDO', 0)),
+    'minuto': int(os.getenv('SMTP_LIMITE_POR_MINUTO', 60)),
+    'hora': int(os.getenv('SMTP_LIMITE_POR_HORA', 0)),
+    'dia': int(os.getenv('SMTP_LIMITE_POR_DIA', 0))
+}
+
+# Soma as quotas no banco (tabela quotas_envio) entre workers e execuções retomadas
+QUOTA_COMPARTILHADA = os.getenv('SMTP_QUOTA_COMPARTILHADA', 'true').lower() in ('1', 'true', 'sim', 'yes')
+
+# Controle adaptativo (AIMD) de concorrência e taxa de envio
+THROTTLE_CONFIG = {
+    'concorrencia_max': int(os.getenv('SMTP_CONCORRENCIA_MAX', 4)),
+    'taxa_inicial': float(os.getenv('SMTP_TAXA_INICIAL', 2.0)),
+    'taxa_max': float(os.getenv('SMTP_TAXA_MAX', 20.0))
+}
+
+# Reenvio de falhas temporárias (4xx, conexão): total de tentativas e espera
+# exponencial entre elas, sem bloquear os demais envios
+RETRY_CONFIG = {
+    'max_tentativas': int(os.getenv('SMTP_MAX_TENTATIVAS', 3)),
+    'espera_base': float(os.getenv('SMTP_ESPERA_REENVIO', 30)),
+    'espera_max': float(os.getenv('SMTP_ESPERA_REENVIO_MAX', 600))
 }
 
+# Status dos envios gravados em lote: a cada N status ou T milissegundos
+STATUS_BUFFER_CONFIG = {
+    'max_linhas': int(os.getenv('STATUS_BUFFER_LINHAS', 500)),
+    'intervalo_ms': int(os.getenv('STATUS_BUFFER_MS', 1000))
+}
+
+# Logs de eventos gravados em lote por uma thread: fila limitada (espera
+# quando cheia), eventos por INSERT e espera máxima para completar um lote
+EVENT_LOG_CONFIG = {
+    'capacidade': int(os.getenv('LOG_EVENTOS_FILA', 10000)),
+    'max_lote': int(os.getenv('LOG_EVENTOS_LOTE', 500)),
+    'intervalo_ms': int(os.getenv('LOG_EVENTOS_MS', 200))
+}
+
+# Limites por domínio de destino (padrão para todos + exceções em JSON)
+DOMINIO_LIMITES_PADRAO = {
+    'concorrencia': int(os.getenv('DOMINIO_CONCORRENCIA', 2)),
+    'minuto': int(os.getenv('DOMINIO_LIMITE_POR_MINUTO', 0)),
+    'hora': int(os.getenv('DOMINIO_LIMITE_POR_HORA', 0))
+}
+DOMINIO_LIMITES = json.loads(os.getenv('DOMINIO_LIMITES', '{}'))
+
+# Workers distribuídos: tamanho do lote reivindicado e validade da reivindicação
+WORKER_CONFIG = {
+    'tamanho_lote': int(os.getenv('WORKER_TAMANHO_LOTE', 100)),
+    'lease_segundos': int(os.getenv('WORKER_LEASE_SEGUNDOS', 300))
+}
+
+# Entrega por link: 'anexo' (PDF em cada email) ou 'link' (PDF publicado uma vez)
+MODO_ENTREGA = os.getenv('MODO_ENTREGA', 'anexo').lower()
+PUBLICACAO_DIR = caminho_env('PUBLICACAO_DIR', BASE_DIR / "publicacao")
+PUBLICACAO_URL_BASE = os.getenv('PUBLICACAO_URL_BASE', '')
+LINK_KEY_PATH = caminho_env('LINK_KEY_PATH', KEYS_DIR / "link_token.key")
+
+# Marca d'água: cópia do PDF com o hash_envio em cada página (rastreio de vazamentos)
+MARCA_DAGUA = os.getenv('MARCA_DAGUA', 'false').lower() in ('1', 'true', 'sim', 'yes')
+MARCA_DAGUA_DIR = caminho_env('MARCA_DAGUA_DIR', DATA_DIR / "marcados")
+MARCA_DAGUA_PROCESSOS = int(os.getenv('MARCA_DAGUA_PROCESSOS', 0)) or None
+
 # Configurações de Criptografia
-ENCRYPTION_KEY_PATH = KEYS_DIR / "encryption.key"
+ENCRYPTION_KEY_PATH = caminho_env('ENCRYPTION_KEY_PATH', KEYS_DIR / "encryption.key")
 
 # Configurações de Blockchain
-BLOCKCHAIN_PATH = DATA_DIR / "blockchain.json"
+BLOCKCHAIN_PATH = caminho_env('BLOCKCHAIN_PATH', DATA_DIR / "blockchain.json")
 
 # Configurações de Hash
 HASH_ALGORITHM = 'sha256'
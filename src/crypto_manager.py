@@ -3,8 +3,9 @@ Gerenciador de Criptografia
 Responsável por criptografar e descriptografar hashes
 """
 import json
+import os
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterable
 from cryptography.fernet import Fernet
 import base64
 
@@ -140,6 +141,47 @@ class CryptoManager:
         
         return result
     
+    def rotacionar_chave(self, arquivos_hash: Iterable[Path]) -> int:
+        """
+        Gera uma nova chave e recriptografa os arquivos de hash com ela
+        
+        Use quando a chave atual vazou. Todos os arquivos são lidos e
+        descriptografados antes de qualquer gravação; a nova chave fica em
+        <chave>.nova enquanto os arquivos são regravados e só então substitui
+        a antiga.
+        
+        Args:
+            arquivos_hash: Arquivos hash_*.json criptografados com a chave atual
+        
+        Returns:
+            Número de arquivos recriptografados
+        
+        Raises:
+            ValueError: Se algum arquivo não puder ser descriptografado
+        """
+        hashes = {}
+        for arquivo in arquivos_hash:
+            with open(arquivo, 'r', encoding='utf-8') as f:
+                hash_info = json.load(f)
+            if hash_info.get('is_encrypted', False):
+                hashes[Path(arquivo)] = self.decrypt_hash(hash_info)
+        
+        nova_chave = Fernet.generate_key()
+        chave_nova_path = self.key_path.with_name(self.key_path.name + '.nova')
+        with open(chave_nova_path, 'wb') as key_file:
+            key_file.write(nova_chave)
+        
+        self.key = nova_chave
+        self.cipher = Fernet(nova_chave)
+        for arquivo, hash_info in hashes.items():
+            temporario = arquivo.with_name(arquivo.name + '.tmp')
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(self.encrypt_hash(hash_info), f, indent=2, ensure_ascii=False)
+            os.replace(temporario, arquivo)
+        
+        os.replace(chave_nova_path, self.key_path)
+        return len(hashes)
+    
     def generate_signature(self, data: str) -> str:
         """
         Gera uma assinatura digital para os dados
@@ -2,16 +2,97 @@
 Gerenciador de Banco de Dados MySQL
 Responsável por armazenar logs e hashes no banco de dados
 """
-import mysql.connector
 from mysql.connector import Error
+from mysql.connector.errors import PoolError
+from mysql.connector.pooling import CNX_POOL_MAXSIZE, MySQLConnectionPool
 import os
+import threading
+import weakref
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any, Tuple
 import json
 
 
+class _PoolConexoes:
+    """
+    Pool de conexões MySQL compartilhado pelo processo
+    
+    O MySQLConnectionPool falha na hora quando todas as conexões estão em
+    uso; o semáforo faz quem pede esperar até `timeout` segundos por uma
+    conexão devolvida. Cada conexão emprestada passa pela verificação do
+    próprio pool (ping e reconexão se o servidor a derrubou).
+    """
+    
+    def __init__(self, config: Dict, tamanho: int, timeout: float, nome: str):
+        # Sem reset de sessão na devolução: as operações não deixam estado
+        # de sessão e o reset custaria uma ida ao servidor por operação
+        self._pool = MySQLConnectionPool(
+            pool_name=nome, pool_size=tamanho, pool_reset_session=False, **config
+        )
+        self._vagas = threading.BoundedSemaphore(tamanho)
+        self.tamanho = tamanho
+        self.timeout = timeout
+    
+    def emprestar(self):
+        """Retira uma conexão do pool, aguardando se todas estão em uso"""
+        if not self._vagas.acquire(timeout=self.timeout):
+            raise PoolError(msg=f"Nenhuma conexão livre no pool após {self.timeout:.0f}s")
+        try:
+            return self._pool.get_connection()
+        except Error:
+            self._vagas.release()
+            raise
+    
+    def devolver(self, conexao):
+        """Devolve ao pool uma conexão obtida com emprestar()"""
+        try:
+            if conexao.in_transaction:
+                conexao.rollback()
+        except Error:
+            pass
+        finally:
+            conexao.close()
+            self._vagas.release()
+
+
+_pools: Dict[tuple, _PoolConexoes] = {}
+_pools_lock = threading.Lock()
+
+
+def _obter_pool(config: Dict, tamanho: int, timeout: float) -> _PoolConexoes:
+    """Retorna o pool do processo para a configuração, criando-o no primeiro uso"""
+    chave = tuple(sorted(config.items()))
+    with _pools_lock:
+        if chave not in _pools:
+            _pools[chave] = _PoolConexoes(config, tamanho, timeout, f"auditoria_{len(_pools) + 1}")
+        return _pools[chave]
+
+
+# Cursores preparados de cada conexão física do pool: conexão -> (connection_id, {sql: cursor})
+_preparados = weakref.WeakKeyDictionary()
+_preparados_lock = threading.Lock()
+
+
+# Contador em estatisticas_contadores com o último id de logs_eventos já consolidado
+ULTIMO_LOG_CONSOLIDADO = 'logs_eventos.ultimo_id'
+
+# Contador com o corte (unix) de created_at usado na última consolidação
+LOG_CONSOLIDADO_ATE = 'logs_eventos.consolidado_ate'
+
+# Folga (s) dos limites inferiores de created_at nas consultas a logs_eventos:
+# com a tabela particionada por mês, o limite deixa o MySQL ler só as partições
+# do período, e a folga cobre eventos gravados pouco antes do registro de referência
+FOLGA_LOGS_SEGUNDOS = 86400
+
+
 class DatabaseManager:
-    """Gerencia conexão e operações com MySQL"""
+    """
+    Gerencia conexão e operações com MySQL
+    
+    Cada operação pega uma conexão do pool do processo e a devolve ao
+    terminar, então a mesma instância pode ser usada por várias threads.
+    """
     
     def __init__(self):
         """Inicializa conexão com banco de dados"""
@@ -24,12 +105,27 @@ class DatabaseManager:
             'charset': os.getenv('DB_CHARSET', 'utf8mb4'),
             'autocommit': True
         }
+        self.pool_tamanho = min(CNX_POOL_MAXSIZE, max(1, int(os.getenv('DB_POOL_SIZE', 10))))
+        self.pool_timeout = float(os.getenv('DB_POOL_TIMEOUT', 30))
+        self.usar_preparados = os.getenv('DB_PREPARED_STATEMENTS', 'true').lower() == 'true'
         self.connection = None
     
+    def _pool(self) -> _PoolConexoes:
+        return _obter_pool(self.config, self.pool_tamanho, self.pool_timeout)
+    
     def connect(self):
-        """Estabelece conexão com o banco de dados"""
+        """
+        Estabelece conexão com o banco de dados
+        
+        Cria o pool do processo no primeiro uso e reserva uma conexão em
+        self.connection para quem executa SQL diretamente (migrações,
+        consultas avulsas). Os métodos desta classe usam o pool.
+        """
         try:
-            self.connection = mysql.connector.connect(**self.config)
+            if not self.connection:
+                self.connection = self._pool().emprestar()
+            elif not self.connection.is_connected():
+                self.connection.reconnect(attempts=2, delay=1)
             if self.connection.is_connected():
                 print(f"[OK] Conectado ao MySQL: {self.config['database']}")
                 return True
@@ -38,82 +134,155 @@ class DatabaseManager:
             return False
     
     def disconnect(self):
-        """Fecha conexão com o banco de dados"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
+        """Devolve a conexão reservada ao pool"""
+        if self.connection:
+            self._pool().devolver(self.connection)
+            self.connection = None
             print("[OK] Conexão com MySQL encerrada")
     
+    @contextmanager
+    def _conexao(self):
+        """Empresta uma conexão do pool durante o bloco (desfaz transação aberta por erro)"""
+        pool = self._pool()
+        conexao = pool.emprestar()
+        try:
+            yield conexao
+        finally:
+            pool.devolver(conexao)
+    
+    @contextmanager
+    def _cursor(self, dictionary: bool = False):
+        """Cursor em uma conexão emprestada do pool, fechado e devolvido ao fim do bloco"""
+        with self._conexao() as conexao:
+            cursor = conexao.cursor(dictionary=dictionary)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+    
+    @contextmanager
+    def _cursor_preparado(self, query: str):
+        """
+        Cursor com `query` preparada no servidor, em uma conexão do pool
+        
+        O comando é preparado uma vez por conexão física e o cursor fica em
+        cache: as chamadas seguintes só enviam os parâmetros (protocolo
+        binário), sem o servidor analisar o SQL de novo nem o cliente
+        formatar os valores no texto. O cursor só reaproveita o comando se
+        receber o mesmo objeto str, então `query` deve ser uma constante.
+        O cache da conexão é descartado quando ela é refeita (outro
+        connection_id); o cursor que der erro sai do cache.
+        
+        Com DB_PREPARED_STATEMENTS=false, usa um cursor comum.
+        """
+        if not self.usar_preparados:
+            with self._cursor() as cursor:
+                yield cursor
+            return
+        
+        with self._conexao() as conexao:
+            fisica = getattr(conexao, '_cnx', conexao)
+            with _preparados_lock:
+                connection_id, cursores = _preparados.get(fisica, (None, None))
+                if connection_id != fisica.connection_id:
+                    cursores = {}
+                    _preparados[fisica] = (fisica.connection_id, cursores)
+            
+            cursor = cursores.get(query)
+            if cursor is None:
+                cursor = conexao.cursor(prepared=True)
+                cursores[query] = cursor
+            
+            try:
+                yield cursor
+            except Error:
+                cursores.pop(query, None)
+                raise
+    
     def create_tables(self):
         """Cria tabelas necessárias se não existirem"""
-        if not self.connection or not self.connection.is_connected():
-            if not self.connect():
-                return False
-        
-        cursor = self.connection.cursor()
-        
-        try:
-            # Tabela de fascículos
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS fasciculos (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    hash_id VARCHAR(255) UNIQUE NOT NULL,
-                    edicao VARCHAR(255) NOT NULL,
-                    fasciculo VARCHAR(255) NOT NULL,
-                    fasciculo_hash VARCHAR(255) NOT NULL,
-                    pdf_path TEXT,
-                    pdf_size BIGINT,
-                    algorithm VARCHAR(50),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    INDEX idx_hash_id (hash_id),
-                    INDEX idx_edicao (edicao),
-                    INDEX idx_created_at (created_at)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-            """)
-            
-            # Tabela de logs de eventos
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS logs_eventos (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    hash_id VARCHAR(255) NOT NULL,
-                    evento_tipo ENUM('HASH_GENERATED', 'HASH_ENCRYPTED', 'HASH_DECRYPTED', 'EMAIL_SENT', 'VERIFICATION') NOT NULL,
-                    destinatario VARCHAR(255),
-                    nome_destinatario VARCHAR(255),
-                    dados_adicionais JSON,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    INDEX idx_hash_id (hash_id),
-                    INDEX idx_evento_tipo (evento_tipo),
-                    INDEX idx_destinatario (destinatario),
-                    INDEX idx_created_at (created_at),
-                    FOREIGN KEY (hash_id) REFERENCES fasciculos(hash_id) ON DELETE CASCADE
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-            """)
-            
-            # Tabela de envios em massa
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS envios_massa (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    hash_id VARCHAR(255) NOT NULL,
-                    total_destinatarios INT NOT NULL,
-                    enviados INT DEFAULT 0,
-                    erros INT DEFAULT 0,
-                    tempo_total_minutos DECIMAL(10,2),
-                    status ENUM('EM_ANDAMENTO', 'CONCLUIDO', 'ERRO') DEFAULT 'EM_ANDAMENTO',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    completed_at TIMESTAMP NULL,
-                    INDEX idx_hash_id (hash_id),
-                    INDEX idx_status (status),
-                    FOREIGN KEY (hash_id) REFERENCES fasciculos(hash_id) ON DELETE CASCADE
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-            """)
-            
-            print("[OK] Tabelas criadas/verificadas com sucesso")
-            return True
+        try:
+            with self._cursor() as cursor:
+                # Tabela de fascículos
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS fasciculos (
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        hash_id VARCHAR(255) UNIQUE NOT NULL,
+                        edicao VARCHAR(255) NOT NULL,
+                        fasciculo VARCHAR(255) NOT NULL,
+                        fasciculo_hash VARCHAR(255) NOT NULL,
+                        pdf_path TEXT,
+                        pdf_size BIGINT,
+                        algorithm VARCHAR(50),
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        INDEX idx_hash_id (hash_id),
+                        INDEX idx_edicao (edicao),
+                        INDEX idx_created_at (created_at)
+                    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+                """)
+                
+                # Tabela de logs de eventos
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS logs_eventos (
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        hash_id VARCHAR(255) NOT NULL,
+                        evento_tipo ENUM('HASH_GENERATED', 'HASH_ENCRYPTED', 'HASH_DECRYPTED', 'EMAIL_SENT', 'VERIFICATION') NOT NULL,
+                        destinatario VARCHAR(255),
+                        nome_destinatario VARCHAR(255),
+                        dados_adicionais JSON,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        INDEX idx_hash_id (hash_id),
+                        INDEX idx_evento_tipo (evento_tipo),
+                        INDEX idx_destinatario (destinatario),
+                        INDEX idx_created_at (created_at),
+                        FOREIGN KEY (hash_id) REFERENCES fasciculos(hash_id) ON DELETE CASCADE
+                    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+                """)
+                
+                # Tabela de envios em massa
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS envios_massa (
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        hash_id VARCHAR(255) NOT NULL,
+                        total_destinatarios INT NOT NULL,
+                        enviados INT DEFAULT 0,
+                        erros INT DEFAULT 0,
+                        tempo_total_minutos DECIMAL(10,2),
+                        status ENUM('EM_ANDAMENTO', 'CONCLUIDO', 'ERRO') DEFAULT 'EM_ANDAMENTO',
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        completed_at TIMESTAMP NULL,
+                        INDEX idx_hash_id (hash_id),
+                        INDEX idx_status (status),
+                        FOREIGN KEY (hash_id) REFERENCES fasciculos(hash_id) ON DELETE CASCADE
+                    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+                """)
+                
+                # Contadores consolidados de logs_eventos (get_estatisticas)
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS estatisticas_contadores (
+                        contador VARCHAR(100) PRIMARY KEY,
+                        valor BIGINT NOT NULL DEFAULT 0,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+                    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+                """)
+                
+                # Quotas de envio somadas entre processos (reservar_quota)
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS quotas_envio (
+                        chave VARCHAR(191) NOT NULL,
+                        janela VARCHAR(20) NOT NULL,
+                        fatia BIGINT NOT NULL,
+                        envios INT NOT NULL DEFAULT 0,
+                        PRIMARY KEY (chave, janela, fatia)
+                    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+                """)
+                
+                print("[OK] Tabelas criadas/verificadas com sucesso")
+                return True
             
         except Error as e:
             print(f"[ERRO] Erro ao criar tabelas: {e}")
             return False
-        finally:
-            cursor.close()
     
     def inserir_fasciculo(self, hash_info: Dict[str, Any]) -> bool:
         """
@@ -125,38 +294,31 @@ class DatabaseManager:
         Returns:
             True se inserido com sucesso, False caso contrário
         """
-        if not self.connection or not self.connection.is_connected():
-            if not self.connect():
-                return False
-        
-        cursor = self.connection.cursor()
-        
         try:
-            query = """
-                INSERT INTO fasciculos 
-                (hash_id, edicao, fasciculo, fasciculo_hash, pdf_path, pdf_size, algorithm)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            values = (
-                hash_info['hash_id'],
-                hash_info['edicao'],
-                hash_info['fasciculo'],
-                hash_info['fasciculo_hash'],
-                hash_info.get('pdf_path', ''),
-                hash_info.get('pdf_size', 0),
-                hash_info.get('algorithm', 'sha256')
-            )
-            
-            cursor.execute(query, values)
-            print(f"[OK] Fascículo inserido no banco: {hash_info['hash_id']}")
-            return True
+            with self._cursor() as cursor:
+                query = """
+                    INSERT INTO fasciculos 
+                    (hash_id, edicao, fasciculo, fasciculo_hash, pdf_path, pdf_size, algorithm)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """
+                
+                values = (
+                    hash_info['hash_id'],
+                    hash_info['edicao'],
+                    hash_info['fasciculo'],
+                    hash_info['fasciculo_hash'],
+                    hash_info.get('pdf_path', ''),
+                    hash_info.get('pdf_size', 0),
+                    hash_info.get('algorithm', 'sha256')
+                )
+                
+                cursor.execute(query, values)
+                print(f"[OK] Fascículo inserido no banco: {hash_info['hash_id']}")
+                return True
             
         except Error as e:
             print(f"[ERRO] Erro ao inserir fascículo: {e}")
             return False
-        finally:
-            cursor.close()
     
     def inserir_log_evento(self, hash_id: str, evento_tipo: str, 
                           destinatario: Optional[str] = None,
@@ -175,12 +337,6 @@ class DatabaseManager:
         Returns:
             True se inserido com sucesso, False caso contrário
         """
-        if not self.connection or not self.connection.is_connected():
-            if not self.connect():
-                return False
-        
-        cursor = self.connection.cursor()
-        
         try:
             query = """
                 INSERT INTO logs_eventos 
@@ -188,24 +344,57 @@ class DatabaseManager:
                 VALUES (%s, %s, %s, %s, %s)
             """
             
-            dados_json = json.dumps(dados_adicionais) if dados_adicionais else None
-            
-            values = (
-                hash_id,
-                evento_tipo,
-                destinatario,
-                nome_destinatario,
-                dados_json
-            )
-            
-            cursor.execute(query, values)
-            return True
+            with self._cursor_preparado(query) as cursor:
+                dados_json = json.dumps(dados_adicionais) if dados_adicionais else None
+                
+                values = (
+                    hash_id,
+                    evento_tipo,
+                    destinatario,
+                    nome_destinatario,
+                    dados_json
+                )
+                
+                cursor.execute(query, values)
+                return True
             
         except Error as e:
             print(f"[ERRO] Erro ao inserir log de evento: {e}")
             return False
-        finally:
-            cursor.close()
+    
+    def inserir_logs_eventos(self, eventos: List[Tuple]) -> int:
+        """
+        Insere vários logs de evento em uma única transação
+        
+        O executemany do mysql.connector envia as linhas como um só INSERT
+        com vários VALUES. Ao contrário dos demais métodos, o erro é
+        propagado para que quem grava em lote decida se tenta de novo.
+        
+        Args:
+            eventos: Lista de (hash_id, evento_tipo, destinatario,
+                     nome_destinatario, dados_adicionais em JSON ou None)
+        
+        Returns:
+            Número de eventos inseridos
+        
+        Raises:
+            Error: Falha na gravação (nenhum evento do lote é gravado)
+        """
+        query = """
+            INSERT INTO logs_eventos 
+            (hash_id, evento_tipo, destinatario, nome_destinatario, dados_adicionais)
+            VALUES (%s, %s, %s, %s, %s)
+        """
+        
+        with self._conexao() as conexao:
+            cursor = conexao.cursor()
+            try:
+                conexao.start_transaction()
+                cursor.executemany(query, eventos)
+                conexao.commit()
+                return len(eventos)
+            finally:
+                cursor.close()
     
     def buscar_fasciculo(self, hash_id: str) -> Optional[Dict]:
         """
@@ -217,23 +406,16 @@ class DatabaseManager:
         Returns:
             Dicionário com informações do fascículo ou None
         """
-        if not self.connection or not self.connection.is_connected():
-            if not self.connect():
-                return None
-        
-        cursor = self.connection.cursor(dictionary=True)
-        
         try:
-            query = "SELECT * FROM fasciculos WHERE hash_id = %s"
-            cursor.execute(query, (hash_id,))
-            result = cursor.fetchone()
-            return result
+            with self._cursor(dictionary=True) as cursor:
+                query = "SELECT * FROM fasciculos WHERE hash_id = %s"
+                cursor.execute(query, (hash_id,))
+                result = cursor.fetchone()
+                return result
             
         except Error as e:
             print(f"[ERRO] Erro ao buscar fascículo: {e}")
             return None
-        finally:
-            cursor.close()
     
     def buscar_logs_fasciculo(self, hash_id: str) -> List[Dict]:
         """
@@ -245,33 +427,114 @@ class DatabaseManager:
         Returns:
             Lista de dicionários com logs
         """
-        if not self.connection or not self.connection.is_connected():
-            if not self.connect():
-                return []
+        try:
+            with self._cursor(dictionary=True) as cursor:
+                query = """
+                    SELECT * FROM logs_eventos 
+                    WHERE hash_id = %s AND created_at >= FROM_UNIXTIME(%s)
+                    ORDER BY created_at ASC
+                """
+                cursor.execute(query, (hash_id, self._inicio_logs_fasciculo(cursor, hash_id)))
+                results = cursor.fetchall()
+                
+                # Converte JSON de volta para dict
+                for result in results:
+                    if result['dados_adicionais']:
+                        result['dados_adicionais'] = json.loads(result['dados_adicionais'])
+                
+                return results
+            
+        except Error as e:
+            print(f"[ERRO] Erro ao buscar logs: {e}")
+            return []
+    
+    @staticmethod
+    def _inicio_logs_fasciculo(cursor, hash_id: str) -> int:
+        """
+        Limite inferior (unix) de created_at dos logs de um fascículo
         
-        cursor = self.connection.cursor(dictionary=True)
+        Os logs não são anteriores ao fascículo (menos a folga): com o
+        limite, as consultas por fascículo leem só as partições de
+        logs_eventos a partir da criação dele. Usa um cursor dictionary.
+        """
+        cursor.execute(
+            "SELECT UNIX_TIMESTAMP(created_at) AS inicio FROM fasciculos WHERE hash_id = %s",
+            (hash_id,)
+        )
+        row = cursor.fetchone()
+        if not row or row['inicio'] is None:
+            return 0
+        return max(0, int(row['inicio']) - FOLGA_LOGS_SEGUNDOS)
+    
+    def buscar_logs_fasciculo_pagina(self, hash_id: str, limite: int = 100,
+                                     apos: Optional[int] = None) -> List[Dict]:
+        """
+        Busca uma página dos logs de um fascículo (paginação por chave)
         
+        A página seguinte começa após o id do último log recebido
+        (WHERE id > apos), sem OFFSET: o índice leva direto ao ponto de
+        partida e páginas profundas custam o mesmo que a primeira.
+        
+        Args:
+            hash_id: ID do hash do fascículo
+            limite: Máximo de logs na página
+            apos: id do último log da página anterior (None para a primeira)
+        
+        Returns:
+            Lista de dicionários com logs, em ordem de id
+        """
         try:
-            query = """
-                SELECT * FROM logs_eventos 
-                WHERE hash_id = %s 
-                ORDER BY created_at ASC
-            """
-            cursor.execute(query, (hash_id,))
-            results = cursor.fetchall()
-            
-            # Converte JSON de volta para dict
-            for result in results:
-                if result['dados_adicionais']:
-                    result['dados_adicionais'] = json.loads(result['dados_adicionais'])
-            
-            return results
+            with self._cursor(dictionary=True) as cursor:
+                query = """
+                    SELECT * FROM logs_eventos
+                    WHERE hash_id = %s AND created_at >= FROM_UNIXTIME(%s) AND id > %s
+                    ORDER BY id ASC
+                    LIMIT %s
+                """
+                inicio = self._inicio_logs_fasciculo(cursor, hash_id)
+                cursor.execute(query, (hash_id, inicio, apos or 0, limite))
+                results = cursor.fetchall()
+                
+                for result in results:
+                    if result['dados_adicionais']:
+                        result['dados_adicionais'] = json.loads(result['dados_adicionais'])
+                
+                return results
             
         except Error as e:
             print(f"[ERRO] Erro ao buscar logs: {e}")
             return []
-        finally:
-            cursor.close()
+    
+    def listar_fasciculos(self, limite: int = 10, apos: Optional[int] = None) -> List[Dict]:
+        """
+        Lista os fascículos do mais recente para o mais antigo, uma página por vez
+        
+        Paginação por chave: a página seguinte pede os ids menores que o do
+        último fascículo recebido, percorrendo a chave primária sem OFFSET.
+        
+        Args:
+            limite: Máximo de fascículos na página
+            apos: id do último fascículo da página anterior (None para a primeira)
+        
+        Returns:
+            Lista de dicionários com id, hash_id, edicao, fasciculo e created_at
+        """
+        try:
+            with self._cursor(dictionary=True) as cursor:
+                query = "SELECT id, hash_id, edicao, fasciculo, created_at FROM fasciculos"
+                params = []
+                if apos is not None:
+                    query += " WHERE id < %s"
+                    params.append(apos)
+                query += " ORDER BY id DESC LIMIT %s"
+                params.append(limite)
+                
+                cursor.execute(query, tuple(params))
+                return cursor.fetchall()
+            
+        except Error as e:
+            print(f"[ERRO] Erro ao listar fascículos: {e}")
+            return []
     
     def buscar_fasciculos_edicao(self, edicao: str) -> List[Dict]:
         """
@@ -283,65 +546,211 @@ class DatabaseManager:
         Returns:
             Lista de dicionários com fascículos
         """
-        if not self.connection or not self.connection.is_connected():
-            if not self.connect():
-                return []
+        try:
+            with self._cursor(dictionary=True) as cursor:
+                query = "SELECT * FROM fasciculos WHERE edicao = %s ORDER BY created_at ASC"
+                cursor.execute(query, (edicao,))
+                results = cursor.fetchall()
+                return results
+            
+        except Error as e:
+            print(f"[ERRO] Erro ao buscar fascículos da edição: {e}")
+            return []
+    
+    def relatorio_edicao(self, edicao: str) -> List[Dict]:
+        """
+        Resume os eventos de cada fascículo de uma edição em uma única consulta
         
-        cursor = self.connection.cursor(dictionary=True)
+        Args:
+            edicao: Nome da edição
         
+        Returns:
+            Lista de dicionários com hash_id, fasciculo, created_at,
+            total_eventos, total_envios (EMAIL_SENT) e ultima_atividade
+            (None se o fascículo não tem eventos), na ordem de criação
+        """
         try:
-            query = "SELECT * FROM fasciculos WHERE edicao = %s ORDER BY created_at ASC"
-            cursor.execute(query, (edicao,))
-            results = cursor.fetchall()
-            return results
+            with self._cursor(dictionary=True) as cursor:
+                query = """
+                    SELECT f.hash_id, f.fasciculo, f.created_at,
+                           COUNT(l.id) AS total_eventos,
+                           COALESCE(SUM(CASE WHEN l.evento_tipo = 'EMAIL_SENT' THEN 1 ELSE 0 END), 0)
+                               AS total_envios,
+                           MAX(l.created_at) AS ultima_atividade
+                    FROM fasciculos f
+                    LEFT JOIN logs_eventos l ON l.hash_id = f.hash_id
+                        AND l.created_at >= f.created_at - INTERVAL %s SECOND
+                    WHERE f.edicao = %s
+                    GROUP BY f.id, f.hash_id, f.fasciculo, f.created_at
+                    ORDER BY f.created_at ASC, f.id ASC
+                """
+                # Limite de created_at por fascículo: só as partições a partir da criação
+                cursor.execute(query, (FOLGA_LOGS_SEGUNDOS, edicao))
+                results = cursor.fetchall()
+                
+                for result in results:
+                    result['total_envios'] = int(result['total_envios'])
+                
+                return results
             
         except Error as e:
-            print(f"[ERRO] Erro ao buscar fascículos da edição: {e}")
+            print(f"[ERRO] Erro ao gerar relatório da edição: {e}")
             return []
-        finally:
-            cursor.close()
+    
+    def atualizar_contadores(self, atraso_segundos: int = 300) -> int:
+        """
+        Consolida em estatisticas_contadores os logs_eventos novos
+        
+        Soma aos contadores por tipo os eventos com id acima do último
+        consolidado. Eventos dos últimos `atraso_segundos` ficam para a
+        próxima vez: um INSERT ainda não confirmado com id menor que os já
+        gravados não fica de fora. O custo é proporcional aos eventos novos,
+        não ao tamanho da tabela: as leituras de logs_eventos também são
+        limitadas por created_at a partir do corte da consolidação anterior
+        (menos o atraso), e com a tabela particionada só as partições
+        recentes são lidas.
+        
+        Args:
+            atraso_segundos: Idade mínima dos eventos consolidados
+        
+        Returns:
+            Número de eventos consolidados
+        """
+        try:
+            with self._conexao() as conexao:
+                cursor = conexao.cursor()
+                conexao.start_transaction()
+                
+                # Trava o contador de controle: consolidações simultâneas não somam em dobro
+                cursor.execute(
+                    "SELECT valor FROM estatisticas_contadores WHERE contador = %s FOR UPDATE",
+                    (ULTIMO_LOG_CONSOLIDADO,)
+                )
+                row = cursor.fetchone()
+                ultimo_id = row[0] if row else 0
+                
+                cursor.execute(
+                    "SELECT valor FROM estatisticas_contadores WHERE contador = %s",
+                    (LOG_CONSOLIDADO_ATE,)
+                )
+                corte_anterior = cursor.fetchone()
+                inicio = max(0, corte_anterior[0] - atraso_segundos) if corte_anterior else 0
+                
+                cursor.execute("SELECT UNIX_TIMESTAMP()")
+                corte = int(cursor.fetchone()[0]) - atraso_segundos
+                
+                cursor.execute("""
+                    SELECT MAX(id) FROM logs_eventos
+                    WHERE created_at >= FROM_UNIXTIME(%s) AND created_at < FROM_UNIXTIME(%s)
+                      AND id > %s
+                """, (inicio, corte, ultimo_id))
+                novo_id = cursor.fetchone()[0]
+                
+                consolidados = 0
+                if novo_id:
+                    cursor.execute("""
+                        SELECT evento_tipo, COUNT(*)
+                        FROM logs_eventos
+                        WHERE created_at >= FROM_UNIXTIME(%s) AND id > %s AND id <= %s
+                        GROUP BY evento_tipo
+                    """, (inicio, ultimo_id, novo_id))
+                    for evento_tipo, total in cursor.fetchall():
+                        self._somar_contador(cursor, f'logs_eventos.{evento_tipo}', total)
+                        consolidados += total
+                    self._somar_contador(cursor, ULTIMO_LOG_CONSOLIDADO, novo_id - ultimo_id)
+                
+                # UPDATE ou INSERT conforme a leitura acima (um UPDATE com o mesmo
+                # valor não conta linhas afetadas no MySQL)
+                if corte_anterior:
+                    cursor.execute(
+                        "UPDATE estatisticas_contadores SET valor = %s WHERE contador = %s",
+                        (corte, LOG_CONSOLIDADO_ATE)
+                    )
+                else:
+                    cursor.execute(
+                        "INSERT INTO estatisticas_contadores (contador, valor) VALUES (%s, %s)",
+                        (LOG_CONSOLIDADO_ATE, corte)
+                    )
+                
+                conexao.commit()
+                cursor.close()
+                
+                return consolidados
+            
+        except Error as e:
+            if e.errno == 1146:
+                print("[AVISO] Tabela estatisticas_contadores não existe "
+                      "(execute migrations/add_estatisticas_contadores.py)")
+            else:
+                print(f"[ERRO] Erro ao consolidar contadores: {e}")
+            return 0
+    
+    @staticmethod
+    def _somar_contador(cursor, contador: str, valor: int):
+        cursor.execute(
+            "UPDATE estatisticas_contadores SET valor = valor + %s WHERE contador = %s",
+            (valor, contador)
+        )
+        if not cursor.rowcount:
+            cursor.execute(
+                "INSERT INTO estatisticas_contadores (contador, valor) VALUES (%s, %s)",
+                (contador, valor)
+            )
     
     def get_estatisticas(self) -> Dict:
         """
         Retorna estatísticas gerais do banco
         
+        Os totais de logs_eventos vêm de estatisticas_contadores (consolidados
+        antes da consulta) somados aos eventos ainda não consolidados, sem
+        varrer a tabela inteira. Sem a tabela de contadores, conta tudo.
+        
         Returns:
             Dicionário com estatísticas
         """
-        if not self.connection or not self.connection.is_connected():
-            if not self.connect():
-                return {}
-        
-        cursor = self.connection.cursor(dictionary=True)
+        self.atualizar_contadores()
         
         try:
-            stats = {}
-            
-            # Total de fascículos
-            cursor.execute("SELECT COUNT(*) as total FROM fasciculos")
-            stats['total_fasciculos'] = cursor.fetchone()['total']
-            
-            # Total de edições únicas
-            cursor.execute("SELECT COUNT(DISTINCT edicao) as total FROM fasciculos")
-            stats['total_edicoes'] = cursor.fetchone()['total']
-            
-            # Total de emails enviados
-            cursor.execute("SELECT COUNT(*) as total FROM logs_eventos WHERE evento_tipo = 'EMAIL_SENT'")
-            stats['total_emails_enviados'] = cursor.fetchone()['total']
-            
-            # Total de logs
-            cursor.execute("SELECT COUNT(*) as total FROM logs_eventos")
-            stats['total_logs'] = cursor.fetchone()['total']
-            
-            # Logs por tipo
-            cursor.execute("""
-                SELECT evento_tipo, COUNT(*) as total 
-                FROM logs_eventos 
-                GROUP BY evento_tipo
-            """)
-            stats['logs_por_tipo'] = {row['evento_tipo']: row['total'] for row in cursor.fetchall()}
-            
-            return stats
+            with self._cursor(dictionary=True) as cursor:
+                stats = {}
+                
+                # Fascículos e edições (tabela pequena, um registro por PDF)
+                cursor.execute("SELECT COUNT(*) as total, COUNT(DISTINCT edicao) as edicoes FROM fasciculos")
+                row = cursor.fetchone()
+                stats['total_fasciculos'] = row['total']
+                stats['total_edicoes'] = row['edicoes']
+                
+                # Logs por tipo: contadores consolidados + eventos mais novos
+                try:
+                    cursor.execute("SELECT contador, valor FROM estatisticas_contadores")
+                    contadores = {row['contador']: row['valor'] for row in cursor.fetchall()}
+                except Error as e:
+                    if e.errno != 1146:
+                        raise
+                    contadores = {}
+                
+                ultimo_id = contadores.pop(ULTIMO_LOG_CONSOLIDADO, 0)
+                consolidado_ate = contadores.pop(LOG_CONSOLIDADO_ATE, 0)
+                logs_por_tipo = {
+                    contador.split('.', 1)[1]: int(valor)
+                    for contador, valor in contadores.items()
+                    if contador.startswith('logs_eventos.') and valor
+                }
+                
+                cursor.execute("""
+                    SELECT evento_tipo, COUNT(*) as total 
+                    FROM logs_eventos 
+                    WHERE created_at >= FROM_UNIXTIME(%s) AND id > %s
+                    GROUP BY evento_tipo
+                """, (max(0, consolidado_ate - FOLGA_LOGS_SEGUNDOS), ultimo_id))
+                for row in cursor.fetchall():
+                    logs_por_tipo[row['evento_tipo']] = logs_por_tipo.get(row['evento_tipo'], 0) + row['total']
+                
+                stats['total_emails_enviados'] = logs_por_tipo.get('EMAIL_SENT', 0)
+                stats['total_logs'] = sum(logs_por_tipo.values())
+                stats['logs_por_tipo'] = logs_por_tipo
+                
+                return stats
             
         except Error as e:
             print(f"[ERRO] Erro ao buscar estatísticas: {e}")
@@ -349,7 +758,8 @@ class DatabaseManager:
     
     def inserir_envio_individual(self, hash_fasciculo: str, hash_envio: str, 
                                  destinatario_email: str, destinatario_nome: str,
-                                 hash_verificacao: str) -> Optional[int]:
+                                 hash_verificacao: str,
+                                 envio_massa_id: Optional[int] = None) -> Optional[int]:
         """
         Insere registro de envio individual
         
@@ -359,41 +769,111 @@ class DatabaseManager:
             destinatario_email: Email do destinatário
             destinatario_nome: Nome do destinatário
             hash_verificacao: Hash de verificação SHA-256
+            envio_massa_id: ID da campanha em envios_massa (opcional, requer
+                            a migração add_envio_massa_id.py)
         
         Returns:
             ID do registro inserido ou None em caso de erro
         """
-        if not self.connection or not self.connection.is_connected():
-            return None
-        
         try:
-            cursor = self.connection.cursor()
-            
-            query = """
-                INSERT INTO envios_individuais 
-                (hash_fasciculo, hash_envio, destinatario_email, destinatario_nome, 
-                 hash_verificacao, status)
-                VALUES (%s, %s, %s, %s, %s, 'PENDENTE')
-            """
-            
-            cursor.execute(query, (
+            values = [
                 hash_fasciculo,
                 hash_envio,
                 destinatario_email,
                 destinatario_nome,
                 hash_verificacao
-            ))
+            ]
             
-            envio_id = cursor.lastrowid
-            self.connection.commit()
-            cursor.close()
+            if envio_massa_id is None:
+                query = """
+                    INSERT INTO envios_individuais 
+                    (hash_fasciculo, hash_envio, destinatario_email, destinatario_nome, 
+                     hash_verificacao, status)
+                    VALUES (%s, %s, %s, %s, %s, 'PENDENTE')
+                """
+            else:
+                query = """
+                    INSERT INTO envios_individuais 
+                    (hash_fasciculo, hash_envio, destinatario_email, destinatario_nome, 
+                     hash_verificacao, envio_massa_id, status)
+                    VALUES (%s, %s, %s, %s, %s, %s, 'PENDENTE')
+                """
+                values.append(envio_massa_id)
             
-            return envio_id
+            with self._cursor_preparado(query) as cursor:
+                cursor.execute(query, values)
+                
+                envio_id = cursor.lastrowid
+                
+                return envio_id
             
         except Error as e:
             print(f"[ERRO] Erro ao inserir envio individual: {e}")
             return None
     
+    def inserir_envios_individuais(self, hash_fasciculo: str, envio_massa_id: int,
+                                   envios: List[Dict], lote: int = 5000) -> Optional[Dict[str, int]]:
+        """
+        Pré-registra os envios de uma campanha como PENDENTE, em lotes
+        
+        Cada lote é gravado com um único executemany, em vez de um INSERT e
+        um commit por destinatário. Todos os lotes ficam em uma só transação:
+        se algum falhar, nenhuma linha da campanha fica gravada (sem PENDENTE
+        órfão que um --retomar enviaria).
+        
+        Args:
+            hash_fasciculo: Hash do fascículo original
+            envio_massa_id: ID da campanha em envios_massa
+            envios: Lista de dicionários com hash_envio, hash_verificacao,
+                    destinatario_email e destinatario_nome
+            lote: Registros por executemany
+        
+        Returns:
+            Dicionário {hash_envio: id} ou None em caso de erro
+        """
+        query = """
+            INSERT INTO envios_individuais 
+            (hash_fasciculo, hash_envio, destinatario_email, destinatario_nome, 
+             hash_verificacao, envio_massa_id, status)
+            VALUES (%s, %s, %s, %s, %s, %s, 'PENDENTE')
+        """
+        
+        try:
+            with self._conexao() as conexao:
+                cursor = conexao.cursor()
+                conexao.start_transaction()
+                
+                for inicio in range(0, len(envios), lote):
+                    cursor.executemany(query, [
+                        (
+                            hash_fasciculo,
+                            envio['hash_envio'],
+                            envio['destinatario_email'],
+                            envio.get('destinatario_nome', ''),
+                            envio['hash_verificacao'],
+                            envio_massa_id
+                        )
+                        for envio in envios[inicio:inicio + lote]
+                    ])
+                
+                # IDs gerados: uma consulta pela campanha em vez de um lastrowid por linha
+                cursor.execute(
+                    "SELECT id, hash_envio FROM envios_individuais WHERE envio_massa_id = %s",
+                    (envio_massa_id,)
+                )
+                ids = {hash_envio: envio_id for envio_id, hash_envio in cursor.fetchall()}
+                resultado = {envio['hash_envio']: ids[envio['hash_envio']] for envio in envios}
+                
+                conexao.commit()
+                cursor.close()
+                
+                return resultado
+            
+        # Erro antes do commit: o pool desfaz a transação ao receber a conexão de volta
+        except (Error, KeyError) as e:
+            print(f"[ERRO] Erro ao pré-registrar envios: {e}")
+            return None
+    
     def atualizar_status_envio(self, envio_id: int, status: str, data_envio: bool = True) -> bool:
         """
         Atualiza status de um envio individual
@@ -406,12 +886,7 @@ class DatabaseManager:
         Returns:
             True se atualizado com sucesso
         """
-        if not self.connection or not self.connection.is_connected():
-            return False
-        
         try:
-            cursor = self.connection.cursor()
-            
             if data_envio:
                 query = """
                     UPDATE envios_individuais 
@@ -425,16 +900,69 @@ class DatabaseManager:
                     WHERE id = %s
                 """
             
-            cursor.execute(query, (status, envio_id))
-            self.connection.commit()
-            cursor.close()
-            
-            return True
+            with self._cursor_preparado(query) as cursor:
+                cursor.execute(query, (status, envio_id))
+                
+                return True
             
         except Error as e:
             print(f"[ERRO] Erro ao atualizar status: {e}")
             return False
     
+    def atualizar_status_envios(self, atualizacoes: List[Tuple[int, str, Optional[int]]],
+                                lote: int = 1000) -> bool:
+        """
+        Atualiza o status de vários envios individuais em uma transação
+        
+        As atualizações são agrupadas por status e data de envio, com um
+        UPDATE ... WHERE id IN (...) por grupo.
+        
+        Args:
+            atualizacoes: Lista de (envio_id, status, atraso_segundos); data_envio
+                          recebe NOW() - atraso_segundos, ou fica inalterada se
+                          o atraso for None
+            lote: Máximo de IDs por UPDATE
+        
+        Returns:
+            True se atualizado com sucesso
+        """
+        grupos: Dict[Tuple[str, Optional[int]], List[int]] = {}
+        for envio_id, status, atraso in atualizacoes:
+            grupos.setdefault((status, atraso), []).append(envio_id)
+        
+        try:
+            with self._conexao() as conexao:
+                cursor = conexao.cursor()
+                conexao.start_transaction()
+                
+                for (status, atraso), ids in grupos.items():
+                    for inicio in range(0, len(ids), lote):
+                        parte = ids[inicio:inicio + lote]
+                        marcadores = ', '.join(['%s'] * len(parte))
+                        if atraso is None:
+                            cursor.execute(
+                                f"UPDATE envios_individuais SET status = %s WHERE id IN ({marcadores})",
+                                (status, *parte)
+                            )
+                        else:
+                            cursor.execute(
+                                f"""
+                                UPDATE envios_individuais
+                                SET status = %s, data_envio = NOW() - INTERVAL %s SECOND
+                                WHERE id IN ({marcadores})
+                                """,
+                                (status, atraso, *parte)
+                            )
+                
+                conexao.commit()
+                cursor.close()
+                
+                return True
+            
+        except Error as e:
+            print(f"[ERRO] Erro ao atualizar status em lote: {e}")
+            return False
+    
     def buscar_envio_por_hash(self, hash_envio: str) -> Optional[Dict]:
         """
         Busca envio individual pelo hash de envio
@@ -445,24 +973,19 @@ class DatabaseManager:
         Returns:
             Dicionário com informações do envio ou None
         """
-        if not self.connection or not self.connection.is_connected():
-            return None
-        
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            
-            query = """
-                SELECT ei.*, f.edicao, f.fasciculo
-                FROM envios_individuais ei
-                JOIN fasciculos f ON ei.hash_fasciculo = f.hash_id
-                WHERE ei.hash_envio = %s
-            """
-            
-            cursor.execute(query, (hash_envio,))
-            result = cursor.fetchone()
-            cursor.close()
-            
-            return result
+            with self._cursor(dictionary=True) as cursor:
+                query = """
+                    SELECT ei.*, f.edicao, f.fasciculo
+                    FROM envios_individuais ei
+                    JOIN fasciculos f ON ei.hash_fasciculo = f.hash_id
+                    WHERE ei.hash_envio = %s
+                """
+                
+                cursor.execute(query, (hash_envio,))
+                result = cursor.fetchone()
+                
+                return result
             
         except Error as e:
             print(f"[ERRO] Erro ao buscar envio: {e}")
@@ -478,30 +1001,509 @@ class DatabaseManager:
         Returns:
             Lista de dicionários com envios
         """
-        if not self.connection or not self.connection.is_connected():
+        try:
+            with self._cursor(dictionary=True) as cursor:
+                query = """
+                    SELECT * FROM envios_individuais
+                    WHERE hash_fasciculo = %s
+                    ORDER BY created_at
+                """
+                
+                cursor.execute(query, (hash_fasciculo,))
+                results = cursor.fetchall()
+                
+                return results
+            
+        except Error as e:
+            print(f"[ERRO] Erro ao buscar envios: {e}")
             return []
+    
+    def buscar_envios_fasciculo_pagina(self, hash_fasciculo: str, limite: int = 100,
+                                       apos: Optional[int] = None) -> List[Dict]:
+        """
+        Busca uma página dos envios de um fascículo (paginação por chave)
+        
+        Args:
+            hash_fasciculo: Hash do fascículo
+            limite: Máximo de envios na página
+            apos: id do último envio da página anterior (None para a primeira)
         
+        Returns:
+            Lista de dicionários com envios, em ordem de id
+        """
         try:
-            cursor = self.connection.cursor(dictionary=True)
+            with self._cursor(dictionary=True) as cursor:
+                query = """
+                    SELECT * FROM envios_individuais
+                    WHERE hash_fasciculo = %s AND id > %s
+                    ORDER BY id ASC
+                    LIMIT %s
+                """
+                
+                cursor.execute(query, (hash_fasciculo, apos or 0, limite))
+                return cursor.fetchall()
             
-            query = """
-                SELECT * FROM envios_individuais
-                WHERE hash_fasciculo = %s
-                ORDER BY created_at
-            """
+        except Error as e:
+            print(f"[ERRO] Erro ao buscar envios: {e}")
+            return []
+    
+    def exportar_envios(self, hash_fasciculo: Optional[str] = None, edicao: Optional[str] = None,
+                        lote: int = 5000) -> Iterator[Dict]:
+        """
+        Percorre os envios individuais sem carregar o resultado inteiro
+        
+        Usa um cursor não bufferizado: o servidor envia as linhas conforme
+        são lidas (fetchmany de `lote` em `lote`), e a memória não cresce
+        com o total de envios. A conexão fica presa ao gerador até o fim da
+        iteração; se ela for interrompida, a conexão é fechada para descartar
+        o resto do resultado.
+        
+        Args:
+            hash_fasciculo: Só os envios deste fascículo
+            edicao: Só os envios dos fascículos desta edição
+            lote: Linhas lidas do servidor por vez
+        
+        Yields:
+            Dicionário com o envio, mais edicao e fasciculo
+        
+        Raises:
+            Error: Falha no banco (a exportação não deve seguir incompleta)
+        """
+        query = """
+            SELECT ei.*, f.edicao, f.fasciculo
+            FROM envios_individuais ei
+            JOIN fasciculos f ON ei.hash_fasciculo = f.hash_id
+        """
+        filtros, params = [], []
+        if hash_fasciculo:
+            filtros.append("ei.hash_fasciculo = %s")
+            params.append(hash_fasciculo)
+        if edicao:
+            filtros.append("f.edicao = %s")
+            params.append(edicao)
+        if filtros:
+            query += " WHERE " + " AND ".join(filtros)
+        query += " ORDER BY ei.id"
+        
+        with self._conexao() as conexao:
+            cursor = conexao.cursor(dictionary=True)
+            completo = False
+            try:
+                cursor.execute(query, tuple(params))
+                while True:
+                    rows = cursor.fetchmany(lote)
+                    if not rows:
+                        break
+                    yield from rows
+                completo = True
+            finally:
+                if not completo and getattr(conexao, 'unread_result', False):
+                    # Ler o resto só para descartá-lo custaria a exportação inteira
+                    conexao.disconnect()
+                else:
+                    cursor.close()
+    
+    def criar_envio_massa(self, hash_id: str, total_destinatarios: int) -> Optional[int]:
+        """
+        Registra o início de uma campanha de envio em massa
+        
+        Args:
+            hash_id: ID do hash do fascículo
+            total_destinatarios: Número total de destinatários
+        
+        Returns:
+            ID da campanha em envios_massa ou None em caso de erro
+        """
+        try:
+            with self._cursor() as cursor:
+                query = """
+                    INSERT INTO envios_massa 
+                    (hash_id, total_destinatarios, status)
+                    VALUES (%s, %s, 'EM_ANDAMENTO')
+                """
+                
+                cursor.execute(query, (hash_id, total_destinatarios))
+                envio_massa_id = cursor.lastrowid
+                
+                return envio_massa_id
             
-            cursor.execute(query, (hash_fasciculo,))
-            results = cursor.fetchall()
-            cursor.close()
+        except Error as e:
+            print(f"[ERRO] Erro ao registrar envio em massa: {e}")
+            return None
+    
+    def buscar_envio_massa(self, envio_massa_id: int) -> Optional[Dict]:
+        """
+        Busca uma campanha de envio em massa pelo ID
+        
+        Args:
+            envio_massa_id: ID da campanha
+        
+        Returns:
+            Dicionário com a campanha ou None
+        """
+        try:
+            with self._cursor(dictionary=True) as cursor:
+                cursor.execute("SELECT * FROM envios_massa WHERE id = %s", (envio_massa_id,))
+                result = cursor.fetchone()
+                
+                return result
             
-            return results
+        except Error as e:
+            print(f"[ERRO] Erro ao buscar envio em massa: {e}")
+            return None
+    
+    def atualizar_status_envio_massa(self, envio_massa_id: int, status: str) -> bool:
+        """
+        Atualiza o status de uma campanha (EM_ANDAMENTO, CONCLUIDO, ERRO)
+        
+        Args:
+            envio_massa_id: ID da campanha
+            status: Novo status
+        
+        Returns:
+            True se atualizado com sucesso
+        """
+        try:
+            with self._cursor() as cursor:
+                cursor.execute(
+                    "UPDATE envios_massa SET status = %s WHERE id = %s",
+                    (status, envio_massa_id)
+                )
+                
+                return True
             
         except Error as e:
-            print(f"[ERRO] Erro ao buscar envios: {e}")
+            print(f"[ERRO] Erro ao atualizar status do envio em massa: {e}")
+            return False
+    
+    def finalizar_envio_massa(self, envio_massa_id: int, enviados: int, erros: int,
+                              tempo_minutos: float) -> bool:
+        """
+        Registra a conclusão de uma campanha
+        
+        O tempo é somado ao já registrado, para que retomadas acumulem a
+        duração total da campanha.
+        
+        Args:
+            envio_massa_id: ID da campanha
+            enviados: Total de envios com sucesso
+            erros: Total de envios com erro
+            tempo_minutos: Duração desta execução em minutos
+        
+        Returns:
+            True se atualizado com sucesso
+        """
+        try:
+            with self._cursor() as cursor:
+                query = """
+                    UPDATE envios_massa 
+                    SET enviados = %s, erros = %s,
+                        tempo_total_minutos = COALESCE(tempo_total_minutos, 0) + %s,
+                        status = 'CONCLUIDO', completed_at = NOW()
+                    WHERE id = %s
+                """
+                
+                cursor.execute(query, (enviados, erros, tempo_minutos, envio_massa_id))
+                
+                return True
+            
+        except Error as e:
+            print(f"[ERRO] Erro ao finalizar envio em massa: {e}")
+            return False
+    
+    def buscar_envios_pendentes(self, envio_massa_id: int) -> List[Dict]:
+        """
+        Busca os envios de uma campanha que ainda não foram entregues
+        
+        Retorna os registros PENDENTE e ERRO (ENVIADO e CONFIRMADO ficam de
+        fora), na ordem em que foram registrados.
+        
+        Args:
+            envio_massa_id: ID da campanha
+        
+        Returns:
+            Lista de dicionários com os envios restantes
+        """
+        try:
+            with self._cursor(dictionary=True) as cursor:
+                query = """
+                    SELECT id, hash_envio, hash_verificacao, destinatario_email,
+                           destinatario_nome, status, tentativas
+                    FROM envios_individuais
+                    WHERE envio_massa_id = %s AND status IN ('PENDENTE', 'ERRO')
+                    ORDER BY id
+                """
+                
+                cursor.execute(query, (envio_massa_id,))
+                results = cursor.fetchall()
+                
+                return results
+            
+        except Error as e:
+            print(f"[ERRO] Erro ao buscar envios pendentes: {e}")
+            return []
+    
+    def contar_envios_por_status(self, envio_massa_id: int) -> Dict[str, int]:
+        """
+        Conta os envios de uma campanha agrupados por status
+        
+        Args:
+            envio_massa_id: ID da campanha
+        
+        Returns:
+            Dicionário {status: total}
+        """
+        try:
+            with self._cursor() as cursor:
+                query = """
+                    SELECT status, COUNT(*)
+                    FROM envios_individuais
+                    WHERE envio_massa_id = %s
+                    GROUP BY status
+                """
+                
+                cursor.execute(query, (envio_massa_id,))
+                results = {status: total for status, total in cursor.fetchall()}
+                
+                return results
+            
+        except Error as e:
+            print(f"[ERRO] Erro ao contar envios: {e}")
+            return {}
+    
+    def reivindicar_lote(self, envio_massa_id: int, worker_id: str, tamanho: int,
+                         lease_segundos: int) -> List[Dict]:
+        """
+        Reivindica atomicamente um lote de envios PENDENTE para um worker
+        
+        Os registros continuam PENDENTE, mas ficam reservados ao worker até
+        o lease expirar. Se o worker cair, o lote volta a ficar disponível
+        para os demais. SKIP LOCKED (MySQL 8.0+) faz com que workers
+        concorrentes peguem lotes diferentes sem esperar uns pelos outros.
+        
+        Args:
+            envio_massa_id: ID da campanha
+            worker_id: Identificador do worker
+            tamanho: Número máximo de envios no lote
+            lease_segundos: Validade da reivindicação em segundos
+        
+        Returns:
+            Lista de envios reivindicados (vazia se não há trabalho disponível)
+        """
+        try:
+            with self._conexao() as conexao:
+                cursor = conexao.cursor(dictionary=True)
+                conexao.start_transaction()
+                
+                query = """
+                    SELECT id, hash_envio, hash_verificacao, destinatario_email,
+                           destinatario_nome, tentativas
+                    FROM envios_individuais
+                    WHERE envio_massa_id = %s AND status = 'PENDENTE'
+                      AND (lease_expira_em IS NULL OR lease_expira_em < NOW())
+                      AND (proxima_tentativa IS NULL OR proxima_tentativa <= NOW())
+                    ORDER BY id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                """
+                
+                cursor.execute(query, (envio_massa_id, tamanho))
+                lote = cursor.fetchall()
+                
+                if lote:
+                    marcadores = ', '.join(['%s'] * len(lote))
+                    cursor.execute(
+                        f"""
+                        UPDATE envios_individuais
+                        SET worker_id = %s, lease_expira_em = NOW() + INTERVAL %s SECOND
+                        WHERE id IN ({marcadores})
+                        """,
+                        (worker_id, lease_segundos, *[envio['id'] for envio in lote])
+                    )
+                
+                conexao.commit()
+                cursor.close()
+                
+                return lote
+            
+        except Error as e:
+            print(f"[ERRO] Erro ao reivindicar lote: {e}")
             return []
+    
+    def renovar_lease(self, envio_massa_id: int, worker_id: str, lease_segundos: int) -> int:
+        """
+        Estende o lease dos envios ainda pendentes reivindicados pelo worker
+        
+        Args:
+            envio_massa_id: ID da campanha
+            worker_id: Identificador do worker
+            lease_segundos: Nova validade em segundos, a partir de agora
+        
+        Returns:
+            Número de envios renovados
+        """
+        try:
+            with self._cursor() as cursor:
+                query = """
+                    UPDATE envios_individuais
+                    SET lease_expira_em = NOW() + INTERVAL %s SECOND
+                    WHERE envio_massa_id = %s AND worker_id = %s AND status = 'PENDENTE'
+                """
+                
+                cursor.execute(query, (lease_segundos, envio_massa_id, worker_id))
+                renovados = cursor.rowcount
+                
+                return renovados
+            
+        except Error as e:
+            print(f"[ERRO] Erro ao renovar lease: {e}")
+            return 0
+    
+    def registrar_tentativa(self, envio_id: int, tentativas: int,
+                            espera_segundos: Optional[float] = None) -> bool:
+        """
+        Registra uma tentativa de envio que falhou
+        
+        Args:
+            envio_id: ID do envio
+            tentativas: Total de tentativas feitas até agora
+            espera_segundos: Segundos até o próximo reenvio (None = sem novo reenvio)
+        
+        Returns:
+            True se registrado com sucesso
+        """
+        try:
+            with self._cursor() as cursor:
+                if espera_segundos is None:
+                    query = """
+                        UPDATE envios_individuais
+                        SET tentativas = %s, proxima_tentativa = NULL
+                        WHERE id = %s
+                    """
+                    cursor.execute(query, (tentativas, envio_id))
+                else:
+                    query = """
+                        UPDATE envios_individuais
+                        SET tentativas = %s, proxima_tentativa = NOW() + INTERVAL %s SECOND
+                        WHERE id = %s
+                    """
+                    cursor.execute(query, (tentativas, int(espera_segundos), envio_id))
+                
+                
+                return True
+            
+        except Error as e:
+            print(f"[ERRO] Erro ao registrar tentativa: {e}")
+            return False
+    
+    def reservar_quota(self, chave: str, janelas: List[Tuple[str, int, float]],
+                       quantidade: int = 1, fatias: int = 60) -> Optional[float]:
+        """
+        Reserva envios na quota compartilhada entre processos (quotas_envio)
+        
+        Cada janela é contada em fatias de período/fatias segundos pelo
+        relógio do banco, como em rate_limiter.JanelaDeslizante: nenhum
+        intervalo do período passa da capacidade, somando todos os workers e
+        execuções que usam a mesma chave. A linha de controle da chave fica
+        travada durante a transação, então as reservas são feitas uma de
+        cada vez.
+        
+        Args:
+            chave: Conta cuja quota é compartilhada
+            janelas: Lista de (nome, capacidade, período em segundos)
+            quantidade: Envios a reservar
+            fatias: Fatias em que cada janela é contada
+        
+        Returns:
+            0.0 se reservado; senão segundos até a quota comportar os envios
+            (nada é reservado); None em caso de erro
+        """
+        try:
+            with self._conexao() as conexao:
+                cursor = conexao.cursor()
+                conexao.start_transaction()
+                
+                # Trava a linha de controle da chave (criada na primeira reserva)
+                cursor.execute(
+                    "SELECT envios FROM quotas_envio WHERE chave = %s AND janela = '' AND fatia = 0 FOR UPDATE",
+                    (chave,)
+                )
+                if cursor.fetchone() is None:
+                    cursor.execute(
+                        "INSERT INTO quotas_envio (chave, janela, fatia, envios) VALUES (%s, '', 0, 0)",
+                        (chave,)
+                    )
+                
+                cursor.execute("SELECT UNIX_TIMESTAMP(NOW(6))")
+                agora = float(cursor.fetchone()[0])
+                
+                espera = 0.0
+                atuais = []
+                for nome, capacidade, periodo in janelas:
+                    duracao = periodo / fatias
+                    atual = int(agora // duracao)
+                    atuais.append((nome, atual))
+                    
+                    # A fatia mais antiga que toca a janela conta inteira
+                    cursor.execute("""
+                        SELECT fatia, envios FROM quotas_envio
+                        WHERE chave = %s AND janela = %s AND fatia >= %s
+                        ORDER BY fatia
+                    """, (chave, nome, atual - fatias))
+                    contagens = cursor.fetchall()
+                    
+                    excesso = sum(envios for _, envios in contagens) + quantidade - capacidade
+                    for fatia, envios in contagens:
+                        if excesso <= 0:
+                            break
+                        excesso -= envios
+                        espera = max(espera, (fatia + fatias + 1) * duracao - agora)
+                    if excesso > 0:
+                        espera = max(espera, periodo)
+                
+                if espera <= 0:
+                    for nome, atual in atuais:
+                        cursor.execute("""
+                            UPDATE quotas_envio SET envios = envios + %s
+                            WHERE chave = %s AND janela = %s AND fatia = %s
+                        """, (quantidade, chave, nome, atual))
+                        if not cursor.rowcount:
+                            cursor.execute(
+                                "INSERT INTO quotas_envio (chave, janela, fatia, envios) VALUES (%s, %s, %s, %s)",
+                                (chave, nome, atual, quantidade)
+                            )
+                            # Fatia nova: as que saíram da janela não contam mais
+                            cursor.execute(
+                                "DELETE FROM quotas_envio WHERE chave = %s AND janela = %s AND fatia < %s",
+                                (chave, nome, atual - fatias)
+                            )
+                
+                conexao.commit()
+                cursor.close()
+                
+                return max(0.0, espera)
+            
+        except Error as e:
+            if e.errno == 1146:
+                print("[AVISO] Tabela quotas_envio não existe (execute migrations/add_quotas_envio.py)")
+            else:
+                print(f"[ERRO] Erro ao reservar quota: {e}")
+            return None
 
-        finally:
-            cursor.close()
+
+
+def criar_database_manager() -> DatabaseManager:
+    """
+    Cria o gerenciador do banco configurado em DB_ENGINE
+    
+    Returns:
+        DatabaseManager (mysql, padrão) ou SQLiteDatabaseManager (sqlite,
+        substituto local para testes e benchmarks)
+    """
+    if os.getenv('DB_ENGINE', 'mysql').lower() == 'sqlite':
+        from database_sqlite import SQLiteDatabaseManager
+        return SQLiteDatabaseManager()
+    return DatabaseManager()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,321 @@
+"""
+Gerenciador de Banco de Dados SQLite
+Substituto local do MySQL para testes, benchmarks e workers em uma única máquina
+"""
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List
+
+from mysql.connector import Error
+
+from database import DatabaseManager
+
+
+# Traduções do dialeto MySQL usado em DatabaseManager para o SQLite
+_TRADUCOES = [
+    (re.compile(r'\bNOW\(\) ([+-]) INTERVAL %s SECOND'), r"datetime('now', '\1' || %s || ' seconds')"),
+    (re.compile(r'\b(\w+\.\w+) ([+-]) INTERVAL %s SECOND'), r"datetime(\1, '\2' || %s || ' seconds')"),
+    # O SQLite trava o banco inteiro na transação (BEGIN IMMEDIATE)
+    (re.compile(r'\s+FOR UPDATE\b'), ''),
+    # Via julianday: um strftime('%s') seria trocado pela regra de %s abaixo
+    (re.compile(r'\bUNIX_TIMESTAMP\(NOW\(6\)\)'), "((julianday('now') - 2440587.5) * 86400.0)"),
+    (re.compile(r'\bUNIX_TIMESTAMP\(\)'), "CAST(ROUND((julianday('now') - 2440587.5) * 86400) AS INTEGER)"),
+    (re.compile(r'\bUNIX_TIMESTAMP\((\w+)\)'), r"CAST(ROUND((julianday(\1) - 2440587.5) * 86400) AS INTEGER)"),
+    (re.compile(r'\bFROM_UNIXTIME\(%s\)'), "datetime(%s, 'unixepoch')"),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\bNOW\(\)'), 'CURRENT_TIMESTAMP')
+]
+
+
+class _CursorSQLite:
+    """Cursor SQLite com a interface do cursor do mysql.connector"""
+    
+    def __init__(self, cursor: sqlite3.Cursor, dictionary: bool = False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+    
+    @staticmethod
+    def _traduzir(query: str) -> str:
+        for padrao, substituto in _TRADUCOES:
+            query = padrao.sub(substituto, query)
+        return query
+    
+    def execute(self, query: str, params=()):
+        try:
+            self._cursor.execute(self._traduzir(query), tuple(params or ()))
+        except sqlite3.Error as e:
+            raise Error(msg=str(e)) from e
+    
+    def executemany(self, query: str, seq_params):
+        try:
+            self._cursor.executemany(self._traduzir(query), [tuple(p) for p in seq_params])
+        except sqlite3.Error as e:
+            raise Error(msg=str(e)) from e
+    
+    def _converter(self, row):
+        if row is None or not self._dictionary:
+            return tuple(row) if row is not None else None
+        return dict(row)
+    
+    def fetchone(self):
+        return self._converter(self._cursor.fetchone())
+    
+    def fetchall(self):
+        return [self._converter(row) for row in self._cursor.fetchall()]
+    
+    def fetchmany(self, size: int = 1):
+        return [self._converter(row) for row in self._cursor.fetchmany(size)]
+    
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+    
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+    
+    def close(self):
+        self._cursor.close()
+
+
+class _ConexaoSQLite:
+    """Conexão SQLite com a interface da conexão do mysql.connector"""
+    
+    def __init__(self, caminho: str):
+        # isolation_level=None: autocommit, como o DatabaseManager configura no MySQL
+        self._conexao = sqlite3.connect(
+            caminho, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conexao.row_factory = sqlite3.Row
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA foreign_keys=ON")
+        self._aberta = True
+    
+    def is_connected(self) -> bool:
+        return self._aberta
+    
+    def cursor(self, dictionary: bool = False) -> _CursorSQLite:
+        return _CursorSQLite(self._conexao.cursor(), dictionary)
+    
+    def start_transaction(self):
+        # IMMEDIATE reserva a escrita já no início: reivindicações não se cruzam
+        self._conexao.execute("BEGIN IMMEDIATE")
+    
+    def commit(self):
+        if self._conexao.in_transaction:
+            self._conexao.commit()
+    
+    def rollback(self):
+        if self._conexao.in_transaction:
+            self._conexao.rollback()
+    
+    def close(self):
+        self._conexao.close()
+        self._aberta = False
+
+
+class SQLiteDatabaseManager(DatabaseManager):
+    """
+    Gerencia conexão e operações com SQLite (mesma interface do DatabaseManager)
+    
+    Em vez do pool do MySQL, todas as operações usam a conexão única do
+    arquivo, uma de cada vez entre as threads.
+    """
+    
+    def __init__(self, caminho: str = None):
+        """
+        Inicializa o gerenciador
+        
+        Args:
+            caminho: Arquivo do banco (padrão: DB_SQLITE_PATH ou data/auditoria.db)
+        """
+        super().__init__()
+        self.caminho = caminho or os.getenv('DB_SQLITE_PATH', 'data/auditoria.db')
+        self.config['database'] = self.caminho
+        self._lock = threading.RLock()
+    
+    def connect(self):
+        """Abre o arquivo SQLite e garante que as tabelas existem"""
+        try:
+            if self.caminho != ':memory:':
+                Path(self.caminho).parent.mkdir(parents=True, exist_ok=True)
+            self.connection = _ConexaoSQLite(self.caminho)
+            print(f"[OK] Conectado ao SQLite: {self.caminho}")
+            return self.create_tables()
+        except (sqlite3.Error, OSError) as e:
+            print(f"[ERRO] Erro ao conectar ao SQLite: {e}")
+            return False
+    
+    def disconnect(self):
+        """Fecha conexão com o banco de dados"""
+        if self.connection and self.connection.is_connected():
+            self.connection.close()
+            print("[OK] Conexão com SQLite encerrada")
+    
+    @contextmanager
+    def _conexao(self):
+        """Usa a conexão do arquivo (aberta se preciso) com exclusividade durante o bloco"""
+        with self._lock:
+            if not self.connection or not self.connection.is_connected():
+                if not self.connect():
+                    raise Error(msg=f"Não foi possível abrir o SQLite: {self.caminho}")
+            try:
+                yield self.connection
+            finally:
+                self.connection.rollback()
+    
+    @contextmanager
+    def _cursor_preparado(self, query: str):
+        """Cursor comum: o sqlite3 já guarda os comandos compilados em cache"""
+        with self._cursor() as cursor:
+            yield cursor
+    
+    def create_tables(self):
+        """Cria as tabelas (já com as colunas de todas as migrações)"""
+        if not self.connection or not self.connection.is_connected():
+            return False
+        
+        try:
+            self.connection._conexao.executescript("""
+                CREATE TABLE IF NOT EXISTS fasciculos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    hash_id TEXT UNIQUE NOT NULL,
+                    edicao TEXT NOT NULL,
+                    fasciculo TEXT NOT NULL,
+                    fasciculo_hash TEXT NOT NULL,
+                    pdf_path TEXT,
+                    pdf_size INTEGER,
+                    algorithm TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+                
+                CREATE TABLE IF NOT EXISTS logs_eventos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    hash_id TEXT NOT NULL,
+                    evento_tipo TEXT NOT NULL,
+                    destinatario TEXT,
+                    nome_destinatario TEXT,
+                    dados_adicionais TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+                CREATE INDEX IF NOT EXISTS idx_logs_hash_id ON logs_eventos (hash_id);
+                
+                CREATE TABLE IF NOT EXISTS envios_massa (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    hash_id TEXT NOT NULL,
+                    total_destinatarios INTEGER NOT NULL,
+                    enviados INTEGER DEFAULT 0,
+                    erros INTEGER DEFAULT 0,
+                    tempo_total_minutos REAL,
+                    status TEXT DEFAULT 'EM_ANDAMENTO',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    completed_at TIMESTAMP NULL
+                );
+                
+                CREATE TABLE IF NOT EXISTS envios_individuais (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    envio_massa_id INTEGER NULL REFERENCES envios_massa(id) ON DELETE SET NULL,
+                    hash_fasciculo TEXT NOT NULL,
+                    hash_envio TEXT UNIQUE NOT NULL,
+                    destinatario_email TEXT NOT NULL,
+                    destinatario_nome TEXT,
+                    status TEXT DEFAULT 'PENDENTE',
+                    tentativas INTEGER NOT NULL DEFAULT 0,
+                    proxima_tentativa TIMESTAMP NULL,
+                    worker_id TEXT NULL,
+                    lease_expira_em TIMESTAMP NULL,
+                    data_envio TIMESTAMP NULL,
+                    data_confirmacao TIMESTAMP NULL,
+                    hash_verificacao TEXT NOT NULL,
+                    ip_envio TEXT,
+                    user_agent TEXT,
+                    dados_adicionais TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+                CREATE INDEX IF NOT EXISTS idx_envio_massa_lease
+                    ON envios_individuais (envio_massa_id, status, lease_expira_em);
+                CREATE INDEX IF NOT EXISTS idx_hash_fasciculo ON envios_individuais (hash_fasciculo);
+                
+                CREATE TABLE IF NOT EXISTS estatisticas_contadores (
+                    contador TEXT PRIMARY KEY,
+                    valor INTEGER NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+                
+                CREATE TABLE IF NOT EXISTS quotas_envio (
+                    chave TEXT NOT NULL,
+                    janela TEXT NOT NULL,
+                    fatia INTEGER NOT NULL,
+                    envios INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (chave, janela, fatia)
+                );
+            """)
+            return True
+        
+        except sqlite3.Error as e:
+            print(f"[ERRO] Erro ao criar tabelas: {e}")
+            return False
+    
+    def reivindicar_lote(self, envio_massa_id: int, worker_id: str, tamanho: int,
+                         lease_segundos: int) -> List[Dict]:
+        """
+        Reivindica atomicamente um lote de envios PENDENTE para um worker
+        
+        Equivalente ao SELECT ... FOR UPDATE SKIP LOCKED do MySQL: a
+        transação IMMEDIATE serializa as reivindicações entre processos.
+        """
+        try:
+            with self._conexao() as conexao:
+                cursor = conexao.cursor(dictionary=True)
+                conexao.start_transaction()
+                
+                cursor.execute("""
+                    SELECT id, hash_envio, hash_verificacao, destinatario_email,
+                           destinatario_nome, tentativas
+                    FROM envios_individuais
+                    WHERE envio_massa_id = ? AND status = 'PENDENTE'
+                      AND (lease_expira_em IS NULL OR lease_expira_em < datetime('now'))
+                      AND (proxima_tentativa IS NULL OR proxima_tentativa <= datetime('now'))
+                    ORDER BY id
+                    LIMIT ?
+                """, (envio_massa_id, tamanho))
+                lote = cursor.fetchall()
+            
+                if lote:
+                    marcadores = ', '.join(['?'] * len(lote))
+                    cursor.execute(
+                        f"""
+                        UPDATE envios_individuais
+                        SET worker_id = ?, lease_expira_em = datetime('now', ?)
+                        WHERE id IN ({marcadores})
+                        """,
+                        (worker_id, f'+{int(lease_segundos)} seconds', *[envio['id'] for envio in lote])
+                    )
+            
+                conexao.commit()
+                cursor.close()
+                
+                return lote
+        
+        except Error as e:
+            print(f"[ERRO] Erro ao reivindicar lote: {e}")
+            return []
+    
+    def renovar_lease(self, envio_massa_id: int, worker_id: str, lease_segundos: int) -> int:
+        """Estende o lease dos envios ainda pendentes reivindicados pelo worker"""
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("""
+                    UPDATE envios_individuais
+                    SET lease_expira_em = datetime('now', ?)
+                    WHERE envio_massa_id = ? AND worker_id = ? AND status = 'PENDENTE'
+                """, (f'+{int(lease_segundos)} seconds', envio_massa_id, worker_id))
+                return cursor.rowcount
+        
+        except Error as e:
+            print(f"[ERRO] Erro ao renovar lease: {e}")
+            return 0
@@ -0,0 +1,261 @@
+"""
+Agendador de Envios por Domínio
+Intercala destinatários por domínio com limites próprios de concorrência e taxa
+"""
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from rate_limiter import RateLimiter
+
+
+# Códigos de falha temporária na recusa de um destinatário (domínio limitando)
+CODIGOS_TEMPORARIOS_DOMINIO = {421, 450, 451, 452}
+
+
+def extrair_dominio(email: str) -> str:
+    """Retorna o domínio (em minúsculas) de um endereço de email"""
+    return email.rsplit('@', 1)[-1].strip().lower()
+
+
+class _Dominio:
+    """Fila e estado de envio de um domínio"""
+    
+    def __init__(self, nome: str, limites: Dict[str, int]):
+        self.nome = nome
+        self.fila = deque()
+        self.concorrencia = max(1, int(limites.get('concorrencia', 1)))
+        self.limiter = RateLimiter({
+            janela: limite for janela, limite in limites.items() if janela != 'concorrencia'
+        })
+        self.em_andamento = 0
+        self.enviados = 0
+        self.falhas_seguidas = 0
+        self.suspenso_ate = 0.0
+    
+    def tempo_ate_disponivel(self, agora: float) -> Optional[float]:
+        """Segundos até o domínio aceitar novo envio (None = depende de conclusões)"""
+        if self.em_andamento >= self.concorrencia:
+            return None
+        return max(self.suspenso_ate - agora, self.limiter.tempo_ate_recarga(), 0.0)
+
+
+class DomainScheduler:
+    """
+    Agenda os envios intercalando os domínios em round-robin
+    
+    Cada domínio tem sua própria fila, limite de envios simultâneos, quotas
+    (janela deslizante) e suspensão temporária quando o domínio recusa
+    destinatários com códigos 4xx. Um domínio limitado não impede que os
+    demais continuem recebendo.
+    
+    Deve ser usado apenas pela thread que despacha os envios.
+    """
+    
+    def __init__(
+        self,
+        limites_padrao: Dict[str, int],
+        limites_por_dominio: Optional[Dict[str, Dict[str, int]]] = None,
+        suspensao_base: float = 30.0,
+        suspensao_max: float = 900.0
+    ):
+        """
+        Inicializa o agendador
+        
+        Args:
+            limites_padrao: Limites de qualquer domínio, ex: {'concorrencia': 2, 'minuto': 30}
+            limites_por_dominio: Limites específicos, ex: {'gmail.com': {'concorrencia': 4}}
+            suspensao_base: Suspensão (s) após a primeira recusa temporária
+            suspensao_max: Suspensão máxima (s) após recusas seguidas
+        """
+        self.limites_padrao = limites_padrao
+        self.limites_por_dominio = {
+            dominio.lower(): limites for dominio, limites in (limites_por_dominio or {}).items()
+        }
+        self.suspensao_base = suspensao_base
+        self.suspensao_max = suspensao_max
+        
+        self._dominios: Dict[str, _Dominio] = {}
+        self._ordem: List[str] = []
+        self._cursor = 0
+        self._pendentes = 0
+    
+    def _dominio(self, nome: str) -> _Dominio:
+        if nome not in self._dominios:
+            limites = {**self.limites_padrao, **self.limites_por_dominio.get(nome, {})}
+            self._dominios[nome] = _Dominio(nome, limites)
+            self._ordem.append(nome)
+        return self._dominios[nome]
+    
+    def adicionar(self, item: Any, email: str):
+        """
+        Enfileira um item de envio no domínio do destinatário
+        
+        Args:
+            item: Item a ser devolvido por proximo()
+            email: Email do destinatário
+        """
+        self._dominio(extrair_dominio(email)).fila.append(item)
+        self._pendentes += 1
+    
+    @property
+    def pendentes(self) -> int:
+        """Número de itens ainda não despachados"""
+        return self._pendentes
+    
+    def proximo(self) -> Optional[Any]:
+        """
+        Retorna o próximo item em round-robin entre os domínios liberados
+        
+        Consome a quota do domínio escolhido e o marca como em andamento.
+        
+        Returns:
+            Item enfileirado ou None se nenhum domínio pode enviar agora
+        """
+        agora = time.monotonic()
+        total = len(self._ordem)
+        
+        for passo in range(total):
+            nome = self._ordem[(self._cursor + passo) % total]
+            dominio = self._dominios[nome]
+            
+            if not dominio.fila or dominio.tempo_ate_disponivel(agora) != 0.0:
+                continue
+            if not dominio.limiter.tentar_adquirir():
+                continue
+            
+            self._cursor = (self._cursor + passo + 1) % total
+            dominio.em_andamento += 1
+            self._pendentes -= 1
+            return dominio.fila.popleft()
+        
+        return None
+    
+    def proximos(self, quantidade: int) -> List[Any]:
+        """
+        Itens que devem sair a seguir, sem consumi-los
+        
+        Segue a ordem round-robin a partir do domínio atual, ignorando quotas
+        e suspensões; serve para preparar os envios com antecedência.
+        
+        Args:
+            quantidade: Número máximo de itens
+        
+        Returns:
+            Até `quantidade` itens, na ordem provável de saída
+        """
+        total = len(self._ordem)
+        filas = [self._dominios[self._ordem[(self._cursor + passo) % total]].fila for passo in range(total)]
+        itens = []
+        profundidade = 0
+        while len(itens) < quantidade:
+            filas = [fila for fila in filas if len(fila) > profundidade]
+            if not filas:
+                break
+            for fila in filas[:quantidade - len(itens)]:
+                itens.append(fila[profundidade])
+            profundidade += 1
+        return itens
+    
+    def devolver(self, item: Any, email: str):
+        """
+        Devolve ao início da fila um item de proximo() que não foi enviado
+        
+        Desfaz o consumo da quota e a marcação de em andamento do domínio.
+        
+        Args:
+            item: Item retornado por proximo()
+            email: Email do destinatário
+        """
+        dominio = self._dominio(extrair_dominio(email))
+        dominio.fila.appendleft(item)
+        dominio.em_andamento = max(0, dominio.em_andamento - 1)
+        dominio.limiter.devolver()
+        self._pendentes += 1
+    
+    def tempo_ate_disponivel(self) -> Optional[float]:
+        """
+        Segundos até algum domínio com itens pendentes poder enviar
+        
+        Returns:
+            Menor espera entre os domínios, ou None se todos dependem da
+            conclusão de envios em andamento
+        """
+        agora = time.monotonic()
+        esperas = [
+            espera for espera in (
+                dominio.tempo_ate_disponivel(agora)
+                for dominio in self._dominios.values() if dominio.fila
+            )
+            if espera is not None
+        ]
+        return min(esperas) if esperas else None
+    
+    def concluir(self, email: str, resultado: Dict) -> Optional[float]:
+        """
+        Registra a conclusão de um envio do domínio
+        
+        Args:
+            email: Email do destinatário
+            resultado: Resultado retornado pelo EmailSender
+        
+        Returns:
+            Segundos de suspensão aplicados ao domínio, ou None
+        """
+        dominio = self._dominio(extrair_dominio(email))
+        dominio.em_andamento = max(0, dominio.em_andamento - 1)
+        
+        if resultado.get('success'):
+            dominio.enviados += 1
+            dominio.falhas_seguidas = 0
+            return None
+        
+        if not resultado.get('destinatario_recusado'):
+            return None
+        if resultado.get('smtp_code') not in CODIGOS_TEMPORARIOS_DOMINIO:
+            return None
+        
+        # Backoff exponencial só para este domínio
+        suspensao = min(self.suspensao_max, self.suspensao_base * (2 ** dominio.falhas_seguidas))
+        dominio.falhas_seguidas += 1
+        dominio.suspenso_ate = time.monotonic() + suspensao
+        return suspensao
+    
+    def status(self) -> Dict[str, Dict]:
+        """Retorna o estado de cada domínio"""
+        agora = time.monotonic()
+        return {
+            nome: {
+                'pendentes': len(dominio.fila),
+                'em_andamento': dominio.em_andamento,
+                'enviados': dominio.enviados,
+                'concorrencia': dominio.concorrencia,
+                'suspenso_segundos': round(max(0.0, dominio.suspenso_ate - agora), 1)
+            }
+            for nome, dominio in self._dominios.items()
+        }
+
+
+if __name__ == "__main__":
+    # Teste do agendador por domínio
+    print("=== Agendador de Envios por Domínio ===")
+    
+    agendador = DomainScheduler(
+        limites_padrao={'concorrencia': 1},
+        limites_por_dominio={'gmail.com': {'concorrencia': 2}}
+    )
+    
+    emails = [f"u{i}@gmail.com" for i in range(5)] + ["a@empresa.com.br", "b@outlook.com", "c@empresa.com.br"]
+    for email in emails:
+        agendador.adicionar(email, email)
+    
+    ordem = []
+    while agendador.pendentes:
+        email = agendador.proximo()
+        if email is None:
+            break
+        ordem.append(email)
+    
+    print(f"\nDespachados sem conclusões: {ordem}")
+    agendador.concluir('u0@gmail.com', {'success': False, 'destinatario_recusado': True, 'smtp_code': 450})
+    print(f"Status após 450 no gmail.com: {agendador.status()['gmail.com']}")
@@ -2,26 +2,66 @@
 Sistema de Envio de Email
 Responsável por enviar fascículos por email
 """
+import base64
+import os
+import re
 import smtplib
+import socket
+import subprocess
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from email.mime.base import MIMEBase
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
+from email.utils import parseaddr
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
 
+# Bytes do PDF lidos por vez no envio em streaming: múltiplo de 57, para que
+# cada bloco vire linhas base64 completas de 76 caracteres
+BLOCO_STREAMING = 57 * 1024
+
+# Erros sem resposta SMTP que podem dar certo em nova tentativa (rede, DNS,
+# servidor caiu no meio da conversa); os demais (arquivo, dados) são definitivos
+ERROS_REDE = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError, socket.gaierror)
+
+# Código de saída do sendmail para falha temporária (sysexits.h: EX_TEMPFAIL)
+SENDMAIL_TEMPFAIL = 75
+
+
 class EmailSender:
     """Gerencia o envio de emails com fascículos"""
     
-    def __init__(self, smtp_config: Dict[str, str]):
+    def __init__(self, smtp_config: Dict[str, str], roteador=None, metricas=None):
         """
         Inicializa o enviador de emails
         
         Args:
-            smtp_config: Configurações SMTP (server, port, user, password, from)
+            smtp_config: Configurações SMTP (server, port, user, password, from,
+                         starttls e streaming opcionais; sem user o envio é
+                         feito sem login). Com backend 'spool' (spool_dir) ou
+                         'sendmail' (sendmail) a mensagem é entregue ao MTA
+                         local em vez de uma sessão SMTP
+            roteador: RelayRouter para distribuir os envios entre vários relays
+                      (opcional; sem ele todos os envios usam smtp_config)
+            metricas: Objeto com registrar(etapa, segundos), ex: Metricas, que
+                      recebe a duração de cada fase do envio como smtp_<fase>
+                      (opcional)
         """
         self.smtp_config = smtp_config
+        self.roteador = roteador
+        self.metricas = metricas
+        
+        if smtp_config.get('backend') == 'spool':
+            # Estrutura maildir: gravação em tmp/, entrega por rename para new/
+            spool = Path(smtp_config['spool_dir'])
+            for subdiretorio in ('tmp', 'new', 'cur'):
+                (spool / subdiretorio).mkdir(parents=True, exist_ok=True)
     
     def send_fasciculo(
         self,
@@ -29,7 +69,8 @@ class EmailSender:
         fasciculo_info: Dict,
         pdf_path: Path,
         assunto: Optional[str] = None,
-        mensagem_adicional: Optional[str] = None
+        mensagem_adicional: Optional[str] = None,
+        link_download: Optional[Dict] = None
     ) -> Dict:
         """
         Envia um fascículo por email
@@ -40,37 +81,22 @@ class EmailSender:
             pdf_path: Caminho para o arquivo PDF
             assunto: Assunto do email (opcional)
             mensagem_adicional: Mensagem adicional no corpo do email (opcional)
+            link_download: Link do PDF publicado (url, checksum, tamanho). Quando
+                           informado, o PDF não é anexado (opcional)
         
         Returns:
-            Dicionário com resultado do envio
+            Dicionário com resultado do envio e tempos_ms (duração de cada fase:
+            dns, conexao, starttls, auth, dados, codificacao). Em caso de falha,
+            traz smtp_code e transitorio (True se uma nova tentativa pode dar
+            certo: 4xx, falhas de rede; False para 5xx e erros locais)
         """
+        tempos = {}
         try:
-            # Cria mensagem
-            msg = MIMEMultipart()
-            msg['From'] = self.smtp_config['from']
-            msg['To'] = destinatario
-            msg['Subject'] = assunto or f"Fascículo: {fasciculo_info['edicao']} - {fasciculo_info['fasciculo']}"
-            
-            # Corpo do email
-            corpo = self._create_email_body(fasciculo_info, mensagem_adicional)
-            msg.attach(MIMEText(corpo, 'html', 'utf-8'))
-            
-            # Anexa PDF se existir
-            if pdf_path and pdf_path.exists():
-                with open(pdf_path, 'rb') as f:
-                    pdf_attachment = MIMEApplication(f.read(), _subtype='pdf')
-                    pdf_attachment.add_header(
-                        'Content-Disposition',
-                        'attachment',
-                        filename=pdf_path.name
-                    )
-                    msg.attach(pdf_attachment)
+            msg = self._montar_mensagem(destinatario, fasciculo_info, assunto, mensagem_adicional, link_download)
             
-            # Envia email
-            with smtplib.SMTP(self.smtp_config['server'], self.smtp_config['port']) as server:
-                server.starttls()
-                server.login(self.smtp_config['user'], self.smtp_config['password'])
-                server.send_message(msg)
+            # Anexa PDF se existir (na entrega por link o email leva só o link)
+            anexo = pdf_path if pdf_path and pdf_path.exists() and not link_download else None
+            _, relay = self._entregar(msg, [destinatario], anexo, tempos)
             
             return {
                 'success': True,
@@ -79,6 +105,8 @@ class EmailSender:
                 'hash_id': fasciculo_info.get('hash_id'),
                 'edicao': fasciculo_info.get('edicao'),
                 'fasciculo': fasciculo_info.get('fasciculo'),
+                'relay': relay,
+                'tempos_ms': self._registrar_tempos(tempos),
                 'message': 'Email enviado com sucesso'
             }
             
@@ -88,14 +116,612 @@ class EmailSender:
                 'destinatario': destinatario,
                 'timestamp': datetime.utcnow().isoformat(),
                 'hash_id': fasciculo_info.get('hash_id'),
+                'smtp_code': self._extrair_codigo_smtp(e),
+                'transitorio': self._erro_transitorio(e),
+                'destinatario_recusado': isinstance(e, smtplib.SMTPRecipientsRefused),
+                'tempos_ms': self._registrar_tempos(tempos),
                 'error': str(e),
                 'message': f'Erro ao enviar email: {e}'
             }
     
-    def _create_email_body(
+    def send_fasciculo_lote(
         self,
+        destinatarios: List[str],
         fasciculo_info: Dict,
+        pdf_path: Path,
+        assunto: Optional[str] = None,
         mensagem_adicional: Optional[str] = None
+    ) -> Dict:
+        """
+        Envia a mesma mensagem a vários destinatários em uma única transação SMTP
+        
+        O corpo e o anexo trafegam uma vez, com um RCPT TO por destinatário.
+        Só serve para campanhas sem personalização: todos recebem exatamente o
+        mesmo email, com os destinatários ocultos (nenhum aparece no To).
+        
+        Args:
+            destinatarios: Emails dos destinatários
+            fasciculo_info: Informações do fascículo (edicao, fasciculo, hash_id, etc)
+            pdf_path: Caminho para o arquivo PDF
+            assunto: Assunto do email (opcional)
+            mensagem_adicional: Mensagem adicional no corpo do email (opcional)
+        
+        Returns:
+            Resultado da transação com a lista `resultados`, um dicionário por
+            destinatário (mesmo formato de send_fasciculo) conforme a resposta
+            ao seu RCPT TO, e tempos_ms da transação
+        """
+        timestamp = datetime.utcnow().isoformat()
+        tempos = {}
+        
+        try:
+            msg = self._montar_mensagem('undisclosed-recipients:;', fasciculo_info, assunto, mensagem_adicional)
+            anexo = pdf_path if pdf_path and pdf_path.exists() else None
+            recusados, relay = self._entregar(msg, destinatarios, anexo, tempos)
+            
+            resultados = []
+            for destinatario in destinatarios:
+                if destinatario in recusados:
+                    codigo, resposta = recusados[destinatario]
+                    erro = resposta.decode('utf-8', 'replace') if isinstance(resposta, bytes) else str(resposta)
+                    resultados.append({
+                        'success': False,
+                        'destinatario': destinatario,
+                        'timestamp': timestamp,
+                        'hash_id': fasciculo_info.get('hash_id'),
+                        'smtp_code': codigo,
+                        'transitorio': 400 <= codigo < 500,
+                        'destinatario_recusado': True,
+                        'error': f"({codigo}, {erro})",
+                        'message': f'Destinatário recusado: {codigo} {erro}'
+                    })
+                else:
+                    resultados.append({
+                        'success': True,
+                        'destinatario': destinatario,
+                        'timestamp': timestamp,
+                        'hash_id': fasciculo_info.get('hash_id'),
+                        'edicao': fasciculo_info.get('edicao'),
+                        'fasciculo': fasciculo_info.get('fasciculo'),
+                        'relay': relay,
+                        'message': 'Email enviado com sucesso'
+                    })
+            
+            return {
+                'success': True,
+                'timestamp': timestamp,
+                'hash_id': fasciculo_info.get('hash_id'),
+                'aceitos': len(destinatarios) - len(recusados),
+                'relay': relay,
+                'resultados': resultados,
+                'tempos_ms': self._registrar_tempos(tempos),
+                'message': f'Email enviado a {len(destinatarios) - len(recusados)} de {len(destinatarios)} destinatário(s)'
+            }
+            
+        except Exception as e:
+            # Falha da transação inteira: o mesmo erro vale para todos os destinatários
+            recusados = e.recipients if isinstance(e, smtplib.SMTPRecipientsRefused) else {}
+            resultados = []
+            for destinatario in destinatarios:
+                recusado = recusados.get(destinatario)
+                resultados.append({
+                    'success': False,
+                    'destinatario': destinatario,
+                    'timestamp': timestamp,
+                    'hash_id': fasciculo_info.get('hash_id'),
+                    'smtp_code': recusado[0] if recusado else self._extrair_codigo_smtp(e),
+                    'transitorio': 400 <= recusado[0] < 500 if recusado else self._erro_transitorio(e),
+                    'destinatario_recusado': recusado is not None,
+                    'error': str(recusado) if recusado else str(e),
+                    'message': f'Erro ao enviar email: {e}'
+                })
+            
+            return {
+                'success': False,
+                'timestamp': timestamp,
+                'hash_id': fasciculo_info.get('hash_id'),
+                'smtp_code': self._extrair_codigo_smtp(e),
+                'transitorio': self._erro_transitorio(e),
+                'destinatario_recusado': isinstance(e, smtplib.SMTPRecipientsRefused),
+                'aceitos': 0,
+                'resultados': resultados,
+                'tempos_ms': self._registrar_tempos(tempos),
+                'error': str(e),
+                'message': f'Erro ao enviar email: {e}'
+            }
+    
+    def _montar_mensagem(
+        self,
+        destinatario: str,
+        fasciculo_info: Dict,
+        assunto: Optional[str] = None,
+        mensagem_adicional: Optional[str] = None,
+        link_download: Optional[Dict] = None
+    ) -> MIMEMultipart:
+        """
+        Cria a mensagem com cabeçalhos e corpo (o anexo é incluído na entrega)
+        
+        Args:
+            destinatario: Valor do cabeçalho To
+            fasciculo_info: Informações do fascículo
+            assunto: Assunto do email (opcional)
+            mensagem_adicional: Mensagem adicional (opcional)
+            link_download: Link do PDF publicado (opcional)
+        
+        Returns:
+            Mensagem MIME sem o anexo
+        """
+        msg = MIMEMultipart()
+        msg['From'] = self.smtp_config['from']
+        msg['To'] = destinatario
+        msg['Subject'] = assunto or f"Fascículo: {fasciculo_info['edicao']} - {fasciculo_info['fasciculo']}"
+        
+        # Corpo do email
+        corpo = self._create_email_body(fasciculo_info, mensagem_adicional, link_download)
+        msg.attach(MIMEText(corpo, 'html', 'utf-8'))
+        
+        return msg
+    
+    def _entregar(
+        self,
+        msg: MIMEMultipart,
+        destinatarios: List[str],
+        anexo: Optional[Path] = None,
+        tempos: Optional[Dict[str, float]] = None
+    ) -> Tuple[Dict, Optional[str]]:
+        """
+        Entrega a mensagem (com o anexo, se houver) pelo servidor configurado
+        
+        Com um roteador de relays, cada tentativa usa o relay escolhido por ele;
+        se o relay falhar (conexão, autenticação, 421), ele é suspenso e a
+        mensagem segue pelo próximo relay disponível.
+        
+        Com backend 'spool' ou 'sendmail' a mensagem é entregue ao MTA local,
+        que assume a fila e as sessões SMTP; o nome do backend faz as vezes de
+        relay no retorno.
+        
+        Args:
+            msg: Mensagem criada por _montar_mensagem()
+            destinatarios: Endereços do envelope (um RCPT TO para cada)
+            anexo: PDF a anexar (opcional)
+            tempos: Dicionário {fase: segundos} onde a duração de cada fase é
+                    acumulada (opcional)
+        
+        Returns:
+            Tupla (destinatários recusados no RCPT TO: {email: (código, resposta)},
+            nome do relay que aceitou a mensagem ou None sem roteador)
+        
+        Raises:
+            smtplib.SMTPException: Se a mensagem não foi aceita por nenhum destinatário
+        """
+        tempos = {} if tempos is None else tempos
+        
+        backend = self.smtp_config.get('backend', 'smtp')
+        if backend in ('spool', 'sendmail'):
+            with self._cronometrar(tempos, 'codificacao'):
+                conteudo = self._serializar_streaming(msg, anexo)
+            with self._cronometrar(tempos, 'dados'):
+                if backend == 'spool':
+                    self._gravar_spool(msg, destinatarios, conteudo, anexo)
+                else:
+                    self._enviar_sendmail(msg, destinatarios, conteudo, anexo)
+            return {}, backend
+        
+        if self.smtp_config.get('streaming', True):
+            # O PDF é lido e codificado em blocos direto no socket
+            with self._cronometrar(tempos, 'codificacao'):
+                conteudo = self._serializar_streaming(msg, anexo)
+            
+            def entregar(server):
+                return self._enviar_streaming(server, msg, destinatarios, conteudo, anexo, tempos)
+        else:
+            if anexo:
+                with self._cronometrar(tempos, 'codificacao'), open(anexo, 'rb') as f:
+                    pdf_attachment = MIMEApplication(f.read(), _subtype='pdf')
+                    pdf_attachment.add_header(
+                        'Content-Disposition',
+                        'attachment',
+                        filename=anexo.name
+                    )
+                    msg.attach(pdf_attachment)
+            
+            def entregar(server):
+                with self._cronometrar(tempos, 'dados'):
+                    return server.send_message(msg, to_addrs=destinatarios)
+        
+        if not self.roteador:
+            with self._conectar(tempos=tempos) as server:
+                return entregar(server), None
+        
+        tentados = []
+        ultimo_erro = None
+        while True:
+            relay = self.roteador.obter(len(destinatarios), excluir=tentados)
+            if relay is None:
+                raise ultimo_erro or smtplib.SMTPConnectError(421, 'Nenhum relay SMTP disponível')
+            
+            try:
+                with self._conectar(relay.config, tempos) as server:
+                    recusados = entregar(server)
+            except Exception as e:
+                if not self._falha_do_relay(e):
+                    raise
+                self.roteador.registrar_falha(relay)
+                tentados.append(relay.nome)
+                ultimo_erro = e
+                continue
+            
+            self.roteador.registrar_sucesso(relay)
+            return recusados, relay.nome
+    
+    @staticmethod
+    def _falha_do_relay(erro: Exception) -> bool:
+        """
+        Indica se o erro é do relay (e a mensagem pode seguir por outro)
+        
+        Recusas de destinatário ou da mensagem (5xx no DATA) não são falhas
+        do relay: repetiriam em qualquer outro. Erros locais (PDF ausente,
+        disco cheio, permissão negada) também não: ficam como erro da
+        mensagem.
+        """
+        if isinstance(erro, smtplib.SMTPRecipientsRefused):
+            return False
+        if isinstance(erro, (
+            smtplib.SMTPServerDisconnected,
+            smtplib.SMTPConnectError,
+            smtplib.SMTPAuthenticationError,
+            smtplib.SMTPSenderRefused
+        )):
+            return True
+        if isinstance(erro, smtplib.SMTPResponseException):
+            return erro.smtp_code in (421, 454)
+        # Conexão recusada ou interrompida, timeout, DNS
+        return isinstance(erro, (ConnectionError, TimeoutError, socket.timeout, socket.gaierror))
+    
+    @staticmethod
+    @contextmanager
+    def _cronometrar(tempos: Dict[str, float], fase: str):
+        """Soma a duração do bloco `with` à fase em `tempos`"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            tempos[fase] = tempos.get(fase, 0.0) + time.perf_counter() - inicio
+    
+    def _registrar_tempos(self, tempos: Dict[str, float]) -> Dict[str, float]:
+        """
+        Envia as durações das fases ao hook de métricas e resume o envio
+        
+        Args:
+            tempos: Dicionário {fase: segundos} acumulado durante o envio
+        
+        Returns:
+            Dicionário {fase: milissegundos} para o resultado do envio
+        """
+        if self.metricas:
+            for fase, segundos in tempos.items():
+                self.metricas.registrar(f'smtp_{fase}', segundos)
+        return {fase: round(segundos * 1000, 1) for fase, segundos in tempos.items()}
+    
+    @contextmanager
+    def _conectar(self, config: Optional[Dict] = None, tempos: Optional[Dict[str, float]] = None):
+        """
+        Abre uma sessão SMTP com STARTTLS e login conforme a configuração
+        
+        A resolução DNS é feita à parte (em vez de dentro do connect) para que
+        cada fase da abertura tenha sua duração medida.
+        
+        Args:
+            config: Configuração SMTP do relay (padrão: smtp_config)
+            tempos: Dicionário {fase: segundos} onde são acumuladas as fases
+                    dns, conexao, starttls e auth (opcional)
+        
+        Yields:
+            Conexão smtplib.SMTP pronta para envio
+        """
+        config = config or self.smtp_config
+        tempos = {} if tempos is None else tempos
+        
+        with smtplib.SMTP() as server:
+            with self._cronometrar(tempos, 'dns'):
+                enderecos = socket.getaddrinfo(config['server'], config['port'], type=socket.SOCK_STREAM)
+            
+            with self._cronometrar(tempos, 'conexao'):
+                # Tenta os endereços resolvidos em ordem, como socket.create_connection
+                for *_, endereco in enderecos:
+                    try:
+                        server.connect(endereco[0], endereco[1])
+                        break
+                    except OSError as e:
+                        erro = e
+                else:
+                    raise erro
+            # O STARTTLS valida o certificado pelo nome do servidor, não pelo IP
+            server._host = config['server']
+            
+            if config.get('starttls', True):
+                with self._cronometrar(tempos, 'starttls'):
+                    server.starttls()
+            if config.get('user'):
+                with self._cronometrar(tempos, 'auth'):
+                    server.login(config['user'], config['password'])
+            yield server
+    
+    @staticmethod
+    def _serializar_streaming(msg: MIMEMultipart, anexo: Optional[Path] = None) -> Tuple[bytes, bytes]:
+        """
+        Serializa cabeçalhos e corpo, deixando o lugar do anexo em aberto
+        
+        Args:
+            msg: Mensagem com cabeçalhos e corpo (sem o anexo)
+            anexo: PDF a anexar (opcional)
+        
+        Returns:
+            Tupla (bytes antes do conteúdo do anexo, bytes depois dele)
+        """
+        marcador = None
+        if anexo:
+            # Parte do anexo com um marcador no lugar do conteúdo
+            marcador = uuid.uuid4().hex
+            parte = MIMEBase('application', 'pdf')
+            parte['Content-Transfer-Encoding'] = 'base64'
+            parte.add_header('Content-Disposition', 'attachment', filename=anexo.name)
+            parte.set_payload(marcador)
+            msg.attach(parte)
+        
+        # Mesma serialização do send_message (política da mensagem com CRLF)
+        texto = msg.as_bytes(policy=msg.policy.clone(linesep='\r\n'))
+        if marcador:
+            inicio, fim = texto.split(marcador.encode('ascii'), 1)
+            return inicio, fim
+        return texto, b''
+    
+    def _enviar_streaming(
+        self,
+        server: smtplib.SMTP,
+        msg: MIMEMultipart,
+        destinatarios: List[str],
+        conteudo: Tuple[bytes, bytes],
+        anexo: Optional[Path] = None,
+        tempos: Optional[Dict[str, float]] = None
+    ) -> Dict:
+        """
+        Envia a mensagem escrevendo o DATA em blocos, sem montar o email inteiro
+        
+        Cabeçalhos e corpo (pequenos) são serializados normalmente; o PDF é
+        lido em blocos de BLOCO_STREAMING bytes, codificado em base64 e escrito
+        no socket bloco a bloco. A memória por conexão fica limitada ao tamanho
+        do bloco, qualquer que seja o tamanho do anexo.
+        
+        Args:
+            server: Conexão SMTP aberta por _conectar()
+            msg: Mensagem com cabeçalhos e corpo
+            destinatarios: Endereços do envelope (um RCPT TO para cada)
+            conteudo: Resultado de _serializar_streaming()
+            anexo: PDF a anexar (opcional)
+            tempos: Dicionário {fase: segundos} onde são acumuladas as fases
+                    dados (envelope e DATA) e codificacao (base64 do PDF)
+        
+        Returns:
+            Destinatários recusados no RCPT TO: {email: (código, resposta)}
+        
+        Raises:
+            smtplib.SMTPException: Se o servidor recusar o remetente, todos os
+                                   destinatários ou a mensagem
+        """
+        inicio, fim = conteudo
+        tempos = {} if tempos is None else tempos
+        comeco = time.perf_counter()
+        codificacao = 0.0
+        
+        try:
+            remetente = parseaddr(msg['From'])[1]
+            server.ehlo_or_helo_if_needed()
+            codigo, resposta = server.mail(remetente)
+            if codigo != 250:
+                server.rset()
+                raise smtplib.SMTPSenderRefused(codigo, resposta, remetente)
+            recusados = {}
+            for destinatario in destinatarios:
+                codigo, resposta = server.rcpt(destinatario)
+                if codigo not in (250, 251):
+                    recusados[destinatario] = (codigo, resposta)
+            if len(recusados) == len(destinatarios):
+                server.rset()
+                raise smtplib.SMTPRecipientsRefused(recusados)
+            
+            codigo, resposta = server.docmd('data')
+            if codigo != 354:
+                server.rset()
+                raise smtplib.SMTPDataError(codigo, resposta)
+            
+            # Linhas iniciadas por '.' são duplicadas (RFC 5321); base64 nunca contém '.'
+            server.send(re.sub(rb'(?m)^\.', b'..', inicio))
+            if anexo:
+                with open(anexo, 'rb') as f:
+                    for bloco in iter(lambda: f.read(BLOCO_STREAMING), b''):
+                        marca = time.perf_counter()
+                        codificado = base64.encodebytes(bloco).replace(b'\n', b'\r\n')
+                        codificacao += time.perf_counter() - marca
+                        server.send(codificado)
+            fim = re.sub(rb'(?m)^\.', b'..', fim)
+            if not fim.endswith(b'\r\n'):
+                fim += b'\r\n'
+            server.send(fim + b'.\r\n')
+            
+            codigo, resposta = server.getreply()
+            if codigo != 250:
+                raise smtplib.SMTPDataError(codigo, resposta)
+            
+            return recusados
+        finally:
+            # A codificação do PDF acontece intercalada com a escrita no socket:
+            # é contada à parte e descontada da fase dados
+            tempos['codificacao'] = tempos.get('codificacao', 0.0) + codificacao
+            tempos['dados'] = tempos.get('dados', 0.0) + time.perf_counter() - comeco - codificacao
+    
+    @staticmethod
+    def _blocos_locais(conteudo: Tuple[bytes, bytes], anexo: Optional[Path] = None):
+        """
+        Gera a mensagem em blocos com quebras de linha locais (LF), para o MTA
+        
+        Args:
+            conteudo: Resultado de _serializar_streaming()
+            anexo: PDF a anexar (opcional)
+        
+        Yields:
+            Blocos de bytes da mensagem completa
+        """
+        inicio, fim = conteudo
+        yield inicio.replace(b'\r\n', b'\n')
+        if anexo:
+            with open(anexo, 'rb') as f:
+                for bloco in iter(lambda: f.read(BLOCO_STREAMING), b''):
+                    yield base64.encodebytes(bloco)
+        fim = fim.replace(b'\r\n', b'\n')
+        yield fim if fim.endswith(b'\n') else fim + b'\n'
+    
+    def _gravar_spool(
+        self,
+        msg: MIMEMultipart,
+        destinatarios: List[str],
+        conteudo: Tuple[bytes, bytes],
+        anexo: Optional[Path] = None
+    ) -> str:
+        """
+        Grava a mensagem no spool maildir consumido pelo MTA local
+        
+        O arquivo é escrito em tmp/, sincronizado com o disco e movido para
+        new/ (rename atômico): o MTA nunca vê uma mensagem pela metade, e uma
+        mensagem em new/ já está a salvo. O envelope vai nos cabeçalhos
+        X-Sender e X-Receiver no início do arquivo (formato dos diretórios de
+        pickup), já que no envio agrupado os destinatários não constam no To.
+        
+        Args:
+            msg: Mensagem com cabeçalhos e corpo
+            destinatarios: Endereços do envelope
+            conteudo: Resultado de _serializar_streaming()
+            anexo: PDF a anexar (opcional)
+        
+        Returns:
+            Nome do arquivo no spool
+        """
+        spool = Path(self.smtp_config['spool_dir'])
+        nome = f"{time.time():.6f}.{uuid.uuid4().hex}.{socket.gethostname()}"
+        temporario = spool / 'tmp' / nome
+        
+        envelope = f"X-Sender: {parseaddr(msg['From'])[1]}\n"
+        envelope += ''.join(f"X-Receiver: {destinatario}\n" for destinatario in destinatarios)
+        
+        try:
+            with open(temporario, 'wb') as f:
+                f.write(envelope.encode('utf-8'))
+                for bloco in self._blocos_locais(conteudo, anexo):
+                    f.write(bloco)
+                f.flush()
+                os.fsync(f.fileno())
+            temporario.rename(spool / 'new' / nome)
+        except BaseException:
+            temporario.unlink(missing_ok=True)
+            raise
+        
+        return nome
+    
+    def _enviar_sendmail(
+        self,
+        msg: MIMEMultipart,
+        destinatarios: List[str],
+        conteudo: Tuple[bytes, bytes],
+        anexo: Optional[Path] = None
+    ):
+        """
+        Entrega a mensagem a um binário compatível com sendmail (Postfix, Exim...)
+        
+        A mensagem é escrita em blocos na entrada padrão do processo; o
+        envelope vai na linha de comando (-f remetente, destinatários). A
+        saída de erro vai para um arquivo temporário: com um pipe, um
+        sendmail que escrevesse muito em stderr travaria os dois processos
+        enquanto a entrada ainda está sendo escrita.
+        
+        Args:
+            msg: Mensagem com cabeçalhos e corpo
+            destinatarios: Endereços do envelope
+            conteudo: Resultado de _serializar_streaming()
+            anexo: PDF a anexar (opcional)
+        
+        Raises:
+            smtplib.SMTPDataError: Se o sendmail recusar a mensagem (código 451
+                                   para EX_TEMPFAIL, 554 para os demais erros)
+        """
+        comando = [
+            self.smtp_config.get('sendmail') or '/usr/sbin/sendmail',
+            '-i', '-f', parseaddr(msg['From'])[1], '--', *destinatarios
+        ]
+        with tempfile.TemporaryFile() as saida_erro:
+            processo = subprocess.Popen(comando, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=saida_erro)
+            
+            try:
+                for bloco in self._blocos_locais(conteudo, anexo):
+                    processo.stdin.write(bloco)
+            except BrokenPipeError:
+                # O sendmail saiu antes do fim: o código de saída diz o motivo
+                pass
+            processo.communicate()
+            
+            saida_erro.seek(0)
+            erro = saida_erro.read(64 * 1024)
+        
+        if processo.returncode != 0:
+            codigo = 451 if processo.returncode == SENDMAIL_TEMPFAIL else 554
+            resposta = erro.decode('utf-8', 'replace').strip() or f"sendmail saiu com código {processo.returncode}"
+            raise smtplib.SMTPDataError(codigo, resposta)
+    
+    @staticmethod
+    def _extrair_codigo_smtp(erro: Exception) -> Optional[int]:
+        """
+        Extrai o código de resposta SMTP de uma exceção, se houver
+        
+        Args:
+            erro: Exceção capturada durante o envio
+        
+        Returns:
+            Código SMTP (ex: 421, 550) ou None para erros sem resposta do servidor
+        """
+        if isinstance(erro, smtplib.SMTPResponseException):
+            return erro.smtp_code
+        
+        if isinstance(erro, smtplib.SMTPRecipientsRefused) and erro.recipients:
+            codigo, _ = next(iter(erro.recipients.values()))
+            return codigo
+        
+        return None
+    
+    @classmethod
+    def _erro_transitorio(cls, erro: Exception) -> bool:
+        """
+        Classifica a falha de um envio como temporária ou definitiva
+        
+        Com resposta do servidor vale o código: 4xx é temporário (greylisting,
+        caixa cheia, limite do servidor) e 5xx é definitivo (destinatário
+        inexistente, mensagem rejeitada). Sem resposta, só falhas de rede são
+        temporárias.
+        
+        Args:
+            erro: Exceção capturada durante o envio
+        
+        Returns:
+            True se uma nova tentativa pode dar certo
+        """
+        codigo = cls._extrair_codigo_smtp(erro)
+        if codigo is not None:
+            return 400 <= codigo < 500
+        return isinstance(erro, ERROS_REDE)
+    
+    def _create_email_body(
+        self,
+        fasciculo_info: Dict,
+        mensagem_adicional: Optional[str] = None,
+        link_download: Optional[Dict] = None
     ) -> str:
         """
         Cria o corpo HTML do email
@@ -103,10 +729,21 @@ class EmailSender:
         Args:
             fasciculo_info: Informações do fascículo
             mensagem_adicional: Mensagem adicional (opcional)
+            link_download: Link do PDF publicado (opcional)
         
         Returns:
             HTML do corpo do email
         """
+        secao_link = ''
+        if link_download:
+            secao_link = f"""
+                    <h3>Download do Fascículo</h3>
+                    <p><a href="{link_download['url']}">Baixar o fascículo (PDF, {link_download['tamanho'] / (1024 * 1024):.2f} MB)</a></p>
+                    <p>Confira a integridade do arquivo baixado pelo SHA-256:</p>
+                    <p class="hash">{link_download['checksum']}</p>
+                    <p>O link é pessoal e identifica este envio.</p>
+                    """
+        
         html = f"""
         <!DOCTYPE html>
         <html>
@@ -171,6 +808,7 @@ class EmailSender:
                     </div>
                     
                     {f'<p>{mensagem_adicional}</p>' if mensagem_adicional else ''}
+                    {secao_link}
                     
                     <h3>Identificação Única</h3>
                     <p>Este fascículo possui um identificador único para rastreabilidade:</p>
@@ -194,20 +832,36 @@ class EmailSender:
     
     def test_connection(self) -> bool:
         """
-        Testa a conexão SMTP
+        Testa a conexão SMTP (ou o acesso ao spool / sendmail do MTA local)
         
         Returns:
             True se a conexão foi bem-sucedida, False caso contrário
         """
-        try:
-            with smtplib.SMTP(self.smtp_config['server'], self.smtp_config['port']) as server:
-                server.starttls()
-                server.login(self.smtp_config['user'], self.smtp_config['password'])
-            print("[OK] Conexão SMTP bem-sucedida")
-            return True
-        except Exception as e:
-            print(f"[ERRO] Erro na conexão SMTP: {e}")
-            return False
+        backend = self.smtp_config.get('backend', 'smtp')
+        if backend == 'spool':
+            sucesso = os.access(Path(self.smtp_config['spool_dir']) / 'new', os.W_OK)
+            print(f"[{'OK' if sucesso else 'ERRO'}] Spool do MTA local: {self.smtp_config['spool_dir']}")
+            return sucesso
+        if backend == 'sendmail':
+            sendmail = self.smtp_config.get('sendmail') or '/usr/sbin/sendmail'
+            sucesso = os.access(sendmail, os.X_OK)
+            print(f"[{'OK' if sucesso else 'ERRO'}] Sendmail do MTA local: {sendmail}")
+            return sucesso
+        
+        configs = [relay.config for relay in self.roteador.relays] if self.roteador else [self.smtp_config]
+        sucesso = True
+        
+        for config in configs:
+            servidor = config.get('nome') or config['server']
+            try:
+                with self._conectar(config):
+                    pass
+                print(f"[OK] Conexão SMTP bem-sucedida ({servidor})")
+            except Exception as e:
+                print(f"[ERRO] Erro na conexão SMTP ({servidor}): {e}")
+                sucesso = False
+        
+        return sucesso
 
 
 if __name__ == "__main__":
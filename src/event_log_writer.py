@@ -0,0 +1,209 @@
+"""
+Gravador Assíncrono de Logs de Eventos
+Grava logs_eventos em lote por uma thread, fora do caminho crítico do envio
+"""
+import json
+import queue
+import threading
+import time
+from typing import Dict, Optional
+
+from mysql.connector.errors import Error, InterfaceError, OperationalError, PoolError
+
+from metrics import Metricas
+
+
+# Erros do MySQL que costumam passar numa nova tentativa
+# (lock wait timeout, deadlock, server gone away, conexão perdida)
+ERROS_TRANSITORIOS = {1205, 1213, 2006, 2013, 2055}
+
+_FIM = object()
+
+
+def erro_transitorio(erro: Error) -> bool:
+    """Indica se a falha de gravação pode dar certo em uma nova tentativa"""
+    return isinstance(erro, (InterfaceError, OperationalError, PoolError)) or erro.errno in ERROS_TRANSITORIOS
+
+
+class EventLogWriter:
+    """
+    Fila limitada de logs de evento gravada em lote por uma thread
+    
+    registrar() só enfileira o evento; a thread junta até `max_lote` eventos
+    (esperando no máximo `intervalo_ms` após o primeiro) e os grava com um
+    INSERT de várias linhas. A serialização de dados_adicionais em JSON
+    também sai do laço de envio.
+    
+    Quando a fila enche, registrar() espera: a lentidão do banco passa a
+    frear os envios em vez de acumular memória. Erros transitórios do
+    banco são repetidos com espera exponencial; os demais descartam o lote.
+    
+    Use como context manager para garantir que a fila seja gravada ao final.
+    """
+    
+    def __init__(self, db, capacidade: int = 10000, max_lote: int = 500, intervalo_ms: int = 200,
+                 tentativas: int = 3, metricas: Optional[Metricas] = None):
+        """
+        Inicializa o gravador
+        
+        Args:
+            db: DatabaseManager usado nas gravações
+            capacidade: Máximo de eventos aguardando gravação
+            max_lote: Máximo de eventos por INSERT
+            intervalo_ms: Espera máxima (ms) para completar um lote
+            tentativas: Tentativas por lote em erros transitórios
+            metricas: Métricas onde registrar 'log_eventos_gravacao' e
+                      'log_eventos_espera' (padrão: próprias)
+        """
+        self.db = db
+        self.max_lote = max(1, max_lote)
+        self.intervalo = max(0, intervalo_ms) / 1000
+        self.tentativas = max(1, tentativas)
+        self.metricas = metricas or Metricas()
+        
+        self._fila = queue.Queue(maxsize=max(1, capacidade))
+        self._thread = None
+        
+        self.fila_max = 0
+        self.gravados = 0
+        self.lotes = 0
+        self.repeticoes = 0
+        self.descartados = 0
+    
+    def __enter__(self):
+        self.iniciar()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.encerrar()
+        return False
+    
+    @property
+    def profundidade(self) -> int:
+        """Eventos aguardando gravação"""
+        return self._fila.qsize()
+    
+    def iniciar(self):
+        """Inicia a thread de gravação"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._executar, name='event-log-writer', daemon=True)
+            self._thread.start()
+    
+    def encerrar(self):
+        """Grava os eventos ainda na fila e para a thread"""
+        if self._thread is not None:
+            self._fila.put(_FIM)
+            self._thread.join()
+            self._thread = None
+    
+    def registrar(self, hash_id: str, evento_tipo: str,
+                  destinatario: Optional[str] = None,
+                  nome_destinatario: Optional[str] = None,
+                  dados_adicionais: Optional[Dict] = None):
+        """
+        Enfileira um log de evento (mesmos argumentos de inserir_log_evento)
+        
+        Espera por espaço se a fila estiver cheia.
+        
+        Raises:
+            RuntimeError: Gravador não iniciado
+        """
+        if self._thread is None:
+            raise RuntimeError("EventLogWriter não iniciado")
+        
+        evento = (hash_id, evento_tipo, destinatario, nome_destinatario, dados_adicionais)
+        try:
+            self._fila.put_nowait(evento)
+        except queue.Full:
+            with self.metricas.cronometrar('log_eventos_espera'):
+                self._fila.put(evento)
+        
+        profundidade = self._fila.qsize()
+        if profundidade > self.fila_max:
+            self.fila_max = profundidade
+    
+    def status(self) -> Dict:
+        """
+        Retorna as métricas do gravador
+        
+        Returns:
+            Dicionário {fila, fila_max, gravados, lotes, repeticoes,
+            descartados, gravacao (resumo da latência por lote)}
+        """
+        return {
+            'fila': self.profundidade,
+            'fila_max': self.fila_max,
+            'gravados': self.gravados,
+            'lotes': self.lotes,
+            'repeticoes': self.repeticoes,
+            'descartados': self.descartados,
+            'gravacao': self.metricas.histograma('log_eventos_gravacao').resumo()
+        }
+    
+    def _executar(self):
+        fim = False
+        while not fim:
+            evento = self._fila.get()
+            if evento is _FIM:
+                break
+            
+            lote = [evento]
+            limite = time.monotonic() + self.intervalo
+            while len(lote) < self.max_lote:
+                try:
+                    evento = self._fila.get(timeout=max(0.0, limite - time.monotonic()))
+                except queue.Empty:
+                    break
+                if evento is _FIM:
+                    fim = True
+                    break
+                lote.append(evento)
+            
+            try:
+                self._gravar(lote)
+            except Exception as e:
+                # A thread não pode morrer: registrar() ficaria esperando a fila andar
+                print(f"[ERRO] Erro inesperado ao gravar logs de evento: {e}")
+                self.descartados += len(lote)
+    
+    def _gravar(self, lote):
+        linhas = [
+            (hash_id, evento_tipo, destinatario, nome_destinatario,
+             json.dumps(dados_adicionais) if dados_adicionais else None)
+            for hash_id, evento_tipo, destinatario, nome_destinatario, dados_adicionais in lote
+        ]
+        
+        for tentativa in range(1, self.tentativas + 1):
+            inicio = time.perf_counter()
+            try:
+                self.db.inserir_logs_eventos(linhas)
+                self.metricas.registrar('log_eventos_gravacao', time.perf_counter() - inicio)
+                self.gravados += len(linhas)
+                self.lotes += 1
+                return
+            except Error as e:
+                if tentativa < self.tentativas and erro_transitorio(e):
+                    self.repeticoes += 1
+                    time.sleep(0.5 * 2 ** (tentativa - 1))
+                    continue
+                print(f"[ERRO] Erro ao gravar {len(linhas)} log(s) de evento: {e}")
+                self.descartados += len(linhas)
+                return
+
+
+if __name__ == "__main__":
+    # Teste do gravador com um banco simulado
+    class _BancoTeste:
+        def inserir_logs_eventos(self, eventos):
+            time.sleep(0.01)
+            return len(eventos)
+    
+    print("=== Gravador de Logs de Eventos ===")
+    with EventLogWriter(_BancoTeste(), capacidade=100, max_lote=50, intervalo_ms=50) as gravador:
+        for numero in range(1000):
+            gravador.registrar('hash-teste', 'EMAIL_SENT', f'usuario{numero}@exemplo.com',
+                               dados_adicionais={'numero_envio': numero})
+    
+    status = gravador.status()
+    print(f"Gravados: {status['gravados']} em {status['lotes']} lote(s), fila máxima {status['fila_max']}")
+    print(f"Gravação por lote: {status['gravacao']}")
@@ -0,0 +1,138 @@
+"""
+Publicação de Fascículos por Link
+Publica o PDF uma única vez em um diretório estático e gera links de download por destinatário
+"""
+import hashlib
+import hmac
+import secrets
+import shutil
+from pathlib import Path
+from typing import Dict
+from urllib.parse import quote, urlencode
+
+
+class LinkPublisher:
+    """Publica fascículos e gera links de download com token por envio"""
+    
+    def __init__(self, diretorio: Path, url_base: str, chave_path: Path):
+        """
+        Inicializa o publicador
+        
+        Args:
+            diretorio: Diretório servido estaticamente (ex: por nginx/IIS)
+            url_base: URL pública que corresponde ao diretório
+            chave_path: Arquivo da chave HMAC usada nos tokens (criada se não existir)
+        """
+        self.diretorio = Path(diretorio)
+        self.url_base = url_base.rstrip('/')
+        self.chave_path = Path(chave_path)
+        self.chave = self._load_or_create_key()
+    
+    def _load_or_create_key(self) -> bytes:
+        """Carrega a chave dos tokens ou cria uma nova"""
+        if self.chave_path.exists():
+            return self.chave_path.read_bytes()
+        
+        chave = secrets.token_bytes(32)
+        self.chave_path.parent.mkdir(parents=True, exist_ok=True)
+        self.chave_path.write_bytes(chave)
+        print(f"[OK] Nova chave de links gerada em: {self.chave_path}")
+        return chave
+    
+    def publicar(self, pdf_path: Path) -> Dict:
+        """
+        Publica o PDF no diretório estático (apenas uma vez por conteúdo)
+        
+        O arquivo fica em <diretorio>/<sha256>/<nome>.pdf: o checksum no
+        caminho torna a URL impossível de adivinhar e a publicação idempotente.
+        
+        Args:
+            pdf_path: Caminho do PDF original
+        
+        Returns:
+            Dicionário com checksum (SHA-256), tamanho, caminho e url do arquivo
+        """
+        pdf_path = Path(pdf_path)
+        
+        sha256 = hashlib.sha256()
+        with open(pdf_path, 'rb') as f:
+            for bloco in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(bloco)
+        checksum = sha256.hexdigest()
+        
+        destino = self.diretorio / checksum / pdf_path.name
+        if not destino.exists():
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            temporario = destino.with_name(destino.name + '.tmp')
+            shutil.copyfile(pdf_path, temporario)
+            temporario.replace(destino)
+        
+        return {
+            'checksum': checksum,
+            'tamanho': destino.stat().st_size,
+            'caminho': str(destino),
+            'url': f"{self.url_base}/{checksum}/{quote(pdf_path.name)}"
+        }
+    
+    def gerar_token(self, hash_envio: str) -> str:
+        """
+        Gera o token de download de um envio (HMAC-SHA256 do hash_envio)
+        
+        Args:
+            hash_envio: Hash único do envio
+        
+        Returns:
+            Token hexadecimal de 32 caracteres
+        """
+        return hmac.new(self.chave, hash_envio.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+    
+    def verificar_token(self, hash_envio: str, token: str) -> bool:
+        """
+        Verifica se o token corresponde ao envio (para o servidor de download)
+        
+        Args:
+            hash_envio: Hash único do envio (parâmetro `envio` do link)
+            token: Token recebido no link
+        
+        Returns:
+            True se o token é válido
+        """
+        return hmac.compare_digest(self.gerar_token(hash_envio), token or '')
+    
+    def link_envio(self, publicacao: Dict, hash_envio: str) -> Dict:
+        """
+        Monta o link de download de um destinatário
+        
+        Args:
+            publicacao: Resultado de publicar()
+            hash_envio: Hash único do envio
+        
+        Returns:
+            Dicionário com url (com envio e token), token, checksum e tamanho
+        """
+        token = self.gerar_token(hash_envio)
+        return {
+            'url': f"{publicacao['url']}?{urlencode({'envio': hash_envio, 'token': token})}",
+            'token': token,
+            'checksum': publicacao['checksum'],
+            'tamanho': publicacao['tamanho']
+        }
+
+
+if __name__ == "__main__":
+    # Teste do publicador de links
+    import tempfile
+    
+    print("=== Publicação de Fascículos por Link ===")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = Path(tmp) / "fasciculo.pdf"
+        pdf.write_bytes(b"%PDF-1.4\n% teste\n")
+        
+        publisher = LinkPublisher(Path(tmp) / "publicacao", "https://fasciculos.exemplo.gov.br", Path(tmp) / "link.key")
+        publicacao = publisher.publicar(pdf)
+        link = publisher.link_envio(publicacao, "env-exemplo")
+        
+        print(f"\nPublicado em: {publicacao['caminho']}")
+        print(f"Link: {link['url']}")
+        print(f"Token válido: {publisher.verificar_token('env-exemplo', link['token'])}")
@@ -0,0 +1,138 @@
+"""
+Métricas de Desempenho
+Histogramas de duração por etapa (p50/p95/p99) para benchmarks e diagnóstico
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+class Histograma:
+    """Amostras de duração de uma etapa, com cálculo de percentis"""
+    
+    def __init__(self, nome: str):
+        """
+        Inicializa o histograma
+        
+        Args:
+            nome: Nome da etapa medida
+        """
+        self.nome = nome
+        self._amostras: List[float] = []
+        self._ordenado = True
+        self._lock = threading.Lock()
+    
+    def registrar(self, segundos: float):
+        """Adiciona uma amostra de duração (em segundos)"""
+        with self._lock:
+            if self._amostras and segundos < self._amostras[-1]:
+                self._ordenado = False
+            self._amostras.append(segundos)
+    
+    @property
+    def contagem(self) -> int:
+        """Número de amostras registradas"""
+        return len(self._amostras)
+    
+    def _ordenar(self) -> List[float]:
+        if not self._ordenado:
+            self._amostras.sort()
+            self._ordenado = True
+        return self._amostras
+    
+    def percentil(self, p: float) -> Optional[float]:
+        """
+        Retorna o percentil p (0-100) das amostras, pelo método nearest-rank
+        
+        Returns:
+            Duração em segundos ou None se não há amostras
+        """
+        with self._lock:
+            amostras = self._ordenar()
+            if not amostras:
+                return None
+            posicao = max(1, math.ceil(p / 100 * len(amostras)))
+            return amostras[posicao - 1]
+    
+    def resumo(self) -> Dict:
+        """
+        Retorna contagem, total e percentis em milissegundos
+        
+        Returns:
+            Dicionário {contagem, total_s, media_ms, p50_ms, p95_ms, p99_ms, max_ms}
+        """
+        with self._lock:
+            amostras = self._ordenar()
+            if not amostras:
+                return {'contagem': 0}
+            total = sum(amostras)
+            
+            def ms(p):
+                return round(amostras[max(1, math.ceil(p / 100 * len(amostras))) - 1] * 1000, 3)
+            
+            return {
+                'contagem': len(amostras),
+                'total_s': round(total, 3),
+                'media_ms': round(total / len(amostras) * 1000, 3),
+                'p50_ms': ms(50),
+                'p95_ms': ms(95),
+                'p99_ms': ms(99),
+                'max_ms': round(amostras[-1] * 1000, 3)
+            }
+
+
+class Metricas:
+    """Registro de histogramas por etapa, compartilhável entre threads"""
+    
+    def __init__(self):
+        self._histogramas: Dict[str, Histograma] = {}
+        self._lock = threading.Lock()
+    
+    def histograma(self, etapa: str) -> Histograma:
+        """Retorna (criando se necessário) o histograma da etapa"""
+        with self._lock:
+            if etapa not in self._histogramas:
+                self._histogramas[etapa] = Histograma(etapa)
+            return self._histogramas[etapa]
+    
+    def registrar(self, etapa: str, segundos: float):
+        """
+        Registra a duração de uma execução da etapa
+        
+        Args:
+            etapa: Nome da etapa (ex: 'smtp', 'banco')
+            segundos: Duração medida
+        """
+        self.histograma(etapa).registrar(segundos)
+    
+    @contextmanager
+    def cronometrar(self, etapa: str):
+        """Mede a duração do bloco `with` e registra na etapa"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(etapa, time.perf_counter() - inicio)
+    
+    def resumo(self) -> Dict[str, Dict]:
+        """Retorna o resumo de todas as etapas"""
+        with self._lock:
+            histogramas = list(self._histogramas.values())
+        return {histograma.nome: histograma.resumo() for histograma in histogramas}
+
+
+if __name__ == "__main__":
+    # Teste das métricas
+    import random
+    
+    print("=== Métricas de Desempenho ===")
+    
+    metricas = Metricas()
+    for _ in range(200):
+        with metricas.cronometrar('exemplo'):
+            time.sleep(random.uniform(0, 0.002))
+    
+    for etapa, resumo in metricas.resumo().items():
+        print(f"  {etapa}: {resumo}")
@@ -0,0 +1,297 @@
+"""
+Gerenciador de Partições
+Particionamento mensal (RANGE por created_at) de logs_eventos no MySQL, criação
+antecipada de partições e arquivamento das antigas em arquivos compactados
+"""
+import gzip
+import json
+import os
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from mysql.connector import Error
+
+
+# Tabelas particionadas. envios_individuais fica de fora: os caminhos quentes
+# (status, reivindicação de lotes, leases) buscam por id, sem created_at, e
+# leriam todas as partições; além disso o UNIQUE de hash_envio (que impede
+# envios duplicados na retomada) e as chaves estrangeiras teriam de sair
+TABELAS_PARTICIONADAS = ('logs_eventos',)
+
+# Partição final, que recebe o que passar da última partição mensal
+PARTICAO_MAX = 'pmax'
+
+
+def somar_meses(dia: date, meses: int) -> date:
+    """Primeiro dia do mês `meses` depois do mês de `dia`"""
+    indice = dia.year * 12 + dia.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def nome_particao(mes: date) -> str:
+    """Nome da partição mensal (ex: p202610)"""
+    return f"p{mes.year:04d}{mes.month:02d}"
+
+
+def mes_da_particao(nome: str) -> Optional[date]:
+    """Mês de uma partição mensal, ou None para pmax e nomes desconhecidos"""
+    try:
+        return date(int(nome[1:5]), int(nome[5:7]), 1)
+    except (ValueError, IndexError):
+        return None
+
+
+def _definicao(mes: date) -> str:
+    # UNIX_TIMESTAMP: a coluna é TIMESTAMP, e RANGE exige uma expressão inteira
+    return (f"PARTITION {nome_particao(mes)} VALUES LESS THAN "
+            f"(UNIX_TIMESTAMP('{somar_meses(mes, 1).isoformat()} 00:00:00'))")
+
+
+class PartitionManager:
+    """
+    Mantém as partições mensais de logs_eventos
+    
+    Cada mês fica em uma partição pAAAAMM, mais a partição pmax no fim:
+    consultas filtradas por created_at só leem as partições do período
+    (as consultas de DatabaseManager a logs_eventos levam um limite de
+    created_at), e partições antigas podem ser arquivadas e removidas sem
+    DELETE em massa.
+    
+    Usa a conexão reservada do DatabaseManager (db.connect()). Com
+    simular=True, mostra os comandos DDL em vez de executá-los.
+    """
+    
+    def __init__(self, db, simular: bool = False):
+        """
+        Inicializa o gerenciador
+        
+        Args:
+            db: DatabaseManager já conectado
+            simular: Só mostra os comandos DDL, sem executar
+        """
+        self.db = db
+        self.simular = simular
+    
+    def _executar(self, sql: str):
+        if self.simular:
+            print(f"  [SIMULAÇÃO] {' '.join(sql.split())}")
+            return
+        cursor = self.db.connection.cursor()
+        try:
+            cursor.execute(sql)
+        finally:
+            cursor.close()
+    
+    def _consultar(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        cursor = self.db.connection.cursor()
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+    
+    def listar(self, tabela: str) -> List[Dict]:
+        """
+        Lista as partições da tabela
+        
+        Returns:
+            Lista de {nome, mes, linhas (estimativa do InnoDB)}; vazia se a
+            tabela não é particionada
+        """
+        rows = self._consultar("""
+            SELECT PARTITION_NAME, TABLE_ROWS
+            FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+        """, (tabela,))
+        return [{'nome': nome, 'mes': mes_da_particao(nome), 'linhas': linhas} for nome, linhas in rows]
+    
+    def particionar(self, tabela: str, meses_futuros: int = 3) -> bool:
+        """
+        Converte a tabela para particionamento mensal por created_at
+        
+        O MySQL exige que a coluna da partição faça parte de toda chave
+        única e não aceita chaves estrangeiras em tabelas particionadas:
+        a chave primária passa a ser (id, created_at) e as chaves
+        estrangeiras são removidas. Tabelas com outro índice único são
+        recusadas, para não perder uma garantia de unicidade.
+        
+        Args:
+            tabela: Tabela a particionar
+            meses_futuros: Partições criadas além do mês atual
+        
+        Returns:
+            True se particionada (ou se já estava)
+        
+        Raises:
+            ValueError: A tabela tem índice único sem created_at
+        """
+        if self.listar(tabela):
+            print(f"[OK] {tabela} já é particionada (nada a fazer)")
+            return True
+        
+        indices = {}
+        for indice, coluna, nao_unico in self._consultar("""
+            SELECT INDEX_NAME, COLUMN_NAME, NON_UNIQUE FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            ORDER BY INDEX_NAME, SEQ_IN_INDEX
+        """, (tabela,)):
+            indices.setdefault(indice, {'colunas': [], 'unico': not nao_unico})['colunas'].append(coluna)
+        
+        for indice, info in indices.items():
+            if indice != 'PRIMARY' and info['unico'] and 'created_at' not in info['colunas']:
+                raise ValueError(
+                    f"{tabela}: o índice único {indice} ({', '.join(info['colunas'])}) "
+                    "deixaria de garantir unicidade em uma tabela particionada"
+                )
+        
+        for (restricao,) in self._consultar("""
+            SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+            WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        """, (tabela,)):
+            self._executar(f"ALTER TABLE {tabela} DROP FOREIGN KEY {restricao}")
+            print(f"  Chave estrangeira {restricao} removida")
+        
+        self._executar(
+            f"ALTER TABLE {tabela} "
+            "MODIFY created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+            "DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)"
+        )
+        
+        primeiro = self._consultar(f"SELECT MIN(created_at) FROM {tabela}")[0][0]
+        inicio = somar_meses(primeiro.date() if primeiro else date.today(), 0)
+        fim = somar_meses(date.today(), meses_futuros)
+        
+        definicoes = []
+        mes = inicio
+        while mes <= fim:
+            definicoes.append(_definicao(mes))
+            mes = somar_meses(mes, 1)
+        definicoes.append(f"PARTITION {PARTICAO_MAX} VALUES LESS THAN MAXVALUE")
+        
+        self._executar(
+            f"ALTER TABLE {tabela} PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) "
+            f"({', '.join(definicoes)})"
+        )
+        print(f"[OK] {tabela}: {len(definicoes) - 1} partição(ões) mensal(is), "
+              f"{nome_particao(inicio)} a {nome_particao(fim)}")
+        return True
+    
+    def criar_futuras(self, tabela: str, meses: int = 3) -> List[str]:
+        """
+        Garante partições até `meses` além do mês atual
+        
+        As novas partições são separadas de pmax (REORGANIZE PARTITION),
+        antes que os registros do mês cheguem.
+        
+        Returns:
+            Nomes das partições criadas
+        """
+        particoes = self.listar(tabela)
+        if not particoes:
+            raise ValueError(f"{tabela} não é particionada (execute migrations/add_particionamento_mensal.py)")
+        
+        meses_existentes = [p['mes'] for p in particoes if p['mes']]
+        proximo = somar_meses(max(meses_existentes), 1) if meses_existentes else somar_meses(date.today(), 0)
+        fim = somar_meses(date.today(), meses)
+        
+        novas = []
+        while proximo <= fim:
+            novas.append(proximo)
+            proximo = somar_meses(proximo, 1)
+        if not novas:
+            return []
+        
+        definicoes = [_definicao(mes) for mes in novas]
+        definicoes.append(f"PARTITION {PARTICAO_MAX} VALUES LESS THAN MAXVALUE")
+        self._executar(
+            f"ALTER TABLE {tabela} REORGANIZE PARTITION {PARTICAO_MAX} INTO ({', '.join(definicoes)})"
+        )
+        return [nome_particao(mes) for mes in novas]
+    
+    def arquivar(self, tabela: str, antes_de: date, diretorio: Path,
+                 desanexar: bool = False, lote: int = 5000) -> List[Dict]:
+        """
+        Arquiva e remove as partições de meses anteriores a `antes_de`
+        
+        Cada partição é exportada para <diretorio>/<tabela>_<partição>.ndjson.gz
+        (uma linha JSON por registro) e só é removida se o número de linhas
+        exportadas conferir com o da partição. Com desanexar=True, a
+        partição vira a tabela <tabela>_<partição> (EXCHANGE PARTITION), sem
+        exportar arquivo.
+        
+        Args:
+            tabela: Tabela particionada
+            antes_de: Arquiva os meses anteriores a esta data
+            diretorio: Destino dos arquivos .ndjson.gz
+            desanexar: Move a partição para uma tabela própria em vez de exportar
+            lote: Registros lidos por vez na exportação
+        
+        Returns:
+            Lista de {particao, linhas, destino}
+        """
+        arquivadas = []
+        limite = somar_meses(antes_de, 0)
+        
+        for particao in self.listar(tabela):
+            if not particao['mes'] or particao['mes'] >= limite:
+                continue
+            nome = particao['nome']
+            
+            if desanexar:
+                destino = f"{tabela}_{nome}"
+                self._executar(f"CREATE TABLE {destino} LIKE {tabela}")
+                self._executar(f"ALTER TABLE {destino} REMOVE PARTITIONING")
+                self._executar(f"ALTER TABLE {tabela} EXCHANGE PARTITION {nome} WITH TABLE {destino}")
+                linhas = particao['linhas']
+            else:
+                arquivo = Path(diretorio) / f"{tabela}_{nome}.ndjson.gz"
+                linhas = 0 if self.simular else self._exportar(tabela, nome, arquivo, lote)
+                destino = str(arquivo)
+            
+            self._executar(f"ALTER TABLE {tabela} DROP PARTITION {nome}")
+            arquivadas.append({'particao': nome, 'linhas': linhas, 'destino': destino})
+        
+        return arquivadas
+    
+    def _exportar(self, tabela: str, particao: str, arquivo: Path, lote: int) -> int:
+        arquivo.parent.mkdir(parents=True, exist_ok=True)
+        temporario = arquivo.with_name(arquivo.name + '.tmp')
+        
+        esperado = self._consultar(f"SELECT COUNT(*) FROM {tabela} PARTITION ({particao})")[0][0]
+        
+        linhas = 0
+        cursor = self.db.connection.cursor(dictionary=True)
+        try:
+            cursor.execute(f"SELECT * FROM {tabela} PARTITION ({particao}) ORDER BY id")
+            with gzip.open(temporario, 'wt', encoding='utf-8') as saida:
+                while True:
+                    registros = cursor.fetchmany(lote)
+                    if not registros:
+                        break
+                    for registro in registros:
+                        saida.write(json.dumps(registro, default=str, ensure_ascii=False) + '\n')
+                    linhas += len(registros)
+        finally:
+            cursor.close()
+        
+        if linhas != esperado:
+            temporario.unlink()
+            raise Error(msg=f"{tabela} {particao}: {linhas} linha(s) exportada(s), {esperado} esperada(s)")
+        
+        with open(temporario, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(temporario, arquivo)
+        return linhas
+
+
+if __name__ == "__main__":
+    # Teste dos nomes e limites das partições (sem banco)
+    print("=== Gerenciador de Partições ===")
+    hoje = date.today()
+    for meses in range(-1, 3):
+        mes = somar_meses(hoje, meses)
+        print(f"  {_definicao(mes)}")
+    print(f"  Mês de p202612: {mes_da_particao('p202612')}, de pmax: {mes_da_particao(PARTICAO_MAX)}")
+    print(f"  Agora: {datetime.now():%Y-%m}")
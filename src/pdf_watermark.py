@@ -0,0 +1,342 @@
+"""
+Marca d'Água por Destinatário
+Carimba o hash_envio em cada cópia do fascículo por atualização incremental do PDF
+"""
+import io
+import re
+import shutil
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject
+
+
+# Nome do recurso de fonte da marca (improvável de colidir com os do PDF)
+FONTE_MARCA = '/FMarcaDagua'
+
+# Modelo da marca no processo do pool (definido uma vez por _iniciar_processo)
+_modelo_processo: Optional[Dict] = None
+
+
+def _serializar(objeto) -> bytes:
+    """Serializa um objeto PyPDF2 na sintaxe PDF"""
+    buffer = io.BytesIO()
+    objeto.write_to_stream(buffer, None)
+    return buffer.getvalue()
+
+
+def _objeto(numero: int, conteudo: bytes, geracao: int = 0) -> bytes:
+    """Monta um objeto indireto"""
+    return b'%d %d obj\n' % (numero, geracao) + conteudo + b'\nendobj\n'
+
+
+def _stream(numero: int, dados: bytes) -> bytes:
+    """Monta um objeto stream sem compressão"""
+    return _objeto(numero, b'<< /Length %d >>\nstream\n' % len(dados) + dados + b'\nendstream')
+
+
+def _texto_pdf(texto: str) -> bytes:
+    """Converte o texto em string literal PDF (WinAnsi, com escapes)"""
+    dados = texto.encode('cp1252', 'replace')
+    return b'(' + re.sub(rb'([\\()])', rb'\\\1', dados) + b')'
+
+
+def _herdado(pagina: DictionaryObject, chave: str):
+    """Valor da página ou herdado da árvore de páginas (/Resources, /MediaBox)"""
+    no = pagina
+    while no is not None:
+        if chave in no:
+            return no[chave]
+        pai = no.get('/Parent')
+        no = pai.get_object() if pai is not None else None
+    return None
+
+
+def _gravar(modelo: Dict, hash_envio: str) -> Path:
+    """
+    Grava a cópia marcada de um destinatário (se ainda não existir)
+    
+    A cópia é o PDF original intacto seguido da atualização incremental já
+    montada; só o stream da marca e a posição final da tabela xref dependem
+    do destinatário. Uma cópia que sobrou de uma execução interrompida é
+    reaproveitada.
+    
+    Returns:
+        Caminho da cópia marcada
+    """
+    destino = Path(modelo['diretorio']) / f"{hash_envio}.pdf"
+    if destino.exists():
+        return destino
+    
+    conteudo = b'BT /%s %s Tf %s g %s Tj ET Q\n' % (
+        FONTE_MARCA[1:].encode('ascii'),
+        str(modelo['tamanho_fonte']).encode('ascii'),
+        str(modelo['cinza']).encode('ascii'),
+        _texto_pdf(modelo['texto'].format(hash_envio=hash_envio))
+    )
+    marca = _stream(modelo['marca_id'], conteudo)
+    inicio_xref = modelo['inicio_marca'] + len(marca)
+    
+    temporario = destino.with_name(destino.name + '.tmp')
+    shutil.copyfile(modelo['pdf_path'], temporario)
+    with open(temporario, 'ab') as f:
+        f.write(modelo['cauda'])
+        f.write(marca)
+        f.write(modelo['xref'])
+        f.write(b'startxref\n%d\n%%%%EOF\n' % inicio_xref)
+    temporario.replace(destino)
+    return destino
+
+
+def _iniciar_processo(modelo: Dict):
+    """Recebe o modelo uma única vez por processo do pool"""
+    global _modelo_processo
+    _modelo_processo = modelo
+
+
+def _marcar_no_processo(hash_envio: str) -> Path:
+    """Marca uma cópia usando o modelo do processo"""
+    return _gravar(_modelo_processo, hash_envio)
+
+
+class PdfWatermarker:
+    """
+    Gera cópias do fascículo com o hash_envio do destinatário em cada página
+    
+    O PDF original é lido uma única vez: a fonte, os streams de posição e os
+    novos dicionários das páginas (com a marca acrescentada ao /Contents) são
+    montados antecipadamente como uma atualização incremental. Cada cópia é o
+    arquivo original sem alterações, essa parte comum e um pequeno stream com
+    o texto do destinatário, sem reprocessar o PDF.
+    
+    A marca é apenas visual: como os bytes originais continuam no início da
+    cópia, truncá-la no %%EOF original devolve o PDF sem marca. Ela identifica
+    cópias repassadas como recebidas, mas não resiste a quem quer removê-la.
+    
+    As cópias são gravadas no diretório, em <hash_envio>.pdf, e devem ser
+    apagadas com descartar() assim que o envio termina.
+    """
+    
+    def __init__(
+        self,
+        pdf_path: Path,
+        diretorio: Path,
+        texto: str = 'Envio: {hash_envio}',
+        tamanho_fonte: float = 6,
+        cinza: float = 0.5
+    ):
+        """
+        Inicializa o marcador lendo e preparando o PDF base
+        
+        Args:
+            pdf_path: PDF original do fascículo
+            diretorio: Diretório das cópias marcadas
+            texto: Texto da marca; {hash_envio} é substituído em cada cópia
+            tamanho_fonte: Tamanho da fonte da marca (pontos)
+            cinza: Tom de cinza da marca (0 = preto, 1 = branco)
+        
+        Raises:
+            ValueError: Se o PDF é criptografado ou não tem páginas
+        """
+        self.pdf_path = Path(pdf_path)
+        self.diretorio = Path(diretorio)
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self.modelo = self._preparar(texto, tamanho_fonte, cinza)
+    
+    @property
+    def paginas(self) -> int:
+        """Número de páginas marcadas em cada cópia"""
+        return self.modelo['paginas']
+    
+    def _preparar(self, texto: str, tamanho_fonte: float, cinza: float) -> Dict:
+        """
+        Monta a parte da atualização incremental comum a todas as cópias
+        
+        Returns:
+            Modelo com a cauda pronta, a tabela xref e a posição da marca
+        """
+        with open(self.pdf_path, 'rb') as f:
+            dados = f.read()
+        reader = PdfReader(io.BytesIO(dados))
+        if reader.is_encrypted:
+            raise ValueError("PDF criptografado não pode receber marca d'água")
+        if not reader.pages:
+            raise ValueError("PDF sem páginas")
+        
+        xref_anterior = int(re.findall(rb'startxref\s+(\d+)', dados[-2048:])[-1])
+        proximo = int(reader.trailer['/Size'])
+        
+        # A atualização começa em uma nova linha após o %%EOF original
+        separador = b'' if dados.endswith((b'\n', b'\r')) else b'\n'
+        posicao = len(dados) + len(separador)
+        partes = [separador]
+        entradas = []
+        
+        def acrescentar(numero, objeto, geracao=0):
+            nonlocal posicao
+            entradas.append((numero, geracao, posicao))
+            partes.append(objeto)
+            posicao += len(objeto)
+        
+        fonte_id = proximo
+        acrescentar(fonte_id, _objeto(fonte_id, b'<< /Type /Font /Subtype /Type1 '
+                                                b'/BaseFont /Helvetica /Encoding /WinAnsiEncoding >>'))
+        # Isola o estado gráfico do conteúdo original (q ... Q) antes da marca
+        abre_id = proximo + 1
+        acrescentar(abre_id, _stream(abre_id, b'q'))
+        proximo += 2
+        
+        posicionamentos = {}
+        paginas = []
+        for pagina in reader.pages:
+            caixa = _herdado(pagina, '/MediaBox') or [0, 0, 612, 792]
+            origem = (float(caixa[0]) + 12, float(caixa[1]) + 8)
+            if origem not in posicionamentos:
+                posicionamentos[origem] = proximo
+                acrescentar(proximo, _stream(proximo, b'Q q 1 0 0 1 %.2f %.2f cm' % origem))
+                proximo += 1
+            paginas.append((pagina, posicionamentos[origem]))
+        
+        # A marca (por destinatário) recebe o último número, depois das páginas
+        marca_id = proximo
+        for pagina, posicionamento_id in paginas:
+            referencia = pagina.indirect_reference
+            nova = DictionaryObject(pagina.items())
+            
+            conteudos = ArrayObject([IndirectObject(abre_id, 0, reader)])
+            original = pagina.raw_get('/Contents') if '/Contents' in pagina else None
+            if original is not None:
+                if isinstance(original.get_object(), ArrayObject):
+                    conteudos.extend(original.get_object())
+                else:
+                    conteudos.append(original)
+            conteudos.append(IndirectObject(posicionamento_id, 0, reader))
+            conteudos.append(IndirectObject(marca_id, 0, reader))
+            nova[NameObject('/Contents')] = conteudos
+            
+            recursos = _herdado(pagina, '/Resources')
+            recursos = DictionaryObject(recursos.get_object().items()) if recursos is not None else DictionaryObject()
+            fontes = recursos.get('/Font')
+            fontes = DictionaryObject(fontes.get_object().items()) if fontes is not None else DictionaryObject()
+            fontes[NameObject(FONTE_MARCA)] = IndirectObject(fonte_id, 0, reader)
+            recursos[NameObject('/Font')] = fontes
+            nova[NameObject('/Resources')] = recursos
+            
+            acrescentar(referencia.idnum, _objeto(referencia.idnum, _serializar(nova), referencia.generation),
+                        referencia.generation)
+        
+        inicio_marca = posicao
+        entradas.append((marca_id, 0, inicio_marca))
+        
+        # Tabela xref da atualização: cabeça da lista de livres e uma subseção por objeto
+        xref = [b'xref\n0 1\n0000000000 65535 f\r\n']
+        for numero, geracao, deslocamento in sorted(entradas):
+            xref.append(b'%d 1\n%010d %05d n\r\n' % (numero, deslocamento, geracao))
+        
+        trailer = DictionaryObject({
+            NameObject('/Size'): NumberObject(marca_id + 1),
+            NameObject('/Root'): reader.trailer.raw_get('/Root'),
+            NameObject('/Prev'): NumberObject(xref_anterior)
+        })
+        for chave in ('/Info', '/ID'):
+            if chave in reader.trailer:
+                trailer[NameObject(chave)] = reader.trailer.raw_get(chave)
+        xref.append(b'trailer\n' + _serializar(trailer) + b'\n')
+        
+        return {
+            'pdf_path': str(self.pdf_path),
+            'diretorio': str(self.diretorio),
+            'texto': texto,
+            'tamanho_fonte': tamanho_fonte,
+            'cinza': cinza,
+            'paginas': len(paginas),
+            'cauda': b''.join(partes),
+            'marca_id': marca_id,
+            'inicio_marca': inicio_marca,
+            'xref': b''.join(xref)
+        }
+    
+    def caminho(self, hash_envio: str) -> Path:
+        """Caminho da cópia marcada de um envio"""
+        return self.diretorio / f"{hash_envio}.pdf"
+    
+    def marcar(self, hash_envio: str) -> Path:
+        """
+        Gera (ou reaproveita, se já existir) a cópia marcada de um envio
+        
+        Args:
+            hash_envio: Hash único do envio, impresso em cada página
+        
+        Returns:
+            Caminho da cópia marcada
+        """
+        return _gravar(self.modelo, hash_envio)
+    
+    def descartar(self, hash_envio: str):
+        """Apaga a cópia marcada de um envio concluído (se existir)"""
+        self.caminho(hash_envio).unlink(missing_ok=True)
+    
+    def criar_pool(self, processos: Optional[int] = None) -> ProcessPoolExecutor:
+        """
+        Cria um pool de processos que já recebe o modelo preparado
+        
+        Args:
+            processos: Número de processos (padrão: número de CPUs)
+        
+        Returns:
+            ProcessPoolExecutor para usar com agendar()
+        """
+        return ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo, initargs=(self.modelo,))
+    
+    def agendar(self, pool: ProcessPoolExecutor, hash_envio: str) -> Future:
+        """
+        Agenda a marcação de um envio no pool, à frente do envio do email
+        
+        Returns:
+            Future com o caminho da cópia marcada
+        """
+        return pool.submit(_marcar_no_processo, hash_envio)
+    
+    def marcar_lote(self, hashes: Iterable[str], processos: Optional[int] = None) -> Dict[str, Path]:
+        """
+        Marca as cópias de vários envios em paralelo
+        
+        Args:
+            hashes: Hashes dos envios
+            processos: Número de processos (padrão: número de CPUs)
+        
+        Returns:
+            Dicionário {hash_envio: caminho da cópia marcada}
+        """
+        with self.criar_pool(processos) as pool:
+            futuros = {hash_envio: self.agendar(pool, hash_envio) for hash_envio in hashes}
+            return {hash_envio: futuro.result() for hash_envio, futuro in futuros.items()}
+
+
+if __name__ == "__main__":
+    # Teste da marca d'água
+    import sys
+    import tempfile
+    import time
+    
+    print("=== Marca d'Água por Destinatário ===")
+    
+    if len(sys.argv) < 2:
+        print("Uso: python pdf_watermark.py <arquivo.pdf> [copias]")
+        sys.exit(1)
+    
+    copias = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        marcador = PdfWatermarker(Path(sys.argv[1]), Path(tmp))
+        print(f"\nPáginas: {marcador.paginas}")
+        
+        inicio = time.perf_counter()
+        copias_marcadas = marcador.marcar_lote(f"env-{n:06d}" for n in range(copias))
+        tempo = time.perf_counter() - inicio
+        print(f"{copias} cópias em {tempo:.2f}s ({copias / tempo:.0f} cópias/s)")
+        
+        exemplo = next(iter(copias_marcadas.values()))
+        texto = PdfReader(str(exemplo)).pages[0].extract_text()
+        print(f"Marca na primeira página: {'env-000000' in texto}")
@@ -0,0 +1,450 @@
+"""
+Limitador de Taxa (Janela Deslizante)
+Controla o ritmo de envio de acordo com as quotas do provedor SMTP
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+
+# Duração (em segundos) de cada janela de quota suportada
+PERIODOS = {
+    'segundo': 1,
+    'minuto': 60,
+    'hora': 3600,
+    'dia': 86400
+}
+
+# Fatias em que cada janela é contada (a folga da contagem é de uma fatia)
+FATIAS_POR_JANELA = 60
+
+# Máximo de envios reservados de uma vez na quota compartilhada
+BLOCO_MAXIMO_QUOTA = 50
+
+
+class TokenBucket:
+    """Balde de tokens com capacidade e período de recarga"""
+    
+    def __init__(self, nome: str, capacidade: int, periodo: float):
+        """
+        Inicializa o balde cheio
+        
+        Args:
+            nome: Nome da janela (ex: 'minuto', 'hora')
+            capacidade: Número máximo de envios na janela
+            periodo: Duração da janela em segundos
+        """
+        if capacidade <= 0 or periodo <= 0:
+            raise ValueError(f"Quota inválida para '{nome}': {capacidade} em {periodo}s")
+        
+        self.nome = nome
+        self.capacidade = capacidade
+        self.periodo = periodo
+        self.taxa = capacidade / periodo
+        self.tokens = float(capacidade)
+        self.ultima_recarga = time.monotonic()
+    
+    def recarregar(self, agora: float):
+        """Adiciona os tokens acumulados desde a última recarga"""
+        decorrido = agora - self.ultima_recarga
+        if decorrido > 0:
+            self.tokens = min(self.capacidade, self.tokens + decorrido * self.taxa)
+            self.ultima_recarga = agora
+    
+    def tempo_para(self, quantidade: float = 1) -> float:
+        """Segundos até haver `quantidade` tokens disponíveis"""
+        faltam = quantidade - self.tokens
+        return max(0.0, faltam / self.taxa)
+    
+    def tempo_ate_cheio(self) -> float:
+        """Segundos até o balde voltar à capacidade total"""
+        return max(0.0, (self.capacidade - self.tokens) / self.taxa)
+    
+    def definir_taxa(self, taxa: float, agora: float):
+        """Altera a taxa de recarga preservando os tokens já acumulados"""
+        if taxa <= 0:
+            raise ValueError(f"Taxa inválida para '{self.nome}': {taxa}")
+        self.recarregar(agora)
+        self.taxa = taxa
+        self.periodo = self.capacidade / taxa
+
+
+class JanelaDeslizante:
+    """
+    Quota de envios em uma janela deslizante, contada em fatias
+    
+    Guarda quantos envios houve em cada fatia (período / fatias) e soma as
+    fatias que tocam os últimos `periodo` segundos, contando a mais antiga
+    inteira: nenhum intervalo de `periodo` segundos passa da capacidade. Ao
+    contrário de um balde de tokens que começa cheio, a primeira janela não
+    libera o dobro da quota. O custo é no máximo uma fatia de atraso.
+    """
+    
+    def __init__(self, nome: str, capacidade: int, periodo: float, fatias: int = FATIAS_POR_JANELA):
+        """
+        Inicializa a janela vazia
+        
+        Args:
+            nome: Nome da janela (ex: 'minuto', 'hora')
+            capacidade: Número máximo de envios na janela
+            periodo: Duração da janela em segundos
+            fatias: Fatias em que a janela é contada
+        """
+        if capacidade <= 0 or periodo <= 0:
+            raise ValueError(f"Quota inválida para '{nome}': {capacidade} em {periodo}s")
+        
+        self.nome = nome
+        self.capacidade = capacidade
+        self.periodo = periodo
+        self.fatias = fatias
+        self.duracao_fatia = periodo / fatias
+        self.usados = 0
+        self._contagens = deque()  # [fatia, envios], da mais antiga para a mais nova
+    
+    def _fatia(self, instante: float) -> int:
+        return int(instante // self.duracao_fatia)
+    
+    def _expirar(self, instante: float):
+        # Fatias anteriores a esta terminam antes do início da janela
+        primeira = self._fatia(instante) - self.fatias
+        while self._contagens and self._contagens[0][0] < primeira:
+            self.usados -= self._contagens.popleft()[1]
+    
+    def _fim_da_contagem(self, fatia: int, instante: float) -> float:
+        """Segundos até a fatia deixar de contar na janela"""
+        return max(0.0, (fatia + self.fatias + 1) * self.duracao_fatia - instante)
+    
+    def tempo_para(self, quantidade: int, instante: float) -> float:
+        """Segundos até a janela comportar mais `quantidade` envios"""
+        self._expirar(instante)
+        excesso = self.usados + quantidade - self.capacidade
+        if excesso <= 0:
+            return 0.0
+        
+        liberados = 0
+        for fatia, envios in self._contagens:
+            liberados += envios
+            if liberados >= excesso:
+                return self._fim_da_contagem(fatia, instante)
+        return float('inf')
+    
+    def registrar(self, quantidade: int, instante: float):
+        """Conta `quantidade` envios na fatia atual"""
+        fatia = self._fatia(instante)
+        if self._contagens and self._contagens[-1][0] == fatia:
+            self._contagens[-1][1] += quantidade
+        else:
+            self._contagens.append([fatia, quantidade])
+        self.usados += quantidade
+    
+    def devolver(self, quantidade: int):
+        """Desconta envios registrados e não realizados, das fatias mais novas"""
+        while quantidade > 0 and self._contagens:
+            descontar = min(quantidade, self._contagens[-1][1])
+            self._contagens[-1][1] -= descontar
+            self.usados -= descontar
+            quantidade -= descontar
+            if not self._contagens[-1][1]:
+                self._contagens.pop()
+    
+    def disponivel(self, instante: float) -> int:
+        """Envios que a janela ainda comporta agora"""
+        self._expirar(instante)
+        return max(0, self.capacidade - self.usados)
+    
+    def tempo_ate_vazia(self, instante: float) -> float:
+        """Segundos até nenhum envio registrado contar mais na janela"""
+        self._expirar(instante)
+        if not self._contagens:
+            return 0.0
+        return self._fim_da_contagem(self._contagens[-1][0], instante)
+
+
+class QuotaCompartilhada:
+    """
+    Quota gravada no banco e somada entre processos e execuções
+    
+    Os workers de uma campanha (e uma campanha retomada depois de um
+    reinício) consomem a mesma quota do provedor: as reservas passam pela
+    tabela quotas_envio (DatabaseManager.reservar_quota) com a mesma
+    `chave`. Só as janelas de PERIODOS são compartilhadas; o intervalo
+    mínimo entre envios vale por processo. Se o banco falhar, o limitador
+    segue só com a contagem local do processo.
+    
+    Para não fazer uma transação por destinatário, os envios são reservados
+    em blocos e entregues de um crédito local. O crédito vale por uma fatia
+    da menor janela (a mesma folga da contagem); o bloco dobra quando o
+    crédito é usado a tempo e cai pela metade quando sobra, acompanhando o
+    ritmo do processo até `bloco_maximo`.
+    """
+    
+    def __init__(self, db, chave: str, bloco_maximo: int = BLOCO_MAXIMO_QUOTA):
+        """
+        Args:
+            db: DatabaseManager
+            chave: Conta cuja quota é compartilhada (ex: servidor e usuário SMTP)
+            bloco_maximo: Máximo de envios reservados por transação
+        """
+        self.db = db
+        self.chave = chave
+        self.bloco_maximo = max(1, bloco_maximo)
+        self.ativa = True
+        self.reservas = 0
+        self._bloco = 1
+        self._credito = 0
+        self._credito_ate = 0.0
+        self._lock = threading.Lock()
+    
+    def _consumir(self, quantidade: int, agora: float) -> bool:
+        """Usa o crédito local, se houver (com o lock travado)"""
+        if self._credito and agora >= self._credito_ate:
+            # Crédito vencido sem uso: o bloco era grande demais para o ritmo
+            self._credito = 0
+            self._bloco = max(1, self._bloco // 2)
+        if self._credito < quantidade:
+            return False
+        self._credito -= quantidade
+        if not self._credito:
+            self._bloco = min(self.bloco_maximo, self._bloco * 2)
+        return True
+    
+    def reservar(self, janelas: List[JanelaDeslizante], quantidade: int) -> float:
+        """
+        Reserva `quantidade` envios em todas as janelas compartilhadas
+        
+        A consulta ao banco é feita sem travar o limitador nem o crédito:
+        as outras threads do processo seguem usando o que já foi reservado.
+        
+        Returns:
+            0.0 se reservado, senão segundos até a quota comportar o envio
+        """
+        compartilhadas = [
+            (janela.nome, janela.capacidade, janela.periodo)
+            for janela in janelas if PERIODOS.get(janela.nome) == janela.periodo
+        ]
+        if not self.ativa or not compartilhadas:
+            return 0.0
+        
+        capacidade = min(capacidade for _, capacidade, _ in compartilhadas)
+        validade = min(periodo for _, _, periodo in compartilhadas) / FATIAS_POR_JANELA
+        
+        while True:
+            with self._lock:
+                if self._consumir(quantidade, time.monotonic()):
+                    return 0.0
+                falta = quantidade - self._credito
+                pedido = min(max(falta, self._bloco), max(falta, capacidade))
+            
+            espera = self.db.reservar_quota(self.chave, compartilhadas, pedido, FATIAS_POR_JANELA)
+            if espera and pedido > falta:
+                # Perto do limite: reserva só o necessário
+                pedido = falta
+                espera = self.db.reservar_quota(self.chave, compartilhadas, pedido, FATIAS_POR_JANELA)
+            
+            with self._lock:
+                if espera is None:
+                    self.ativa = False
+                    print("[AVISO] Quota compartilhada indisponível: seguindo só com a quota deste processo")
+                    return 0.0
+                if espera > 0:
+                    return espera
+                self.reservas += 1
+                self._credito += pedido
+                self._credito_ate = time.monotonic() + validade
+                # Outra thread pode ter usado o crédito nesse meio tempo: tenta de novo
+                if self._consumir(quantidade, time.monotonic()):
+                    return 0.0
+    
+    def devolver(self, quantidade: int):
+        """Devolve ao crédito local envios reservados que não foram feitos"""
+        with self._lock:
+            if time.monotonic() < self._credito_ate:
+                self._credito += quantidade
+
+
+class RateLimiter:
+    """
+    Limitador de taxa composto por várias janelas deslizantes
+    
+    Um envio só é liberado quando todas as janelas (segundo, minuto, hora,
+    dia...) comportam mais um envio. É thread-safe e pode ser compartilhado
+    entre todos os workers de um envio. Com uma QuotaCompartilhada, a quota
+    também é somada com a dos outros processos que usam a mesma chave.
+    """
+    
+    def __init__(self, limites: Optional[Dict[str, int]] = None, intervalo_minimo: float = 0,
+                 compartilhada: Optional[QuotaCompartilhada] = None):
+        """
+        Inicializa o limitador
+        
+        Args:
+            limites: Quotas por janela, ex: {'minuto': 60, 'dia': 2000}.
+                     Valores 0 ou ausentes significam sem limite.
+            intervalo_minimo: Espaçamento mínimo em segundos entre envios (opcional)
+            compartilhada: Quota no banco somada entre processos (opcional)
+        """
+        self.janelas: List[JanelaDeslizante] = []
+        
+        for nome, limite in (limites or {}).items():
+            if nome not in PERIODOS:
+                raise ValueError(f"Janela de quota desconhecida: {nome}")
+            if limite:
+                self.janelas.append(JanelaDeslizante(nome, int(limite), PERIODOS[nome]))
+        
+        if intervalo_minimo > 0:
+            self.janelas.append(JanelaDeslizante('intervalo', 1, intervalo_minimo))
+        
+        self.compartilhada = compartilhada
+        # Até quando a quota compartilhada recusou reservas (relógio monotônico)
+        self._bloqueado_ate = 0.0
+        self._condicao = threading.Condition()
+    
+    @property
+    def ilimitado(self) -> bool:
+        """True se nenhuma quota foi configurada"""
+        return not self.janelas
+    
+    @property
+    def capacidade(self) -> Optional[int]:
+        """Maior quantidade liberável de uma vez (menor quota) ou None se ilimitado"""
+        return min((janela.capacidade for janela in self.janelas), default=None)
+    
+    def _espera_necessaria(self, quantidade: int, agora: float) -> float:
+        return max(
+            max((janela.tempo_para(quantidade, agora) for janela in self.janelas), default=0.0),
+            self._bloqueado_ate - agora
+        )
+    
+    def _reservar(self, quantidade: int) -> float:
+        """
+        Registra os envios se couberem; senão retorna a espera
+        
+        Deve ser chamado sem a condição travada: a reserva na quota
+        compartilhada (que pode ir ao banco) é feita fora dela, depois de os
+        envios serem registrados localmente, e desfeita se o banco recusar.
+        """
+        with self._condicao:
+            agora = time.monotonic()
+            espera = self._espera_necessaria(quantidade, agora)
+            if espera > 0:
+                return espera
+            for janela in self.janelas:
+                janela.registrar(quantidade, agora)
+        
+        if not self.compartilhada:
+            return 0.0
+        
+        espera = self.compartilhada.reservar(self.janelas, quantidade)
+        if espera > 0:
+            with self._condicao:
+                for janela in self.janelas:
+                    janela.devolver(quantidade)
+                self._bloqueado_ate = max(self._bloqueado_ate, time.monotonic() + espera)
+        return espera
+    
+    def tentar_adquirir(self, quantidade: int = 1) -> bool:
+        """
+        Tenta liberar envios sem bloquear
+        
+        Args:
+            quantidade: Número de envios a liberar
+        
+        Returns:
+            True se os envios foram registrados na quota
+        """
+        return self._reservar(quantidade) == 0
+    
+    def adquirir(self, quantidade: int = 1, timeout: Optional[float] = None) -> float:
+        """
+        Bloqueia até que a quota permita o envio e o registra
+        
+        Args:
+            quantidade: Número de envios a liberar
+            timeout: Tempo máximo de espera em segundos (None = sem limite)
+        
+        Returns:
+            Tempo total esperado em segundos
+        
+        Raises:
+            TimeoutError: Se o timeout expirar antes da liberação
+        """
+        for janela in self.janelas:
+            if quantidade > janela.capacidade:
+                raise ValueError(f"Quantidade {quantidade} excede a quota '{janela.nome}' ({janela.capacidade})")
+        
+        inicio = time.monotonic()
+        
+        while True:
+            espera = self._reservar(quantidade)
+            agora = time.monotonic()
+            
+            if espera <= 0:
+                return agora - inicio
+            
+            if timeout is not None:
+                restante = timeout - (agora - inicio)
+                if restante <= 0:
+                    raise TimeoutError(f"Quota não liberada em {timeout}s")
+                espera = min(espera, restante)
+            
+            # Acordado antes por devolver(), que libera quota
+            with self._condicao:
+                self._condicao.wait(espera)
+    
+    def devolver(self, quantidade: int = 1):
+        """
+        Desconta envios liberados que não chegaram a ser feitos
+        
+        A parte da quota compartilhada volta ao crédito local do processo
+        (enquanto ele vale), não ao banco.
+        """
+        with self._condicao:
+            for janela in self.janelas:
+                janela.devolver(quantidade)
+            self._condicao.notify_all()
+        if self.compartilhada:
+            self.compartilhada.devolver(quantidade)
+    
+    def tempo_ate_recarga(self) -> float:
+        """
+        Segundos até o próximo envio ser liberado pela quota
+        
+        Returns:
+            0.0 se há quota disponível agora
+        """
+        with self._condicao:
+            return self._espera_necessaria(1, time.monotonic())
+    
+    def status(self) -> Dict[str, Dict]:
+        """
+        Retorna o estado de cada janela de quota
+        
+        Returns:
+            Dicionário {janela: {capacidade, disponivel, recarga_total_segundos}}
+        """
+        with self._condicao:
+            agora = time.monotonic()
+            return {
+                janela.nome: {
+                    'capacidade': janela.capacidade,
+                    'disponivel': janela.disponivel(agora),
+                    'recarga_total_segundos': round(janela.tempo_ate_vazia(agora), 1)
+                }
+                for janela in self.janelas
+            }
+
+
+if __name__ == "__main__":
+    # Teste do limitador de taxa
+    print("=== Limitador de Taxa (Janela Deslizante) ===")
+    
+    limiter = RateLimiter({'segundo': 5, 'minuto': 20})
+    inicio = time.monotonic()
+    
+    for i in range(1, 11):
+        esperado = limiter.adquirir()
+        print(f"  Envio {i:2d} liberado em {time.monotonic() - inicio:.2f}s (esperou {esperado:.2f}s)")
+    
+    print(f"\nPróxima liberação em: {limiter.tempo_ate_recarga():.2f}s")
+    print(f"Status: {limiter.status()}")
@@ -0,0 +1,233 @@
+"""
+Roteador de Relays SMTP
+Distribui os envios entre vários relays por peso, com quotas próprias e failover por saúde
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from rate_limiter import QuotaCompartilhada, RateLimiter
+
+
+class Relay:
+    """Configuração, quota e saúde de um relay SMTP"""
+    
+    def __init__(self, config: Dict, db=None):
+        """
+        Inicializa o relay
+        
+        Args:
+            config: Configuração SMTP completa do relay (server, port, user,
+                    password, from, starttls...) com nome, peso e limites
+            db: DatabaseManager para somar a quota do relay entre processos (opcional)
+        """
+        self.nome = config.get('nome') or f"{config['server']}:{config['port']}"
+        self.peso = max(1, int(config.get('peso', 1)))
+        self.config = config
+        self.limiter = RateLimiter(
+            config.get('limites') or {},
+            compartilhada=QuotaCompartilhada(db, f"relay:{self.nome}") if db else None
+        )
+        
+        self.atual = 0
+        self.enviados = 0
+        self.falhas = 0
+        self.falhas_seguidas = 0
+        self.suspenso_ate = 0.0
+    
+    def comporta(self, quantidade: int) -> bool:
+        """True se a quota do relay chega a liberar `quantidade` envios de uma vez"""
+        capacidade = self.limiter.capacidade
+        return capacidade is None or quantidade <= capacidade
+    
+    def suspenso(self, agora: float) -> bool:
+        """True se o relay está fora de uso após falhas"""
+        return agora < self.suspenso_ate
+
+
+class RelayRouter:
+    """
+    Escolhe o relay de cada envio por round-robin ponderado
+    
+    Cada relay tem peso, quotas próprias (janela deslizante) e um estado de saúde:
+    uma falha de conexão, autenticação ou um 421 suspende o relay por um
+    tempo que cresce exponencialmente com as falhas seguidas, e os envios
+    seguem pelos demais. Quando todos estão suspensos, o que volta primeiro é
+    testado antes do fim da suspensão, para que a campanha não pare.
+    
+    É thread-safe: é consultado pelas threads do pool de envio.
+    """
+    
+    def __init__(
+        self,
+        relays: List[Dict],
+        config_padrao: Optional[Dict] = None,
+        suspensao_base: float = 15.0,
+        suspensao_max: float = 600.0,
+        db=None
+    ):
+        """
+        Inicializa o roteador
+        
+        Args:
+            relays: Lista de relays, ex: [{'nome': 'a', 'server': ..., 'peso': 2,
+                    'limites': {'minuto': 600}}]
+            config_padrao: Configuração SMTP herdada pelos relays (ex: SMTP_CONFIG)
+            suspensao_base: Suspensão (s) após a primeira falha
+            suspensao_max: Suspensão máxima (s) após falhas seguidas
+            db: DatabaseManager para somar as quotas dos relays entre processos (opcional)
+        """
+        if not relays:
+            raise ValueError("Informe ao menos um relay SMTP")
+        
+        self.relays = [Relay({**(config_padrao or {}), **relay}, db) for relay in relays]
+        self.suspensao_base = suspensao_base
+        self.suspensao_max = suspensao_max
+        self._lock = threading.Lock()
+    
+    @property
+    def capacidade_grupo(self) -> Optional[int]:
+        """
+        Maior mensagem (em RCPT TO) que qualquer relay consegue enviar
+        
+        É a menor quota entre os relays: um grupo maior nunca obteria tokens
+        no relay de menor quota, e o failover para ele ficaria impossível.
+        
+        Returns:
+            Número de destinatários ou None se nenhum relay tem quota
+        """
+        return min(
+            (relay.limiter.capacidade for relay in self.relays if relay.limiter.capacidade is not None),
+            default=None
+        )
+    
+    def escolher(self, quantidade: int = 1, excluir: Iterable[str] = ()) -> Optional[Relay]:
+        """
+        Escolhe um relay saudável com quota, ponderado pelo peso
+        
+        Consome `quantidade` envios da quota do relay escolhido. A quota é
+        consultada fora do lock do roteador, já que pode ir ao banco
+        (QuotaCompartilhada).
+        
+        Args:
+            quantidade: Destinatários da mensagem (RCPT TO)
+            excluir: Nomes de relays já tentados para esta mensagem
+        
+        Returns:
+            Relay escolhido ou None se nenhum pode enviar agora
+        """
+        agora = time.monotonic()
+        
+        with self._lock:
+            # Relay cuja quota não comporta a mensagem nunca teria tokens para ela
+            candidatos = [
+                relay for relay in self.relays
+                if relay.nome not in excluir and relay.comporta(quantidade)
+            ]
+            saudaveis = [relay for relay in candidatos if not relay.suspenso(agora)]
+            if not saudaveis and candidatos:
+                # Todos suspensos: testa o que voltaria primeiro
+                saudaveis = [min(candidatos, key=lambda relay: relay.suspenso_ate)]
+            if not saudaveis:
+                return None
+            
+            # Round-robin ponderado suave: cada relay acumula seu peso e o
+            # maior acumulado é escolhido e descontado do peso total; os demais
+            # ficam como alternativas, na ordem do acumulado
+            peso_total = sum(relay.peso for relay in saudaveis)
+            for relay in saudaveis:
+                relay.atual += relay.peso
+            ordem = sorted(saudaveis, key=lambda relay: relay.atual, reverse=True)
+            ordem[0].atual -= peso_total
+        
+        for relay in ordem:
+            if relay.limiter.tentar_adquirir(quantidade):
+                if relay is not ordem[0]:
+                    # O escolhido estava sem quota: o desconto passa para quem enviou
+                    with self._lock:
+                        ordem[0].atual += peso_total
+                        relay.atual -= peso_total
+                return relay
+        return None
+    
+    def obter(self, quantidade: int = 1, excluir: Iterable[str] = (), timeout: float = 60.0) -> Optional[Relay]:
+        """
+        Como escolher(), mas aguarda até `timeout` segundos por quota de algum relay
+        
+        Returns:
+            Relay escolhido ou None se não há relay disponível
+        """
+        excluir = set(excluir)
+        limite = time.monotonic() + timeout
+        
+        while True:
+            relay = self.escolher(quantidade, excluir)
+            if relay:
+                return relay
+            
+            candidatos = [
+                relay for relay in self.relays
+                if relay.nome not in excluir and relay.comporta(quantidade)
+            ]
+            if not candidatos or time.monotonic() >= limite:
+                return None
+            espera = min(relay.limiter.tempo_ate_recarga() for relay in candidatos)
+            time.sleep(min(max(espera, 0.05), 1.0, max(0.0, limite - time.monotonic())))
+    
+    def registrar_sucesso(self, relay: Relay):
+        """Registra uma entrega aceita pelo relay (encerra a suspensão)"""
+        with self._lock:
+            relay.enviados += 1
+            relay.falhas_seguidas = 0
+            relay.suspenso_ate = 0.0
+    
+    def registrar_falha(self, relay: Relay) -> float:
+        """
+        Registra uma falha do relay e o suspende
+        
+        Returns:
+            Segundos de suspensão aplicados
+        """
+        with self._lock:
+            suspensao = min(self.suspensao_max, self.suspensao_base * (2 ** relay.falhas_seguidas))
+            relay.falhas += 1
+            relay.falhas_seguidas += 1
+            relay.suspenso_ate = time.monotonic() + suspensao
+            return suspensao
+    
+    def status(self) -> Dict[str, Dict]:
+        """
+        Retorna o estado de cada relay
+        
+        Returns:
+            Dicionário {relay: {peso, enviados, falhas, suspenso_por_segundos}}
+        """
+        agora = time.monotonic()
+        with self._lock:
+            return {
+                relay.nome: {
+                    'peso': relay.peso,
+                    'enviados': relay.enviados,
+                    'falhas': relay.falhas,
+                    'suspenso_por_segundos': round(max(0.0, relay.suspenso_ate - agora), 1)
+                }
+                for relay in self.relays
+            }
+
+
+if __name__ == "__main__":
+    # Teste do roteador de relays
+    print("=== Roteador de Relays SMTP ===")
+    
+    roteador = RelayRouter([
+        {'nome': 'principal', 'server': 'smtp1.exemplo.com', 'port': 587, 'peso': 3},
+        {'nome': 'reserva', 'server': 'smtp2.exemplo.com', 'port': 587, 'peso': 1}
+    ])
+    
+    escolhas = [roteador.escolher().nome for _ in range(8)]
+    print(f"\nEscolhas (pesos 3:1): {escolhas}")
+    
+    principal = roteador.relays[0]
+    print(f"Falha no principal: suspenso por {roteador.registrar_falha(principal):.0f}s")
+    print(f"Próximas escolhas: {[roteador.escolher().nome for _ in range(3)]}")
+    print(f"Status: {roteador.status()}")
@@ -0,0 +1,122 @@
+"""
+Fila de Reenvios
+Reagenda envios com falha temporária sem bloquear os demais (heap por horário da próxima tentativa)
+"""
+import heapq
+import itertools
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+
+def falha_transitoria(resultado: Dict) -> bool:
+    """
+    Indica se a falha de um envio pode dar certo em uma nova tentativa
+    
+    Usa a classificação do EmailSender (campo transitorio). Para resultados
+    sem ela, códigos 4xx e erros sem resposta do servidor são temporários e
+    códigos 5xx são definitivos.
+    
+    Args:
+        resultado: Resultado retornado pelo EmailSender
+    
+    Returns:
+        True se vale a pena tentar de novo
+    """
+    if resultado.get('success'):
+        return False
+    if 'transitorio' in resultado:
+        return bool(resultado['transitorio'])
+    codigo = resultado.get('smtp_code')
+    return codigo is None or 400 <= codigo < 500
+
+
+class RetryQueue:
+    """
+    Fila de reenvios com espera exponencial
+    
+    Os itens ficam em um heap ordenado pelo horário da próxima tentativa: o
+    laço de envio continua despachando os demais destinatários e recolhe os
+    reenvios com prontos() quando a espera de cada um termina.
+    
+    Deve ser usada apenas pela thread que despacha os envios.
+    """
+    
+    def __init__(self, max_tentativas: int = 3, espera_base: float = 30.0, espera_max: float = 600.0):
+        """
+        Inicializa a fila
+        
+        Args:
+            max_tentativas: Total de tentativas por envio, incluindo a primeira
+            espera_base: Espera (s) antes da segunda tentativa; dobra a cada nova falha
+            espera_max: Espera máxima (s) entre tentativas
+        """
+        self.max_tentativas = max(1, max_tentativas)
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self._heap: List = []
+        self._sequencia = itertools.count()
+    
+    def __len__(self) -> int:
+        return len(self._heap)
+    
+    def agendar(self, item: Any, tentativas: int) -> Optional[float]:
+        """
+        Agenda uma nova tentativa do item, se ainda houver tentativas
+        
+        Args:
+            item: Item a ser devolvido por prontos()
+            tentativas: Tentativas já feitas (incluindo a que acabou de falhar)
+        
+        Returns:
+            Segundos até a nova tentativa, ou None se as tentativas se esgotaram
+        """
+        if tentativas >= self.max_tentativas:
+            return None
+        
+        # Variação de +-10% para que falhas simultâneas não voltem juntas
+        espera = min(self.espera_max, self.espera_base * (2 ** (tentativas - 1)))
+        espera *= random.uniform(0.9, 1.1)
+        heapq.heappush(self._heap, (time.monotonic() + espera, next(self._sequencia), item))
+        return espera
+    
+    def prontos(self) -> List[Any]:
+        """
+        Retira da fila os itens cuja espera já terminou
+        
+        Returns:
+            Itens prontos para nova tentativa, na ordem em que venceram
+        """
+        agora = time.monotonic()
+        itens = []
+        while self._heap and self._heap[0][0] <= agora:
+            itens.append(heapq.heappop(self._heap)[2])
+        return itens
+    
+    def tempo_ate_proximo(self) -> Optional[float]:
+        """
+        Segundos até o próximo reenvio vencer
+        
+        Returns:
+            0.0 se há item pronto, None se a fila está vazia
+        """
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - time.monotonic())
+
+
+if __name__ == "__main__":
+    # Teste da fila de reenvios
+    print("=== Fila de Reenvios ===")
+    
+    fila = RetryQueue(max_tentativas=3, espera_base=0.2)
+    for tentativas in (1, 2, 3):
+        espera = fila.agendar(f"envio-{tentativas}", tentativas)
+        print(f"  Tentativa {tentativas} falhou: " + (f"reenvio em {espera:.2f}s" if espera else "esgotado"))
+    
+    while len(fila):
+        time.sleep(fila.tempo_ate_proximo())
+        print(f"  Prontos: {fila.prontos()}")
+    
+    print(f"\n421 é transitório: {falha_transitoria({'smtp_code': 421})}")
+    print(f"550 é transitório: {falha_transitoria({'smtp_code': 550})}")
@@ -0,0 +1,145 @@
+"""
+Buffer de Status dos Envios
+Agrupa as atualizações de status de envios_individuais em UPDATEs por conjunto de IDs
+"""
+import threading
+import time
+from typing import List, Optional, Tuple
+
+
+class StatusUpdateBuffer:
+    """
+    Acumula os status dos envios e os grava em lote
+    
+    Em vez de um UPDATE e um COMMIT por destinatário, os status são
+    guardados em memória e gravados por uma thread a cada `intervalo_ms`
+    ou assim que `max_linhas` se acumulam, com um UPDATE por status
+    (WHERE id IN (...)). A data de envio registrada é a do momento em que o
+    status chegou ao buffer, não a da gravação.
+    
+    Se o processo cair, perde-se no máximo a janela ainda não gravada:
+    esses envios continuam PENDENTE no banco e a retomada os reconcilia
+    com os blocos EMAIL_SENT da blockchain.
+    
+    É thread-safe; use como context manager para garantir a gravação final.
+    """
+    
+    def __init__(self, db, max_linhas: int = 500, intervalo_ms: int = 1000):
+        """
+        Inicializa o buffer
+        
+        Args:
+            db: DatabaseManager usado nas gravações
+            max_linhas: Gravação antecipada ao acumular esta quantidade de status
+            intervalo_ms: Intervalo máximo (ms) entre gravações
+        """
+        self.db = db
+        self.max_linhas = max(1, max_linhas)
+        self.intervalo = max(1, intervalo_ms) / 1000
+        
+        self._pendentes: List[Tuple[int, str, Optional[float]]] = []
+        self._lock = threading.Lock()
+        self._lock_gravacao = threading.Lock()
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread = None
+        
+        self.gravados = 0
+        self.gravacoes = 0
+        self.falhas = 0
+    
+    def __enter__(self):
+        self.iniciar()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.encerrar()
+        return False
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pendentes)
+    
+    def iniciar(self):
+        """Inicia a thread de gravação periódica"""
+        if self._thread is None:
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._executar, name='status-buffer', daemon=True)
+            self._thread.start()
+    
+    def encerrar(self):
+        """Para a thread e grava o que ainda estiver no buffer"""
+        if self._thread is not None:
+            self._parar.set()
+            self._acordar.set()
+            self._thread.join()
+            self._thread = None
+        self.descarregar()
+    
+    def registrar(self, envio_id: int, status: str, data_envio: bool = True):
+        """
+        Adiciona um status ao buffer
+        
+        Args:
+            envio_id: ID do envio individual
+            status: Novo status (ENVIADO, ERRO, CONFIRMADO)
+            data_envio: Se True, data_envio recebe o momento deste registro
+        """
+        with self._lock:
+            self._pendentes.append((envio_id, status, time.monotonic() if data_envio else None))
+            cheio = len(self._pendentes) >= self.max_linhas
+        
+        if cheio:
+            self._acordar.set()
+    
+    def descarregar(self) -> bool:
+        """
+        Grava imediatamente os status acumulados
+        
+        Em caso de erro os status voltam ao buffer para a próxima gravação.
+        
+        Returns:
+            True se o buffer foi gravado (ou estava vazio)
+        """
+        with self._lock_gravacao:
+            with self._lock:
+                lote, self._pendentes = self._pendentes, []
+            if not lote:
+                return True
+            
+            agora = time.monotonic()
+            atualizacoes = [
+                (envio_id, status, None if instante is None else int(agora - instante))
+                for envio_id, status, instante in lote
+            ]
+            
+            if self.db.atualizar_status_envios(atualizacoes):
+                self.gravados += len(lote)
+                self.gravacoes += 1
+                return True
+            
+            self.falhas += 1
+            with self._lock:
+                self._pendentes[:0] = lote
+            return False
+    
+    def _executar(self):
+        while not self._parar.is_set():
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            self.descarregar()
+
+
+if __name__ == "__main__":
+    # Teste do buffer com um banco simulado
+    class _BancoTeste:
+        def atualizar_status_envios(self, atualizacoes):
+            print(f"  UPDATE de {len(atualizacoes)} envio(s): {atualizacoes[:3]}...")
+            return True
+    
+    print("=== Buffer de Status ===")
+    with StatusUpdateBuffer(_BancoTeste(), max_linhas=4, intervalo_ms=200) as buffer:
+        for envio_id in range(1, 11):
+            buffer.registrar(envio_id, 'ENVIADO' if envio_id % 3 else 'ERRO', data_envio=bool(envio_id % 3))
+            time.sleep(0.02)
+    print(f"Gravados: {buffer.gravados} em {buffer.gravacoes} gravação(ões)")